@@ -10,6 +10,10 @@ from backend.routes.staff import staff_bp
 from backend.routes.hod import hod_bp
 from backend.routes.security import security_bp
 from backend.routes.admin import admin_bp
+from backend.routes.events import events_bp
+from backend.utils.notifications import notification_dispatcher
+from backend.utils.routing import routing_cache
+from backend.config import get_db_connection
 from flask import send_from_directory
 import os
 
@@ -20,10 +24,31 @@ app.register_blueprint(staff_bp)
 app.register_blueprint(hod_bp)
 app.register_blueprint(security_bp)
 app.register_blueprint(admin_bp)
+app.register_blueprint(events_bp)
 
-# Initialize database on startup
-with app.app_context():
-    init_db()
+def start_app():
+    """Startup work of an app process: schema, routing warm-up, notification workers"""
+    # Initialize database on startup
+    with app.app_context():
+        init_db()
+
+    # Warm the outpass routing cache (advisor/HOD per department)
+    conn = get_db_connection()
+    if conn:
+        try:
+            routing_cache.build(conn)
+        except Exception as e:
+            print(f"[WARN] Routing cache warm-up failed: {e}")
+        finally:
+            conn.close()
+
+    # Send any parent notifications queued before this process started
+    notification_dispatcher.start()
+
+# Report render processes are spawned and import this file again as __mp_main__
+# (when started with python app.py); they must not become app instances.
+if __name__ != '__mp_main__':
+    start_app()
 
 # Manual Database Initialization Route (Use only if needed)
 @app.route('/api/admin/init-db', methods=['POST'])
@@ -5,10 +5,13 @@ Cleaned & Error-Free Version
 
 import os
 from dotenv import load_dotenv
-from flask import Flask
+from flask import Flask, g
 from flask_cors import CORS
 import mysql.connector
+from mysql.connector import pooling
 from datetime import timedelta
+import threading
+import time
 
 # Load environment variables
 load_dotenv()
@@ -25,103 +28,227 @@ app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
 
 # ================= DATABASE CONNECTION =================
 
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def _get_db_pool():
+    """Create the worker's connection pool on first use (after gunicorn forks)."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                # Get connection parameters with safe defaults
+                db_port = os.environ.get("DB_PORT", "3306")
+                pool_size = os.environ.get("DB_POOL_SIZE", "5")
+
+                # Ensure numeric settings are integers
+                try:
+                    db_port = int(db_port)
+                except (ValueError, TypeError):
+                    db_port = 3306
+                try:
+                    pool_size = min(max(int(pool_size), 1), pooling.CNX_POOL_MAXSIZE)
+                except (ValueError, TypeError):
+                    pool_size = 5
+
+                _db_pool = pooling.MySQLConnectionPool(
+                    pool_name="outpass_pool",
+                    pool_size=pool_size,
+                    # Resetting the session on checkout would drop the time zone
+                    # below; open transactions are rolled back on release instead.
+                    pool_reset_session=False,
+                    host=os.environ.get("DB_HOST", "localhost"),
+                    user=os.environ.get("DB_USER", "root"),
+                    password=os.environ.get("DB_PASSWORD", ""),
+                    database=os.environ.get("DB_NAME", "outpass_db"),
+                    port=db_port,
+                    ssl_disabled=False,
+                    autocommit=True,
+                    connection_timeout=10,
+                    # Session timezone IST (+05:30), applied once per physical connection
+                    time_zone='+05:30'
+                )
+    return _db_pool
+
+
 def get_db_connection():
+    """
+    Check a connection out of the pool.
+    The caller owns it; conn.close() hands it back to the pool.
+    Route handlers should use get_db() instead.
+    """
     try:
-        # Get connection parameters with safe defaults
-        db_host = os.environ.get("DB_HOST", "localhost")
-        db_user = os.environ.get("DB_USER", "root")
-        db_password = os.environ.get("DB_PASSWORD", "")
-        db_name = os.environ.get("DB_NAME", "outpass_db")
-        db_port = os.environ.get("DB_PORT", "3306")
-        
-        # Ensure port is an integer
-        try:
-            db_port = int(db_port)
-        except (ValueError, TypeError):
-            db_port = 3306
-
-        conn = mysql.connector.connect(
-            host=db_host,
-            user=db_user,
-            password=db_password,
-            database=db_name,
-            port=db_port,
-            ssl_disabled=False,
-            autocommit=True,
-            connection_timeout=10
-        )
-        
-        # Set session timezone to IST (+05:30)
-        cursor = conn.cursor()
-        cursor.execute("SET time_zone = '+05:30'")
-        cursor.close()
-        
-        return conn
+        pool = _get_db_pool()
+        wait_seconds = float(os.environ.get("DB_POOL_TIMEOUT", "5"))
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            try:
+                return pool.get_connection()
+            except mysql.connector.errors.PoolError:
+                # Pool exhausted - wait briefly for another request to release one
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
     except Exception as e:
         print(f"[ERROR] Database connection failed: {e}")
         return None
 
 
+def get_db():
+    """
+    Get the connection for the current request.
+    Checked out once on first use, stored on flask.g and released on teardown.
+    """
+    if 'db_conn' not in g:
+        conn = get_db_connection()
+        if not conn:
+            return None
+        g.db_conn = conn
+    return g.db_conn
+
+
+@app.teardown_appcontext
+def release_db(exception=None):
+    """Return the request's connection to the pool."""
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except Exception as e:
+        print(f"[WARN] Rollback on release failed: {e}")
+    try:
+        conn.close()
+    except Exception as e:
+        print(f"[WARN] Returning connection to pool failed: {e}")
+
+
 # ================= INIT DB FUNCTION =================
 
+MIGRATIONS_DIR = os.path.join(BASE_DIR, 'database', 'migrations')
+MIGRATION_LOCK_NAME = 'outpass_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60  # seconds a worker waits for another worker's migration run
+
+
+def _load_migrations():
+    """Return [(version, name, path)] for database/migrations/NNN_name.sql, sorted by version."""
+    migrations = []
+    if not os.path.isdir(MIGRATIONS_DIR):
+        return migrations
+    for filename in os.listdir(MIGRATIONS_DIR):
+        stem, ext = os.path.splitext(filename)
+        prefix = stem.split('_', 1)[0]
+        if ext != '.sql' or not prefix.isdigit():
+            continue
+        migrations.append((int(prefix), stem, os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def _applied_migrations(cursor):
+    """Versions recorded in the ledger, or None if the ledger table does not exist yet."""
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    except mysql.connector.Error as err:
+        if err.errno == 1146:  # Table doesn't exist
+            return None
+        raise
+
+
+def _run_sql_file(cursor, path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    # Split by semicolon but ignore empty statements
+    statements = [s.strip() for s in content.split(';') if s.strip()]
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as err:
+            if err.errno in [1060, 1061]:  # Duplicate column/key
+                pass  # Already present on databases that predate the ledger
+            else:
+                raise
+
+
+def _apply_pending_migrations(conn, migrations):
+    """
+    Apply migrations missing from the ledger while holding a MySQL advisory lock,
+    so only one gunicorn worker runs them. Returns the list of applied names.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise RuntimeError("Timed out waiting for the schema migration lock")
+
+    applied = []
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Re-read under the lock: another worker may have just finished
+        done = _applied_migrations(cursor) or set()
+        for version, name, path in migrations:
+            if version in done:
+                continue
+            _run_sql_file(cursor, path)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+            conn.commit()
+            applied.append(name)
+            print(f"[OK] Migration applied: {name}")
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+        cursor.fetchone()
+        cursor.close()
+    return applied
+
+
 def init_db():
-    """Initializes schema and sample data safely."""
+    """
+    Bring the schema up to date and load sample data on first setup.
+    When the ledger is current this costs a single query.
+    """
     conn = get_db_connection()
     if not conn:
         print("[ERROR] Cannot initialize DB: Connection failed")
         return False
 
-    schema_path = os.path.join(BASE_DIR, 'database', 'schema.sql')
     sample_path = os.path.join(BASE_DIR, 'database', 'sample_data.sql')
 
     try:
+        migrations = _load_migrations()
         cursor = conn.cursor()
-        
-        # Execute Schema
-        if os.path.exists(schema_path):
-            with open(schema_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Split by semicolon but ignore empty statements
-                statements = [s.strip() for s in content.split(';') if s.strip()]
-                for statement in statements:
-                    try:
-                        cursor.execute(statement)
-                    except mysql.connector.Error as err:
-                        if err.errno in [1060, 1061]: # Duplicate column/key
-                            pass # Silently ignore duplicates
-                        else:
-                            print(f"[WARN] Schema statement failed: {err.msg}")
-            print("[OK] Database schema verified/initialized")
+        done = _applied_migrations(cursor)
 
-        # Migration: Add academic_year to users if missing
-        try:
-            cursor.execute("SHOW COLUMNS FROM users LIKE 'academic_year'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE users ADD COLUMN academic_year INT AFTER registration_no")
-                print("[OK] Migration: Added academic_year column to users table")
-        except Exception as mig_err:
-            print(f"[WARN] academic_year migration skipped: {mig_err}")
-
-        # Migration: Add movement logs to outpasses if missing
-        try:
-            cursor.execute("SHOW COLUMNS FROM outpasses LIKE 'actual_exit_time'")
-            if not cursor.fetchone():
-                cursor.execute("ALTER TABLE outpasses ADD COLUMN actual_exit_time TIMESTAMP NULL AFTER is_qr_used")
-                cursor.execute("ALTER TABLE outpasses ADD COLUMN actual_entry_time TIMESTAMP NULL AFTER actual_exit_time")
-                cursor.execute("ALTER TABLE outpasses ADD COLUMN exit_security_id INT AFTER actual_entry_time")
-                cursor.execute("ALTER TABLE outpasses ADD COLUMN entry_security_id INT AFTER exit_security_id")
-                print("[OK] Migration: Added movement columns to outpasses table")
-        except Exception as mig_err:
-            print(f"[WARN] outpasses movement migration skipped: {mig_err}")
-        
-        # Execute Sample Data Only if no users exist (to prevent duplicates on every restart)
-        try:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-        except:
-            user_count = 0
+        if done is not None and all(version in done for version, _, _ in migrations):
+            cursor.close()
+            conn.close()
+            print("[OK] Database schema is up to date")
+            return True
+
+        applied = _apply_pending_migrations(conn, migrations)
+        print("[OK] Database schema verified/initialized")
+
+        # Execute Sample Data Only if no users exist (to prevent duplicates on every restart).
+        # Only the worker that applied migrations does this; the others found the ledger current.
+        user_count = 0
+        if applied:
+            try:
+                cursor.execute("SELECT COUNT(*) FROM users")
+                user_count = cursor.fetchone()[0]
+            except:
+                user_count = 0
         
-        if user_count == 0 and os.path.exists(sample_path):
+        if applied and user_count == 0 and os.path.exists(sample_path):
             with open(sample_path, 'r', encoding='utf-8') as f:
                 content = f.read()
                 statements = [s.strip() for s in content.split(';') if s.strip()]
@@ -154,4 +281,4 @@ def allowed_file(filename):
 
 def allowed_image_file(filename):
     """Specifically for student profile photos (no PDFs)"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg'}
\ No newline at end of file
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg'}
\ No newline at end of file
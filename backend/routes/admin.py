@@ -3,35 +3,111 @@ Admin Routes
 Handles admin operations: user management, reports, system monitoring
 """
 
-from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
+from flask import Blueprint, Response, request, jsonify, session
+from backend.config import get_db, get_db_connection
 from backend.utils.helpers import (
-    role_required, hash_password, format_datetime, format_date, get_ist_now
+    role_required, hash_password, format_datetime, format_date, format_time, get_ist_now,
+    etag_matches, json_with_etag
 )
+from backend.utils.gate_counters import record_gate_movement, rebuild_gate_counters
+from backend.utils.routing import routing_cache
+from backend.utils.profiles import profile_cache
+from backend.utils.departments import department_catalog
+from backend.utils.dashboard_cache import dashboard_cache
+from backend.utils.cache import cache
+from backend.utils.reasons import label_top_reasons
+from backend.utils.daily_stats import daily_stats, outpass_buckets, recompute_buckets
 from datetime import datetime, timedelta
+import csv
+import io
+import json
+import threading
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 200
+
+def _users_changed():
+    """Drop cached figures that count users: department members and the HOD/advisor dashboards"""
+    department_catalog.invalidate_counts()
+    dashboard_cache.invalidate('dashboard.hod')
+    dashboard_cache.invalidate('dashboard.staff')
+
+def _like_prefix(text):
+    """LIKE pattern matching values that start with text"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
 @admin_bp.route('/users', methods=['GET'])
 @role_required('admin')
 def get_all_users():
-    """Get all users with optional role filter"""
+    """
+    List users, newest first, one page at a time
+    Query params: role, dept_id, active (true/false), q (prefix of name,
+                  username or registration no), limit, cursor (next_cursor of
+                  the previous page)
+    """
     try:
         role_filter = request.args.get('role')
-        
-        conn = get_db_connection()
+        dept_filter = request.args.get('dept_id', type=int)
+        active_filter = request.args.get('active')
+        search = (request.args.get('q') or '').strip()
+        limit = request.args.get('limit', USERS_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, USERS_MAX_PAGE_SIZE))
+        after_id = request.args.get('cursor', type=int)
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        query = """
+        conditions = []
+        params = []
+        if role_filter:
+            conditions.append("role = %s")
+            params.append(role_filter)
+        
+        if dept_filter:
+            conditions.append("dept_id = %s")
+            params.append(dept_filter)
+        
+        if active_filter in ('true', 'false'):
+            conditions.append("is_active = %s")
+            params.append(active_filter == 'true')
+        
+        # user_id is the cursor: it never changes and increases with created_at
+        if after_id:
+            conditions.append("user_id < %s")
+            params.append(after_id)
+        
+        if search:
+            # An OR across three columns cannot use their indexes for a user_id ordered
+            # page, so each column gets its own branch: a range read on its index
+            # (idx_users_full_name, username, registration_no) with the same filters and
+            # page bound, sorting only its matches. The outer query merges the branches.
+            pattern = _like_prefix(search)
+            branches = ' UNION '.join(
+                f"(SELECT user_id FROM users WHERE {' AND '.join(conditions + [column + ' LIKE %s'])} "
+                f"ORDER BY user_id DESC LIMIT %s)"
+                for column in ('full_name', 'username', 'registration_no')
+            )
+            source = f"({branches}) m JOIN users u ON u.user_id = m.user_id"
+            params = [value for _ in range(3) for value in (*params, pattern, limit + 1)]
+            where = '1 = 1'
+        else:
+            source = "users u"
+            where = ' AND '.join('u.' + condition for condition in conditions) or '1 = 1'
+        
+        query = f"""
             SELECT 
                 u.user_id,
                 u.username,
                 u.email,
                 u.full_name,
                 u.role,
+                u.dept_id,
                 u.registration_no,
                 u.academic_year,
                 u.phone,
@@ -40,37 +116,88 @@ def get_all_users():
                 d.dept_name,
                 d.dept_code,
                 a.full_name as advisor_name
-            FROM users u
+            FROM {source}
             LEFT JOIN departments d ON u.dept_id = d.dept_id
             LEFT JOIN users a ON u.advisor_id = a.user_id
+            WHERE {where}
+            ORDER BY u.user_id DESC LIMIT %s
         """
-        
-        params = []
-        if role_filter:
-            query += " WHERE u.role = %s"
-            params.append(role_filter)
-        
-        query += " ORDER BY u.created_at DESC"
+        params.append(limit + 1)
         
         cursor.execute(query, params)
         users = cursor.fetchall()
         
+        has_more = len(users) > limit
+        users = users[:limit]
+        
         # Format dates
         for user in users:
             user['created_at'] = format_datetime(user['created_at'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
-            'users': users
+            'users': users,
+            'next_cursor': users[-1]['user_id'] if has_more else None,
+            'has_more': has_more
         }), 200
         
     except Exception as e:
         print(f"Get users error: {e}")
         return jsonify({'success': False, 'message': 'Failed to fetch users'}), 500
 
+@admin_bp.route('/users/<int:user_id>', methods=['GET'])
+@role_required('admin')
+def get_user(user_id):
+    """Get one user's editable details"""
+    try:
+        conn = get_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT user_id, username, email, full_name, role, dept_id, registration_no,
+                   academic_year, phone, advisor_id, is_active
+            FROM users WHERE user_id = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        cursor.close()
+        
+        if not user:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
+        
+        return jsonify({'success': True, 'user': user}), 200
+        
+    except Exception as e:
+        print(f"Get user error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to fetch user'}), 500
+
+@admin_bp.route('/advisors', methods=['GET'])
+@role_required('admin')
+def get_advisors():
+    """Staff and HODs who can be assigned as advisors"""
+    try:
+        conn = get_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT user_id, full_name, role, dept_id FROM users
+            WHERE role IN ('staff', 'hod') AND is_active = TRUE
+            ORDER BY full_name
+        """)
+        advisors = cursor.fetchall()
+        cursor.close()
+        
+        return jsonify({'success': True, 'advisors': advisors}), 200
+        
+    except Exception as e:
+        print(f"Get advisors error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to fetch advisors'}), 500
+
 @admin_bp.route('/add-user', methods=['POST'])
 @role_required('admin')
 def add_user():
@@ -90,7 +217,7 @@ def add_user():
         # Hash password
         password_hash = hash_password(data['password'])
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -119,9 +246,10 @@ def add_user():
             
             user_id = cursor.lastrowid
             conn.commit()
+            routing_cache.invalidate()
+            _users_changed()
             
             cursor.close()
-            conn.close()
             
             return jsonify({
                 'success': True,
@@ -132,7 +260,6 @@ def add_user():
         except Exception as e:
             conn.rollback()
             cursor.close()
-            conn.close()
             
             if 'Duplicate entry' in str(e):
                 return jsonify({'success': False, 'message': 'Username or email already exists'}), 400
@@ -152,7 +279,7 @@ def update_user(user_id):
     try:
         data = request.get_json()
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -186,7 +313,6 @@ def update_user(user_id):
         
         if not updates:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'No fields to update'}), 400
         
         params.append(user_id)
@@ -194,9 +320,11 @@ def update_user(user_id):
         
         cursor.execute(query, params)
         conn.commit()
+        routing_cache.invalidate()
+        profile_cache.invalidate(user_id)
+        _users_changed()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -215,7 +343,7 @@ def delete_user(user_id):
         if user_id == session['user_id']:
             return jsonify({'success': False, 'message': 'Cannot delete your own account'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -223,9 +351,11 @@ def delete_user(user_id):
         
         cursor.execute("UPDATE users SET is_active = FALSE WHERE user_id = %s", (user_id,))
         conn.commit()
+        routing_cache.invalidate()
+        profile_cache.invalidate(user_id)
+        _users_changed()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -244,11 +374,12 @@ def hard_delete_user(user_id):
         if user_id == session['user_id']:
             return jsonify({'success': False, 'message': 'Cannot delete your own account'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor()
+        conn.start_transaction()
         
         # 1. Delete logs where this user performed an action
         cursor.execute("DELETE FROM outpass_logs WHERE action_by = %s", (user_id,))
@@ -267,8 +398,26 @@ def hard_delete_user(user_id):
             placeholders = ','.join(['%s'] * len(outpass_ids))
             cursor.execute(f"DELETE FROM outpass_logs WHERE outpass_id IN ({placeholders})", outpass_ids)
             
-            # 3. Delete the outpasses themselves
+            # Keep the daily gate counters in step with the removed movements
+            cursor.execute(f"""
+                SELECT DATE(actual_exit_time), COUNT(*) FROM outpasses
+                WHERE outpass_id IN ({placeholders}) AND actual_exit_time IS NOT NULL
+                GROUP BY DATE(actual_exit_time)
+            """, outpass_ids)
+            for day, count in cursor.fetchall():
+                record_gate_movement(cursor, day, exits=-count)
+            cursor.execute(f"""
+                SELECT DATE(actual_entry_time), COUNT(*) FROM outpasses
+                WHERE outpass_id IN ({placeholders}) AND actual_entry_time IS NOT NULL
+                GROUP BY DATE(actual_entry_time)
+            """, outpass_ids)
+            for day, count in cursor.fetchall():
+                record_gate_movement(cursor, day, entries=-count)
+            
+            # 3. Delete the outpasses themselves, then recount the rollup days they were in
+            buckets = outpass_buckets(cursor, f"outpass_id IN ({placeholders})", outpass_ids)
             cursor.execute(f"DELETE FROM outpasses WHERE outpass_id IN ({placeholders})", outpass_ids)
+            recompute_buckets(cursor, buckets)
         
         # 4. Remove this user as advisor from other users
         cursor.execute("UPDATE users SET advisor_id = NULL WHERE advisor_id = %s", (user_id,))
@@ -277,8 +426,10 @@ def hard_delete_user(user_id):
         cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
         
         conn.commit()
+        routing_cache.invalidate()
+        profile_cache.invalidate(user_id)
+        _users_changed()
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -305,7 +456,7 @@ def reset_user_password(user_id):
         
         password_hash = hash_password(new_password)
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -314,9 +465,9 @@ def reset_user_password(user_id):
         cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s", 
                       (password_hash, user_id))
         conn.commit()
+        profile_cache.invalidate(user_id)
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -329,37 +480,30 @@ def reset_user_password(user_id):
 
 @admin_bp.route('/departments', methods=['GET'])
 def get_departments():
-    """Get all departments"""
+    """Get all departments with their active student and staff counts"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                d.*,
-                COUNT(DISTINCT u.user_id) as student_count,
-                COUNT(DISTINCT s.user_id) as staff_count
-            FROM departments d
-            LEFT JOIN users u ON d.dept_id = u.dept_id AND u.role = 'student' AND u.is_active = TRUE
-            LEFT JOIN users s ON d.dept_id = s.dept_id AND s.role = 'staff' AND s.is_active = TRUE
-            GROUP BY d.dept_id
-        """)
-        
-        departments = cursor.fetchall()
-        
-        for dept in departments:
-            dept['created_at'] = format_datetime(dept['created_at'])
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
+        # Revalidation while both the catalog and the counts are warm needs no database connection
+        departments = None
+        catalog_version = department_catalog.cached_version()
+        counts_version = department_catalog.cached_counts_version()
+        version = f"{catalog_version}.{counts_version}" if catalog_version and counts_version else None
+        if version is None or not etag_matches(version):
+            conn = get_db()
+            if not conn:
+                return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+            
+            by_id, _, catalog_version = department_catalog.catalog(conn)
+            counts, counts_version = department_catalog.member_counts(conn)
+            version = f"{catalog_version}.{counts_version}"
+            departments = []
+            for dept in by_id:
+                student_count, staff_count = counts.get(dept['dept_id'], (0, 0))
+                departments.append(dict(dept, student_count=student_count, staff_count=staff_count))
+        
+        return json_with_etag(version, {
             'success': True,
             'departments': departments
-        }), 200
+        }, private=True)
         
     except Exception as e:
         print(f"Get departments error: {e}")
@@ -378,7 +522,7 @@ def add_department():
         if not data.get('dept_name') or not data.get('dept_code'):
             return jsonify({'success': False, 'message': 'Department name and code required'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -392,9 +536,10 @@ def add_department():
             
             dept_id = cursor.lastrowid
             conn.commit()
+            routing_cache.invalidate()
+            department_catalog.invalidate()
             
             cursor.close()
-            conn.close()
             
             return jsonify({
                 'success': True,
@@ -405,7 +550,6 @@ def add_department():
         except Exception as e:
             conn.rollback()
             cursor.close()
-            conn.close()
             
             if 'Duplicate entry' in str(e):
                 return jsonify({'success': False, 'message': 'Department code already exists'}), 400
@@ -425,7 +569,7 @@ def update_department(dept_id):
     try:
         data = request.get_json()
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -443,7 +587,6 @@ def update_department(dept_id):
             
         if not updates:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'No fields to update'}), 400
             
         params.append(dept_id)
@@ -452,8 +595,11 @@ def update_department(dept_id):
         try:
             cursor.execute(query, params)
             conn.commit()
+            routing_cache.invalidate()
+            department_catalog.invalidate()
+            # Department name and code are part of every member's profile
+            profile_cache.clear()
             cursor.close()
-            conn.close()
             
             return jsonify({
                 'success': True,
@@ -462,7 +608,6 @@ def update_department(dept_id):
         except Exception as e:
             conn.rollback()
             cursor.close()
-            conn.close()
             if 'Duplicate entry' in str(e):
                 return jsonify({'success': False, 'message': 'Department code already exists'}), 400
             raise e
@@ -476,7 +621,7 @@ def update_department(dept_id):
 def delete_department(dept_id):
     """Delete a department"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -488,14 +633,14 @@ def delete_department(dept_id):
         
         if count > 0:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Cannot delete department with assigned users'}), 400
         
         cursor.execute("DELETE FROM departments WHERE dept_id = %s", (dept_id,))
         conn.commit()
+        routing_cache.invalidate()
+        department_catalog.invalidate()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -521,7 +666,7 @@ def assign_advisor():
         if not student_ids or not advisor_id:
             return jsonify({'success': False, 'message': 'Student IDs and advisor ID required'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -533,7 +678,6 @@ def assign_advisor():
         
         if not advisor or advisor[0] not in ['staff', 'hod']:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Invalid advisor'}), 400
         
         # Update students
@@ -542,10 +686,12 @@ def assign_advisor():
         cursor.execute(query, [advisor_id] + student_ids)
         
         conn.commit()
+        routing_cache.invalidate()
+        profile_cache.invalidate(*[int(sid) for sid in student_ids if str(sid).isdigit()])
+        dashboard_cache.invalidate('dashboard.staff')
         affected = cursor.rowcount
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -556,6 +702,36 @@ def assign_advisor():
         print(f"Assign advisor error: {e}")
         return jsonify({'success': False, 'message': 'Failed to assign advisor'}), 500
 
+@admin_bp.route('/rebuild-gate-counters', methods=['POST'])
+@role_required('admin')
+def rebuild_gate_counters_route():
+    """Recompute the daily gate counters from outpasses"""
+    try:
+        conn = get_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        
+        days = rebuild_gate_counters(conn)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Gate counters rebuilt for {days} day(s)'
+        }), 200
+        
+    except Exception as e:
+        print(f"Rebuild gate counters error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to rebuild gate counters'}), 500
+
+@admin_bp.route('/cache-stats', methods=['GET'])
+@role_required('admin')
+def get_cache_stats():
+    """
+    Cache counters: shared cache tiers (local/shared hits, misses, invalidations) and
+    dashboard coalescing (hits, stale hits, misses, coalesced waits, refreshes, errors)
+    Counters belong to the worker process that answers; pid says which one.
+    """
+    return jsonify({'success': True, 'cache': cache.stats(), 'dashboard': dashboard_cache.stats()}), 200
+
 @admin_bp.route('/system-report', methods=['GET'])
 @role_required('admin')
 def get_system_report():
@@ -564,7 +740,7 @@ def get_system_report():
         from_date = request.args.get('from_date', (get_ist_now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         to_date = request.args.get('to_date', get_ist_now().strftime('%Y-%m-%d'))
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -581,16 +757,21 @@ def get_system_report():
         """)
         user_stats = cursor.fetchall()
         
-        # Outpass statistics
+        daily_stats.refresh(conn)
+        
+        # Outpass statistics (from the daily rollup; both dates inclusive)
         cursor.execute("""
             SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN final_status = 'pending' THEN 1 ELSE 0 END) as pending,
-                SUM(CASE WHEN final_status = 'approved' THEN 1 ELSE 0 END) as approved,
-                SUM(CASE WHEN final_status = 'rejected' THEN 1 ELSE 0 END) as rejected,
-                SUM(CASE WHEN final_status = 'used' THEN 1 ELSE 0 END) as used
-            FROM outpasses
-            WHERE created_at BETWEEN %s AND %s
+                COALESCE(SUM(created), 0) as total,
+                COALESCE(SUM(pending), 0) as pending,
+                COALESCE(SUM(approved), 0) as approved,
+                COALESCE(SUM(rejected), 0) as rejected,
+                COALESCE(SUM(used), 0) as used,
+                COALESCE(SUM(exits), 0) as exits,
+                COALESCE(SUM(entries), 0) as entries,
+                COALESCE(SUM(late_returns), 0) as late_returns
+            FROM outpass_daily_stats
+            WHERE day BETWEEN %s AND %s
         """, (from_date, to_date))
         outpass_stats = cursor.fetchone()
         
@@ -598,27 +779,25 @@ def get_system_report():
         cursor.execute("""
             SELECT 
                 d.dept_name,
-                COUNT(o.outpass_id) as total_outpasses,
-                SUM(CASE WHEN o.final_status = 'approved' THEN 1 ELSE 0 END) as approved,
-                SUM(CASE WHEN o.final_status = 'rejected' THEN 1 ELSE 0 END) as rejected
+                COALESCE(SUM(r.created), 0) as total_outpasses,
+                COALESCE(SUM(r.approved), 0) as approved,
+                COALESCE(SUM(r.rejected), 0) as rejected
             FROM departments d
-            LEFT JOIN users s ON d.dept_id = s.dept_id
-            LEFT JOIN outpasses o ON s.user_id = o.student_id
-            WHERE o.created_at BETWEEN %s AND %s OR o.created_at IS NULL
-            GROUP BY d.dept_id
+            LEFT JOIN outpass_daily_stats r ON r.dept_id = d.dept_id AND r.day BETWEEN %s AND %s
+            GROUP BY d.dept_id, d.dept_name
         """, (from_date, to_date))
         dept_stats = cursor.fetchall()
         
         # Top reasons
         cursor.execute("""
-            SELECT reason, COUNT(*) as count
+            SELECT reason_category_id, COUNT(*) as count
             FROM outpasses
-            WHERE created_at BETWEEN %s AND %s
-            GROUP BY reason
+            WHERE created_at >= %s AND created_at < %s + INTERVAL 1 DAY
+            GROUP BY reason_category_id
             ORDER BY count DESC
             LIMIT 10
         """, (from_date, to_date))
-        top_reasons = cursor.fetchall()
+        top_reasons = label_top_reasons(cursor.fetchall())
         
         # Misuse attempts (expired QR, reused QR, etc.)
         cursor.execute("""
@@ -630,7 +809,6 @@ def get_system_report():
         misuse = cursor.fetchone()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -648,60 +826,154 @@ def get_system_report():
         print(f"Get system report error: {e}")
         return jsonify({'success': False, 'message': 'Failed to generate report'}), 500
 
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = [
+    'outpass_id', 'registration_no', 'student_name', 'dept_name', 'out_date', 'out_time',
+    'expected_return_time', 'reason', 'destination', 'advisor_status', 'hod_status',
+    'final_status', 'created_at', 'actual_exit_time', 'actual_entry_time'
+]
+EXPORT_FORMATTERS = {
+    'out_date': format_date,
+    'out_time': format_time,
+    'expected_return_time': format_time,
+    'created_at': format_datetime,
+    'actual_exit_time': format_datetime,
+    'actual_entry_time': format_datetime
+}
+
+def _export_rows(cursor, finished):
+    """
+    Yield formatted export rows, fetching EXPORT_CHUNK_SIZE at a time
+    Sets finished once every row was read. A database error is re-raised so the
+    server aborts the chunked response and the client sees a failed download
+    rather than a file that looks complete.
+    """
+    try:
+        while True:
+            chunk = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            for row in chunk:
+                yield [
+                    EXPORT_FORMATTERS[col](value) if col in EXPORT_FORMATTERS else value
+                    for col, value in zip(EXPORT_COLUMNS, row)
+                ]
+    except Exception as e:
+        print(f"Export report stream error: {e}")
+        raise
+    finished.set()
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _export_ndjson(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str))
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
 @admin_bp.route('/export-report', methods=['GET'])
 @role_required('admin')
 def export_report():
-    """Export system report as CSV"""
+    """
+    Stream outpasses created in a date range as a download
+    Query params: from_date, to_date (YYYY-MM-DD, both inclusive), format (csv or ndjson)
+    """
     try:
         from_date = request.args.get('from_date', (get_ist_now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         to_date = request.args.get('to_date', get_ist_now().strftime('%Y-%m-%d'))
+        export_format = request.args.get('format', 'csv').lower()
+        
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+        
+        try:
+            from_day = datetime.strptime(from_date, '%Y-%m-%d')
+            to_day = datetime.strptime(to_date, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
         
+        # The stream outlives the request, so it takes its own connection instead of get_db()
         conn = get_db_connection()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                o.outpass_id,
-                s.registration_no,
-                s.full_name as student_name,
-                d.dept_name,
-                o.out_date,
-                o.out_time,
-                o.expected_return_time,
-                o.reason,
-                o.destination,
-                o.advisor_status,
-                o.hod_status,
-                o.final_status,
-                o.created_at,
-                o.actual_exit_time,
-                o.actual_entry_time
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE o.created_at BETWEEN %s AND %s
-            ORDER BY o.created_at DESC
-        """, (from_date, to_date))
-        
-        outpasses = cursor.fetchall()
-        
-        # Format dates
-        for op in outpasses:
-            op['out_date'] = format_date(op['out_date'])
-            op['created_at'] = format_datetime(op['created_at'])
-            op['actual_exit_time'] = format_datetime(op['actual_exit_time'])
-            op['actual_entry_time'] = format_datetime(op['actual_entry_time'])
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': outpasses
-        }), 200
+        # Unbuffered cursor: rows are read off the socket as they are fetched,
+        # so memory stays flat however long the range is
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute("""
+                SELECT 
+                    o.outpass_id,
+                    s.registration_no,
+                    s.full_name as student_name,
+                    d.dept_name,
+                    o.out_date,
+                    o.out_time,
+                    o.expected_return_time,
+                    o.reason,
+                    o.destination,
+                    o.advisor_status,
+                    o.hod_status,
+                    o.final_status,
+                    o.created_at,
+                    o.actual_exit_time,
+                    o.actual_entry_time
+                FROM outpasses o
+                JOIN users s ON o.student_id = s.user_id
+                LEFT JOIN departments d ON s.dept_id = d.dept_id
+                WHERE o.created_at >= %s AND o.created_at < %s
+                ORDER BY o.created_at DESC
+            """, (from_day, to_day + timedelta(days=1)))
+        except Exception:
+            cursor.close()
+            conn.close()
+            raise
+        
+        finished = threading.Event()
+        
+        def release():
+            try:
+                if finished.is_set():
+                    cursor.close()
+                else:
+                    # Abandoned or failed mid-result: closing the cursor would raise on the
+                    # unread rows, so drop the socket instead. The pool reconnects it on the
+                    # next checkout rather than handing out a connection with rows pending.
+                    getattr(conn, '_cnx', conn).disconnect()
+            except Exception as e:
+                print(f"Export report release error: {e}")
+            finally:
+                conn.close()
+        
+        rows = _export_rows(cursor, finished)
+        if export_format == 'csv':
+            body, mimetype = _export_csv(rows), 'text/csv'
+        else:
+            body, mimetype = _export_ndjson(rows), 'application/x-ndjson'
+        
+        filename = f"outpass_report_{from_date}_{to_date}.{export_format}"
+        response = Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        # Runs when the server finishes the response, including when the client disconnects
+        response.call_on_close(release)
+        return response
         
     except Exception as e:
         print(f"Export report error: {e}")
@@ -4,8 +4,11 @@ Handles login, logout, session management, and user registration
 """
 
 from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
-from backend.utils.helpers import hash_password, verify_password, get_client_ip
+from backend.config import get_db
+from backend.utils.helpers import hash_password, verify_password, get_client_ip, etag_matches, json_with_etag
+from backend.utils.routing import routing_cache
+from backend.utils.profiles import profile_cache, PROFILE_QUERY
+from backend.utils.departments import department_catalog
 from werkzeug.utils import secure_filename
 import os
 
@@ -27,31 +30,23 @@ def login():
             return jsonify({'success': False, 'message': 'Username and password required'}), 400
         
         # Get database connection
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
         # Find user by username or email
-        query = """
-            SELECT u.*, d.dept_name, d.dept_code
-            FROM users u
-            LEFT JOIN departments d ON u.dept_id = d.dept_id
-            WHERE (u.username = %s OR u.email = %s) AND u.is_active = TRUE
-        """
-        cursor.execute(query, (username, username))
+        cursor.execute(PROFILE_QUERY.format(where="(u.username = %s OR u.email = %s)"), (username, username))
         user = cursor.fetchone()
         
         if not user:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
         
         # Verify password
         if not verify_password(password, user['password_hash']):
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
         
         # Create session
@@ -69,34 +64,10 @@ def login():
             profile_img = profile_img.replace('uploads/', '', 1).lstrip('/')
         session['profile_image'] = profile_img
         
-        # Get advisor name for students
-        advisor_name = None
-        if user['role'] == 'student' and user['advisor_id']:
-            cursor.execute("SELECT full_name FROM users WHERE user_id = %s", (user['advisor_id'],))
-            advisor = cursor.fetchone()
-            if advisor:
-                advisor_name = advisor['full_name']
-        
         cursor.close()
-        conn.close()
-        
-        # Prepare response data (exclude password hash)
-        user_data = {
-            'user_id': user['user_id'],
-            'username': user['username'],
-            'email': user['email'],
-            'full_name': user['full_name'],
-            'role': user['role'],
-            'dept_name': user.get('dept_name'),
-            'dept_code': user.get('dept_code'),
-            'registration_no': user.get('registration_no'),
-            'academic_year': user.get('academic_year'),
-            'phone': user.get('phone'),
-            'parent_name': user.get('parent_name'),
-            'parent_mobile': user.get('parent_mobile'),
-            'profile_image': user.get('profile_image').replace('uploads/', '', 1) if user.get('profile_image') else None,
-            'advisor_name': advisor_name
-        }
+        
+        # Prepare response data (exclude password hash) and prime the session check
+        user_data = profile_cache.put(user)
         
         return jsonify({
             'success': True,
@@ -115,55 +86,18 @@ def check_session():
         if 'user_id' not in session:
             return jsonify({'logged_in': False}), 200
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'logged_in': False, 'error': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Fetch latest user data
-        query = """
-            SELECT u.*, d.dept_name, d.dept_code
-            FROM users u
-            LEFT JOIN departments d ON u.dept_id = d.dept_id
-            WHERE u.user_id = %s AND u.is_active = TRUE
-        """
-        cursor.execute(query, (session['user_id'],))
-        user = cursor.fetchone()
-        
-        if not user:
-            cursor.close()
-            conn.close()
-            session.clear() # Clear invalid session
-            return jsonify({'logged_in': False}), 200
-        
-        # Get advisor name for students
-        advisor_name = None
-        if user['role'] == 'student' and user['advisor_id']:
-            cursor.execute("SELECT full_name FROM users WHERE user_id = %s", (user['advisor_id'],))
-            advisor = cursor.fetchone()
-            if advisor:
-                advisor_name = advisor['full_name']
+        # Warm profiles are served without a database connection; see backend/utils/profiles.py
+        user_data = profile_cache.cached(session['user_id'])
         
-        cursor.close()
-        conn.close()
-        
-        user_data = {
-            'user_id': user['user_id'],
-            'username': user['username'],
-            'email': user['email'],
-            'full_name': user['full_name'],
-            'role': user['role'],
-            'dept_name': user.get('dept_name'),
-            'dept_code': user.get('dept_code'),
-            'registration_no': user.get('registration_no'),
-            'academic_year': user.get('academic_year'),
-            'phone': user.get('phone'),
-            'parent_name': user.get('parent_name'),
-            'parent_mobile': user.get('parent_mobile'),
-            'profile_image': user.get('profile_image').replace('uploads/', '', 1) if user.get('profile_image') else None,
-            'advisor_name': advisor_name
-        }
+        if not user_data:
+            conn = get_db()
+            if not conn:
+                return jsonify({'logged_in': False, 'error': 'Database connection failed'}), 500
+            
+            user_data = profile_cache.load(conn, session['user_id'])
+            if not user_data:
+                session.clear() # Clear invalid session
+                return jsonify({'logged_in': False}), 200
         
         return jsonify({
             'logged_in': True,
@@ -216,21 +150,24 @@ def analyze_id_card(image_file):
 def get_departments():
     """Fetch all departments for the registration dropdown"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT dept_id, dept_name, dept_code FROM departments ORDER BY dept_name")
-        departments = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        # A browser revalidating a warm catalog gets its 304 without a database connection
+        departments = None
+        version = department_catalog.cached_version()
+        if version is None or not etag_matches(version):
+            conn = get_db()
+            if not conn:
+                return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+            
+            _, by_name, version = department_catalog.catalog(conn)
+            departments = [
+                {'dept_id': d['dept_id'], 'dept_name': d['dept_name'], 'dept_code': d['dept_code']}
+                for d in by_name
+            ]
         
-        return jsonify({
+        return json_with_etag(version, {
             'success': True, 
             'departments': departments
-        }), 200
+        })
     except Exception as e:
         print(f"Error fetching departments: {e}")
         return jsonify({'success': False, 'message': 'Failed to load departments'}), 500
@@ -321,7 +258,7 @@ def register():
                 profile_image_path = f"profiles/{filename}"
         
         # Get database connection
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -355,9 +292,10 @@ def register():
             
             conn.commit()
             user_id = cursor.lastrowid
+            routing_cache.invalidate()
+            department_catalog.invalidate_counts()
             
             cursor.close()
-            conn.close()
             
             return jsonify({
                 'success': True,
@@ -368,7 +306,6 @@ def register():
         except Exception as e:
             conn.rollback()
             cursor.close()
-            conn.close()
             
             # Check for duplicate entry
             if 'Duplicate entry' in str(e):
@@ -400,7 +337,7 @@ def change_password():
         if len(new_password) < 6:
             return jsonify({'success': False, 'message': 'New password must be at least 6 characters'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -412,7 +349,6 @@ def change_password():
         
         if not user or not verify_password(current_password, user['password_hash']):
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Current password is incorrect'}), 401
         
         # Update password
@@ -420,12 +356,12 @@ def change_password():
         cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s", 
                       (new_hash, session['user_id']))
         conn.commit()
+        profile_cache.invalidate(session['user_id'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({'success': True, 'message': 'Password changed successfully'}), 200
         
     except Exception as e:
         print(f"Change password error: {e}")
-        return jsonify({'success': False, 'message': 'Failed to change password'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'Failed to change password'}), 500
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+Event Stream Routes
+Pushes outpass events to dashboards over Server-Sent Events
+"""
+
+import os
+import queue
+import time
+from flask import Blueprint, Response, request, session
+from backend.utils.helpers import login_required
+from backend.utils.events import broker, format_sse
+
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+HEARTBEAT_INTERVAL = 15
+# Streams are closed periodically so a worker is never held indefinitely;
+# EventSource reconnects with Last-Event-ID and resumes where it left off.
+STREAM_MAX_SECONDS = int(os.getenv('EVENTS_STREAM_MAX_SECONDS', 300))
+
+@events_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    """
+    Subscribe to outpass events for the logged-in user's scope
+    Event types: created, advisor_approved, hod_approved, rejected, exit_scanned,
+    entry_scanned, plus resync when the client must refetch its snapshot.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    sub = broker.subscribe(session['role'], session['user_id'], session.get('dept_id'), last_event_id)
+
+    def generate():
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event = sub.queue.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
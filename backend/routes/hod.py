@@ -4,37 +4,47 @@ Handles HOD operations: final approval, department statistics, override approval
 """
 
 from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
+from backend.config import get_db
 from backend.utils.helpers import (
     role_required, format_datetime, format_date, format_time,
-    log_action, get_client_ip, generate_unique_qr_token, generate_qr_code,
-    send_sms_notification, get_ist_now
+    log_action, get_client_ip, generate_signed_qr_token, generate_qr_code,
+    get_ist_now, parse_id_list
 )
-from backend.utils.pdf_generator import generate_hod_monthly_report
+from backend.utils.notifications import enqueue_sms, enqueue_sms_batch, notification_dispatcher
+from backend.utils.audit import insert_log_rows
+from backend.utils.daily_stats import daily_stats
+from backend.utils.reasons import label_top_reasons
+from backend.utils.reports import report_jobs, report_month, report_response, job_payload, job_scope
+from backend.utils.context import current_user
+from backend.utils.dashboard_cache import dashboard_cache
 from datetime import datetime, timedelta
-from flask import Response
 
-import re
+import base64
+import binascii
 hod_bp = Blueprint('hod', __name__, url_prefix='/api/hod')
 
+def _statistics_changed():
+    """Drop the acting HOD's cached department statistics after a decision"""
+    hod = current_user()
+    if hod:
+        dashboard_cache.invalidate('dashboard.hod', hod.dept_id)
+
 @hod_bp.route('/pending-approvals', methods=['GET'])
 @role_required('hod')
 def get_pending_approvals():
     """Get all outpasses pending HOD approval for the department"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        # Get HOD's department
-        cursor.execute("SELECT dept_id FROM users WHERE user_id = %s", (session['user_id'],))
-        hod_dept = cursor.fetchone()
+        # HOD's department, from the request context
+        hod = current_user()
         
-        if not hod_dept:
+        if not hod:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Department not found'}), 404
         
         # Get pending requests for HOD's department
@@ -79,7 +89,6 @@ def get_pending_approvals():
                 req['profile_image'] = None
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -101,7 +110,7 @@ def approve_final(outpass_id):
         data = request.get_json()
         remarks = data.get('remarks', 'Approved by HOD')
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -119,23 +128,22 @@ def approve_final(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
         
         if outpass['hod_status'] != 'pending':
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Request already processed'}), 400
         
         if outpass['advisor_status'] != 'approved':
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Advisor has not approved this request'}), 400
         
         # Generate QR code token
-        qr_token = generate_unique_qr_token(outpass_id)
-        qr_expires = get_ist_now() + timedelta(hours=1)  # QR valid for 1 hour
+        qr_issued = get_ist_now()
+        qr_expires = qr_issued + timedelta(hours=1)  # QR valid for 1 hour
+        qr_token = generate_signed_qr_token(outpass_id, outpass['student_id'], qr_expires, qr_issued)
         
+        conn.start_transaction()
         # Update outpass - HOD approval and generate QR
         cursor.execute("""
             UPDATE outpasses 
@@ -149,23 +157,24 @@ def approve_final(outpass_id):
             WHERE outpass_id = %s
         """, (remarks, qr_token, qr_expires, outpass_id))
         
-        conn.commit()
-        
-        # Log action
-        log_action(conn, outpass_id, session['user_id'], 'hod_approved', 
-                  remarks, get_client_ip())
-        
-        # Send notification to parent
+        # Queue parent notification; it commits with the approval and is sent in the background
         if outpass['parent_mobile']:
             message = (
                 f"Dear Parent, your ward {outpass['student_name']}'s outpass "
                 f"({outpass['dept_name']}) has been approved. "
                 f"Departure: {outpass['out_date']} {format_time(outpass['out_time'])}."
             )
-            send_sms_notification(outpass['parent_mobile'], message)
+            enqueue_sms(cursor, outpass['parent_mobile'], message, f"hod_approved:{outpass_id}", outpass_id)
+        
+        conn.commit()
+        notification_dispatcher.wake()
+        _statistics_changed()
+        
+        # Log action
+        log_action(conn, outpass_id, session['user_id'], 'hod_approved', 
+                  remarks, get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -177,6 +186,136 @@ def approve_final(outpass_id):
         print(f"Approve final error: {e}")
         return jsonify({'success': False, 'message': 'Failed to approve outpass'}), 500
 
+HOD_BATCH_MAX = 500
+
+@hod_bp.route('/approve-final-batch', methods=['POST'])
+@role_required('hod')
+def approve_final_batch():
+    """
+    Give final approval to many outpasses at once
+    Request body: {outpass_ids: [...], remarks}
+    Eligible requests are approved together in one transaction; the response
+    reports an outcome per id (approved, not_found, already_processed, advisor_pending).
+    """
+    try:
+        data = request.get_json() or {}
+        remarks = data.get('remarks') or 'Approved by HOD'
+        
+        try:
+            outpass_ids = parse_id_list(data.get('outpass_ids'))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'outpass_ids must be a list of ids'}), 400
+        
+        if not outpass_ids:
+            return jsonify({'success': False, 'message': 'No outpasses selected'}), 400
+        if len(outpass_ids) > HOD_BATCH_MAX:
+            return jsonify({'success': False, 'message': f'At most {HOD_BATCH_MAX} outpasses per batch'}), 400
+        
+        conn = get_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(outpass_ids))
+        
+        conn.start_transaction()
+        
+        # Validate every id in one query; the row locks keep concurrent approvals out.
+        # Only outpass rows are locked; names for the SMS are read below without locks.
+        cursor.execute(f"""
+            SELECT outpass_id, student_id, out_date, out_time, hod_status, advisor_status
+            FROM outpasses
+            WHERE outpass_id IN ({placeholders}) AND hod_id = %s
+            FOR UPDATE
+        """, (*outpass_ids, session['user_id']))
+        found = {row['outpass_id']: row for row in cursor.fetchall()}
+        
+        results = []
+        eligible = []
+        for outpass_id in outpass_ids:
+            outpass = found.get(outpass_id)
+            if not outpass:
+                results.append({'outpass_id': outpass_id, 'status': 'not_found'})
+            elif outpass['hod_status'] != 'pending':
+                results.append({'outpass_id': outpass_id, 'status': 'already_processed'})
+            elif outpass['advisor_status'] != 'approved':
+                results.append({'outpass_id': outpass_id, 'status': 'advisor_pending'})
+            else:
+                results.append({'outpass_id': outpass_id, 'status': 'approved'})
+                eligible.append(outpass)
+        
+        if not eligible:
+            conn.rollback()
+            cursor.close()
+            return jsonify({'success': True, 'approved': 0, 'results': results}), 200
+        
+        cursor.execute(f"""
+            SELECT o.outpass_id, s.full_name as student_name, s.parent_mobile, d.dept_name
+            FROM outpasses o
+            JOIN users s ON o.student_id = s.user_id
+            LEFT JOIN departments d ON s.dept_id = d.dept_id
+            WHERE o.outpass_id IN ({', '.join(['%s'] * len(eligible))})
+        """, [o['outpass_id'] for o in eligible])
+        for row in cursor.fetchall():
+            found[row['outpass_id']].update(row)
+        
+        # One issue time for the batch; each pass still gets its own signed token
+        qr_issued = get_ist_now()
+        qr_expires = qr_issued + timedelta(hours=1)  # QR valid for 1 hour
+        tokens = {
+            o['outpass_id']: generate_signed_qr_token(o['outpass_id'], o['student_id'], qr_expires, qr_issued)
+            for o in eligible
+        }
+        
+        eligible_ids = list(tokens.keys())
+        case_sql = ' '.join(['WHEN %s THEN %s'] * len(eligible_ids))
+        case_params = [value for item in tokens.items() for value in item]
+        cursor.execute(f"""
+            UPDATE outpasses 
+            SET hod_status = 'approved',
+                hod_remarks = %s,
+                hod_action_time = NOW(),
+                final_status = 'approved',
+                qr_code = CASE outpass_id {case_sql} END,
+                qr_generated_at = NOW(),
+                qr_expires_at = %s
+            WHERE outpass_id IN ({', '.join(['%s'] * len(eligible_ids))})
+        """, (remarks, *case_params, qr_expires, *eligible_ids))
+        
+        ip_address = get_client_ip()
+        insert_log_rows(cursor, [
+            (outpass_id, session['user_id'], 'hod_approved', remarks, ip_address, qr_issued)
+            for outpass_id in eligible_ids
+        ])
+        
+        enqueue_sms_batch(cursor, [
+            (
+                o['parent_mobile'],
+                f"Dear Parent, your ward {o['student_name']}'s outpass "
+                f"({o['dept_name']}) has been approved. "
+                f"Departure: {o['out_date']} {format_time(o['out_time'])}.",
+                f"hod_approved:{o['outpass_id']}",
+                o['outpass_id']
+            )
+            for o in eligible
+        ])
+        
+        conn.commit()
+        notification_dispatcher.wake()
+        _statistics_changed()
+        cursor.close()
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(eligible)} outpass(es) approved. QR codes generated.',
+            'approved': len(eligible),
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        print(f"Approve final batch error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to approve outpasses'}), 500
+
 @hod_bp.route('/reject-final/<int:outpass_id>', methods=['POST'])
 @role_required('hod')
 def reject_final(outpass_id):
@@ -191,7 +330,7 @@ def reject_final(outpass_id):
         if not remarks or remarks.strip() == '':
             return jsonify({'success': False, 'message': 'Remarks required for rejection'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -207,12 +346,10 @@ def reject_final(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
         
         if outpass['hod_status'] != 'pending':
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Request already processed'}), 400
         
         # Update outpass - HOD rejection
@@ -226,13 +363,13 @@ def reject_final(outpass_id):
         """, (remarks, outpass_id))
         
         conn.commit()
+        _statistics_changed()
         
         # Log action
         log_action(conn, outpass_id, session['user_id'], 'hod_rejected', 
                   remarks, get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -243,99 +380,97 @@ def reject_final(outpass_id):
         print(f"Reject final error: {e}")
         return jsonify({'success': False, 'message': 'Failed to reject outpass'}), 500
 
+def _department_statistics(conn, dept_id):
+    """Department dashboard figures; shared by the department's HODs"""
+    cursor = conn.cursor(dictionary=True)
+    
+    # Total students in department
+    cursor.execute("""
+        SELECT COUNT(*) as total_students
+        FROM users
+        WHERE dept_id = %s AND role = 'student' AND is_active = TRUE
+    """, (dept_id,))
+    students = cursor.fetchone()
+    
+    daily_stats.refresh(conn)
+    
+    # Outpass statistics (from the daily rollup)
+    cursor.execute("""
+        SELECT 
+            COALESCE(SUM(created), 0) as total_outpasses,
+            COALESCE(SUM(pending), 0) as pending,
+            COALESCE(SUM(approved), 0) as approved,
+            COALESCE(SUM(rejected), 0) as rejected,
+            COALESCE(SUM(used), 0) as used,
+            COALESCE(SUM(exits), 0) as exits,
+            COALESCE(SUM(late_returns), 0) as late_returns
+        FROM outpass_daily_stats
+        WHERE dept_id = %s
+    """, (dept_id,))
+    outpass_stats = cursor.fetchone()
+    
+    # Pending HOD approvals
+    cursor.execute("""
+        SELECT COUNT(*) as pending_hod
+        FROM outpasses o
+        WHERE o.dept_id = %s AND o.hod_status = 'pending' AND o.advisor_status = 'approved'
+    """, (dept_id,))
+    pending_hod = cursor.fetchone()
+    
+    # Monthly trend (last 6 months)
+    cursor.execute("""
+        SELECT 
+            DATE_FORMAT(day, '%%Y-%%m') as month,
+            SUM(created) as count
+        FROM outpass_daily_stats
+        WHERE dept_id = %s
+        AND day >= DATE(DATE_SUB(NOW(), INTERVAL 6 MONTH))
+        GROUP BY DATE_FORMAT(day, '%%Y-%%m')
+        HAVING count > 0
+        ORDER BY month DESC
+    """, (dept_id,))
+    monthly_trend = cursor.fetchall()
+    
+    # Top reasons for outpasses
+    cursor.execute("""
+        SELECT 
+            reason_category_id,
+            COUNT(*) as count
+        FROM outpasses
+        WHERE dept_id = %s
+        GROUP BY reason_category_id
+        ORDER BY count DESC
+        LIMIT 5
+    """, (dept_id,))
+    top_reasons = label_top_reasons(cursor.fetchall())
+    
+    cursor.close()
+    
+    return {
+        'total_students': students['total_students'],
+        'pending_hod_approval': pending_hod['pending_hod'],
+        'outpasses': outpass_stats,
+        'monthly_trend': monthly_trend,
+        'top_reasons': top_reasons
+    }
+
 @hod_bp.route('/department-statistics', methods=['GET'])
 @role_required('hod')
 def get_department_statistics():
     """Get comprehensive statistics for the department"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
+        # HOD's department, from the request context
+        hod = current_user()
         
-        # Get HOD's department
-        cursor.execute("SELECT dept_id FROM users WHERE user_id = %s", (session['user_id'],))
-        hod_dept = cursor.fetchone()
-        
-        if not hod_dept:
-            cursor.close()
-            conn.close()
+        if not hod or hod.dept_id is None:
             return jsonify({'success': False, 'message': 'Department not found'}), 404
         
-        dept_id = hod_dept['dept_id']
-        
-        # Total students in department
-        cursor.execute("""
-            SELECT COUNT(*) as total_students
-            FROM users
-            WHERE dept_id = %s AND role = 'student' AND is_active = TRUE
-        """, (dept_id,))
-        students = cursor.fetchone()
-        
-        # Outpass statistics
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_outpasses,
-                SUM(CASE WHEN o.final_status = 'pending' THEN 1 ELSE 0 END) as pending,
-                SUM(CASE WHEN o.final_status = 'approved' THEN 1 ELSE 0 END) as approved,
-                SUM(CASE WHEN o.final_status = 'rejected' THEN 1 ELSE 0 END) as rejected,
-                SUM(CASE WHEN o.final_status = 'used' THEN 1 ELSE 0 END) as used
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            WHERE s.dept_id = %s
-        """, (dept_id,))
-        outpass_stats = cursor.fetchone()
-        
-        # Pending HOD approvals
-        cursor.execute("""
-            SELECT COUNT(*) as pending_hod
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            WHERE s.dept_id = %s AND o.hod_status = 'pending' AND o.advisor_status = 'approved'
-        """, (dept_id,))
-        pending_hod = cursor.fetchone()
-        
-        # Monthly trend (last 6 months)
-        cursor.execute("""
-            SELECT 
-                DATE_FORMAT(o.created_at, '%%Y-%%m') as month,
-                COUNT(*) as count
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            WHERE s.dept_id = %s
-            AND o.created_at >= DATE_SUB(NOW(), INTERVAL 6 MONTH)
-            GROUP BY DATE_FORMAT(o.created_at, '%%Y-%%m')
-            ORDER BY month DESC
-        """, (dept_id,))
-        monthly_trend = cursor.fetchall()
-        
-        # Top reasons for outpasses
-        cursor.execute("""
-            SELECT 
-                reason,
-                COUNT(*) as count
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            WHERE s.dept_id = %s
-            GROUP BY reason
-            ORDER BY count DESC
-            LIMIT 5
-        """, (dept_id,))
-        top_reasons = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        dept_id = hod.dept_id
+        statistics = dashboard_cache.get('dashboard.hod', dept_id, lambda conn: _department_statistics(conn, dept_id))
         
         return jsonify({
             'success': True,
-            'statistics': {
-                'total_students': students['total_students'],
-                'pending_hod_approval': pending_hod['pending_hod'],
-                'outpasses': outpass_stats,
-                'monthly_trend': monthly_trend,
-                'top_reasons': top_reasons
-            }
+            'statistics': statistics
         }), 200
         
     except Exception as e:
@@ -356,33 +491,37 @@ def override_approval(outpass_id):
         if not remarks or remarks.strip() == '':
             return jsonify({'success': False, 'message': 'Remarks required for override'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
+        hod = current_user()
+        if not hod:
+            return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
+        
         cursor = conn.cursor(dictionary=True)
         
         # Verify outpass belongs to HOD's department and fetch details
         cursor.execute("""
-            SELECT o.*, s.dept_id, s.full_name as student_name, s.parent_mobile, d.dept_name
+            SELECT o.*, s.full_name as student_name, s.parent_mobile, d.dept_name
             FROM outpasses o
             JOIN users s ON o.student_id = s.user_id
-            JOIN users h ON h.user_id = %s
-            LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE o.outpass_id = %s AND s.dept_id = h.dept_id
-        """, (session['user_id'], outpass_id))
+            LEFT JOIN departments d ON o.dept_id = d.dept_id
+            WHERE o.outpass_id = %s AND o.dept_id = %s
+        """, (outpass_id, hod.dept_id))
         
         outpass = cursor.fetchone()
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
         
         # Generate QR code
-        qr_token = generate_unique_qr_token(outpass_id)
-        qr_expires = get_ist_now() + timedelta(hours=1)  # QR valid for 1 hour
+        qr_issued = get_ist_now()
+        qr_expires = qr_issued + timedelta(hours=1)  # QR valid for 1 hour
+        qr_token = generate_signed_qr_token(outpass_id, outpass['student_id'], qr_expires, qr_issued)
         
+        conn.start_transaction()
         # Override approval
         cursor.execute("""
             UPDATE outpasses 
@@ -398,23 +537,24 @@ def override_approval(outpass_id):
             WHERE outpass_id = %s
         """, ('Override approval by HOD', remarks, qr_token, qr_expires, outpass_id))
         
-        conn.commit()
-        
-        # Log action
-        log_action(conn, outpass_id, session['user_id'], 'hod_approved', 
-                  f'OVERRIDE: {remarks}', get_client_ip())
-        
-        # Send notification to parent
+        # Queue parent notification; it commits with the approval and is sent in the background
         if outpass['parent_mobile']:
             message = (
                 f"Emergency Update: Your ward {outpass['student_name']}'s outpass "
                 f"({outpass['dept_name']}) has been approved by HOD (Emergency Override). "
                 f"Departure: {outpass['out_date']} {format_time(outpass['out_time'])}."
             )
-            send_sms_notification(outpass['parent_mobile'], message)
+            enqueue_sms(cursor, outpass['parent_mobile'], message, f"hod_approved:{outpass_id}", outpass_id)
+        
+        conn.commit()
+        notification_dispatcher.wake()
+        _statistics_changed()
+        
+        # Log action
+        log_action(conn, outpass_id, session['user_id'], 'hod_approved', 
+                  f'OVERRIDE: {remarks}', get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -425,65 +565,127 @@ def override_approval(outpass_id):
         print(f"Override approval error: {e}")
         return jsonify({'success': False, 'message': 'Failed to override approval'}), 500
 
+ALL_OUTPASSES_PAGE_SIZE = 50
+ALL_OUTPASSES_MAX_PAGE_SIZE = 200
+
+def _encode_page_cursor(created_at, outpass_id):
+    raw = f"{format_datetime(created_at)}|{outpass_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_page_cursor(cursor_token):
+    """Returns (created_at, outpass_id) or None for a malformed cursor"""
+    try:
+        padded = cursor_token + '=' * (-len(cursor_token) % 4)
+        created_at, outpass_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S'), int(outpass_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
 @hod_bp.route('/all-outpasses', methods=['GET'])
 @role_required('hod')
 def get_all_department_outpasses():
-    """Get all outpasses for the department with filters"""
+    """
+    Get the department's outpasses, newest first, one page at a time
+    Query params: status, academic_year, from_date, to_date, advisor_id,
+                  limit, cursor (next_cursor of the previous page), include_total
+    """
     try:
         status_filter = request.args.get('status')
+        academic_year = request.args.get('academic_year', type=int)
         from_date = request.args.get('from_date')
         to_date = request.args.get('to_date')
-        
-        conn = get_db_connection()
+        advisor_id = request.args.get('advisor_id', type=int)
+        include_total = request.args.get('include_total') in ('1', 'true')
+        limit = request.args.get('limit', ALL_OUTPASSES_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, ALL_OUTPASSES_MAX_PAGE_SIZE))
+        
+        after = None
+        if request.args.get('cursor'):
+            after = _decode_page_cursor(request.args['cursor'])
+            if after is None:
+                return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        # Get HOD's department
-        cursor.execute("SELECT dept_id FROM users WHERE user_id = %s", (session['user_id'],))
-        hod_dept = cursor.fetchone()
+        # HOD's department, from the request context
+        hod = current_user()
         
-        if not hod_dept:
+        if not hod or hod.dept_id is None:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Department not found'}), 404
         
-        # Build query
-        query = """
-            SELECT 
-                o.*,
-                s.full_name as student_name,
-                s.registration_no,
-                s.academic_year,
-                s.parent_mobile,
-                a.full_name as advisor_name,
-                d.dept_name
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            LEFT JOIN users a ON o.advisor_id = a.user_id
-            LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE s.dept_id = %s
-        """
-        params = [hod_dept['dept_id']]
+        # Filters; o.dept_id leads idx_outpasses_dept_created so pages are index range reads
+        where = " WHERE o.dept_id = %s"
+        params = [hod.dept_id]
         
         if status_filter:
-            query += " AND o.final_status = %s"
+            where += " AND o.final_status = %s"
             params.append(status_filter)
         
+        if academic_year:
+            where += " AND s.academic_year = %s"
+            params.append(academic_year)
+        
         if from_date:
-            query += " AND o.out_date >= %s"
+            where += " AND o.out_date >= %s"
             params.append(from_date)
         
         if to_date:
-            query += " AND o.out_date <= %s"
+            where += " AND o.out_date <= %s"
             params.append(to_date)
         
-        query += " ORDER BY o.created_at DESC LIMIT 100"
+        if advisor_id:
+            where += " AND o.advisor_id = %s"
+            params.append(advisor_id)
         
-        cursor.execute(query, params)
+        from_clause = """
+            FROM outpasses o
+            JOIN users s ON o.student_id = s.user_id
+            LEFT JOIN users a ON o.advisor_id = a.user_id
+            LEFT JOIN departments d ON o.dept_id = d.dept_id
+        """
+        
+        estimated_total = None
+        if include_total:
+            # Optimizer row estimate for the filtered range, not an exact COUNT(*)
+            cursor.execute("EXPLAIN SELECT o.outpass_id" + from_clause + where, params)
+            for row in cursor.fetchall():
+                if row.get('table') == 'o':
+                    estimated_total = int((row.get('rows') or 0) * float(row.get('filtered') or 100) / 100)
+                    break
+        
+        page_where = where
+        page_params = list(params)
+        if after:
+            page_where += " AND (o.created_at < %s OR (o.created_at = %s AND o.outpass_id < %s))"
+            page_params += [after[0], after[0], after[1]]
+        
+        cursor.execute("""
+            SELECT 
+                o.*,
+                s.full_name as student_name,
+                s.registration_no,
+                s.academic_year,
+                s.parent_mobile,
+                a.full_name as advisor_name,
+                d.dept_name
+        """ + from_clause + page_where + """
+            ORDER BY o.created_at DESC, o.outpass_id DESC
+            LIMIT %s
+        """, page_params + [limit + 1])
         outpasses = cursor.fetchall()
         
+        has_more = len(outpasses) > limit
+        outpasses = outpasses[:limit]
+        next_cursor = None
+        if has_more:
+            last = outpasses[-1]
+            next_cursor = _encode_page_cursor(last['created_at'], last['outpass_id'])
+        
         # Format dates
         for op in outpasses:
             op['out_date'] = format_date(op['out_date'])
@@ -492,12 +694,16 @@ def get_all_department_outpasses():
             op['created_at'] = format_datetime(op['created_at'])
         
         cursor.close()
-        conn.close()
         
-        return jsonify({
+        response = {
             'success': True,
-            'outpasses': outpasses
-        }), 200
+            'outpasses': outpasses,
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+        if include_total:
+            response['estimated_total'] = estimated_total
+        return jsonify(response), 200
         
     except Exception as e:
         print(f"Get all outpasses error: {e}")
@@ -506,93 +712,62 @@ def get_all_department_outpasses():
 @hod_bp.route('/download-history', methods=['GET'])
 @role_required('hod')
 def download_history():
-    """Download monthly outpass history report for HOD"""
+    """
+    Monthly outpass history report for the HOD's department
+    Query params: month (YYYY-MM, default current month)
+    Returns the PDF when an up to date copy exists, otherwise 202 with a job to poll.
+    """
     try:
-        conn = get_db_connection()
+        month = report_month(request.args.get('month'), get_ist_now())
+        if not month:
+            return jsonify({'success': False, 'message': 'month must be YYYY-MM'}), 400
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get HOD's department
-        cursor.execute("SELECT u.dept_id, d.dept_name FROM users u JOIN departments d ON u.dept_id = d.dept_id WHERE u.user_id = %s", (session['user_id'],))
-        hod_info = cursor.fetchone()
-        
-        if not hod_info:
-            cursor.close()
-            conn.close()
+        hod = current_user()
+        job = report_jobs.submit(conn, 'dept', hod.dept_id, month) if hod and hod.dept_id else None
+        if not job:
             return jsonify({'success': False, 'message': 'Department not found'}), 404
-            
-        dept_id = hod_info['dept_id']
-        dept_name = hod_info['dept_name']
-        
-        # Get department name and records for current month
-        # Improved query to join with users and get academic_year
-        current_year = get_ist_now().year
-        current_month = get_ist_now().month
-        cursor.execute("""
-            SELECT o.*, u.full_name as student_name, u.registration_no, u.academic_year, d.dept_name, a.full_name as advisor_name
-            FROM outpasses o
-            JOIN users u ON o.student_id = u.user_id
-            JOIN departments d ON u.dept_id = d.dept_id
-            LEFT JOIN users a ON o.advisor_id = a.user_id
-            WHERE u.dept_id = %s 
-            AND o.final_status IN ('approved', 'used')
-            AND (
-                (o.advisor_action_time IS NOT NULL AND MONTH(o.advisor_action_time) = %s AND YEAR(o.advisor_action_time) = %s)
-                OR (o.hod_action_time IS NOT NULL AND MONTH(o.hod_action_time) = %s AND YEAR(o.hod_action_time) = %s)
-            )
-            ORDER BY u.academic_year ASC, o.out_date DESC
-        """, (dept_id, current_month, current_year, current_month, current_year))
-        records = cursor.fetchall()
-        
-        # Group by year logic
-        # Assuming format like ABCD2023001 or 2023CSE001
-        # We'll try to extract the 4-digit year from the registration number
-        import re
-        # current_year and current_month are already defined above
-        # Academic year transition (assuming July start) - not strictly needed for grouping by academic_year column
-        
-        records_by_year = {} # Initialize as empty dict to allow dynamic keys
-        
-        for rec in records:
-            rec['out_date'] = format_date(rec['out_date'])
-            # Use academic_year if available, otherwise fallback to registration_no inference
-            year_level = rec.get('academic_year')
-            
-            if not year_level:
-                # Fallback to existing logic if academic_year is missing
-                reg_no = rec.get('registration_no') or ''
-                match = re.search(r'(\d{4})', reg_no)
-                if match:
-                    batch_year = int(match.group(1))
-                    academic_start_year = current_year if current_month >= 7 else current_year - 1
-                    calc_year = academic_start_year - batch_year + 1
-                    year_level = min(max(calc_year, 1), 3) # Cap between 1 and 3
-                else:
-                    year_level = 0 # Unknown
-            
-            year_label = f"Year {year_level}" if year_level > 0 else "Unknown Year"
-            
-            if year_label not in records_by_year:
-                records_by_year[year_label] = []
-            records_by_year[year_label].append(rec)
-     
-        cursor.close()
-        conn.close()
-        
-        now = get_ist_now()
-        month_name = now.strftime('%B')
-        year = now.strftime('%Y')
-        
-        pdf_bytes = generate_hod_monthly_report(dept_name, month_name, year, records_by_year)
         
-        return Response(
-            bytes(pdf_bytes),
-            mimetype="application/pdf",
-            headers={"Content-disposition": f"attachment; filename=Dept_Outpass_History_{month_name}_{year}.pdf"}
-        )
+        return report_response(job, '/api/hod/reports', 'Dept_Outpass_History')
         
     except Exception as e:
         print(f"Download history HOD error: {e}")
-        return jsonify({'success': False, 'message': 'Failed to generate PDF history'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'Failed to generate PDF history'}), 500
+
+def _own_report_job(job_id):
+    """True if the report job belongs to the logged-in HOD's department"""
+    scope, scope_id = job_scope(job_id)
+    if scope != 'dept':
+        return False
+    hod = current_user()
+    return bool(hod) and hod.dept_id == scope_id
+
+@hod_bp.route('/reports/<job_id>', methods=['GET'])
+@role_required('hod')
+def report_status(job_id):
+    """Poll a report job started by download-history"""
+    try:
+        if not _own_report_job(job_id):
+            return jsonify({'success': False, 'message': 'Report not found'}), 404
+        return jsonify(job_payload(report_jobs.status(job_id), '/api/hod/reports')), 200
+    except Exception as e:
+        print(f"Report status HOD error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to fetch report status'}), 500
+
+@hod_bp.route('/reports/<job_id>/download', methods=['GET'])
+@role_required('hod')
+def report_download(job_id):
+    """Download a finished report"""
+    try:
+        if not _own_report_job(job_id):
+            return jsonify({'success': False, 'message': 'Report not found'}), 404
+        job = report_jobs.status(job_id)
+        if job['status'] != 'done':
+            return jsonify(job_payload(job, '/api/hod/reports')), 409
+        return report_response(job, '/api/hod/reports', 'Dept_Outpass_History')
+    except Exception as e:
+        print(f"Report download HOD error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to download report'}), 500
\ No newline at end of file
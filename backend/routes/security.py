@@ -4,21 +4,75 @@ Handles security operations: QR code scanning, entry/exit logging
 """
 
 from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
+from backend.config import get_db
 from backend.utils.helpers import (
     role_required, format_datetime, format_date, format_time,
-    log_action, get_client_ip, is_qr_valid, get_ist_now, check_is_late
+    log_action, get_client_ip, is_qr_valid, get_ist_now, is_late_return,
+    verify_signed_qr_token
 )
+from backend.utils.gate_counters import record_gate_movement, get_gate_counts
+from backend.utils.dashboard_cache import dashboard_cache
+from backend.utils.daily_stats import outpass_buckets, recompute_buckets
 from datetime import datetime, timedelta
+import os
 
 security_bp = Blueprint('security', __name__, url_prefix='/api/security')
 
+def _scan_rejection(cursor, qr_code):
+    """
+    Explain why the conditional exit update claimed no row.
+    Only runs on the failure path, so successful scans never pay for it.
+    Returns (response_body, status_code).
+    """
+    cursor.execute("""
+        SELECT outpass_id, qr_code, qr_expires_at, is_qr_used, final_status, out_date
+        FROM outpasses
+        WHERE qr_code = %s
+    """, (qr_code,))
+    outpass = cursor.fetchone()
+    
+    if not outpass:
+        return {'success': False, 'message': 'Invalid QR code', 'valid': False}, 404
+    
+    is_valid, error_message = is_qr_valid(
+        outpass['qr_code'],
+        outpass['qr_expires_at'],
+        outpass['is_qr_used']
+    )
+    if not is_valid:
+        return {'success': False, 'message': error_message, 'valid': False}, 400
+    
+    if outpass['final_status'] != 'approved':
+        return {
+            'success': False,
+            'message': f'Outpass status: {outpass["final_status"]}',
+            'valid': False
+        }, 400
+    
+    outpass_date = outpass['out_date']
+    if isinstance(outpass_date, str):
+        outpass_date = datetime.strptime(outpass_date, '%Y-%m-%d').date()
+    
+    if outpass_date > get_ist_now().date():
+        return {
+            'success': False,
+            'message': 'Outpass is for a future date',
+            'valid': False,
+            'outpass_date': format_date(outpass_date)
+        }, 400
+    
+    # Passed every check now but not at update time: another gate claimed it first
+    return {'success': False, 'message': 'QR code already used', 'valid': False}, 400
+
 @security_bp.route('/scan-qr', methods=['POST'])
 @role_required('security')
 def scan_qr():
     """
     Scan and verify QR code for exit
     Request body: {qr_code}
+    
+    The exit is claimed by one conditional UPDATE, so when two gates scan the
+    same token concurrently exactly one of them records the exit.
     """
     try:
         data = request.get_json()
@@ -27,99 +81,73 @@ def scan_qr():
         if not qr_code:
             return jsonify({'success': False, 'message': 'QR code required'}), 400
         
-        conn = get_db_connection()
+        # Signed tokens are checked offline: forged, malformed or expired ones never reach the database
+        claims, token_error = verify_signed_qr_token(qr_code)
+        if token_error:
+            status = 404 if token_error == 'Invalid QR code' else 400
+            return jsonify({'success': False, 'message': token_error, 'valid': False}), status
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        # Find outpass by QR code
+        # Claim the exit and write the audit row in one transaction.
+        # LAST_INSERT_ID(outpass_id) hands the claimed id back via lastrowid.
+        # Signed tokens address the row by primary key; legacy tokens by qr_code.
+        claim_filter = "outpass_id = %s AND qr_code = %s" if claims else "qr_code = %s"
+        claim_params = (claims['outpass_id'], qr_code) if claims else (qr_code,)
+        conn.start_transaction()
+        cursor.execute(f"""
+            UPDATE outpasses 
+            SET actual_exit_time = NOW(),
+                exit_security_id = %s,
+                is_qr_used = TRUE,
+                final_status = 'used',
+                outpass_id = LAST_INSERT_ID(outpass_id)
+            WHERE {claim_filter}
+            AND is_qr_used = FALSE
+            AND final_status = 'approved'
+            AND (qr_expires_at IS NULL OR qr_expires_at >= NOW())
+            AND out_date <= CURDATE()
+        """, (session['user_id'],) + claim_params)
+        
+        if cursor.rowcount != 1:
+            conn.rollback()
+            body, status = _scan_rejection(cursor, qr_code)
+            cursor.close()
+            return jsonify(body), status
+        
+        outpass_id = cursor.lastrowid
+        log_action(conn, outpass_id, session['user_id'], 'exit_scanned',
+                  f'Student exited via QR scan', get_client_ip(), commit=False)
+        record_gate_movement(cursor, exits=1)
+        conn.commit()
+        dashboard_cache.invalidate('dashboard.security', 'all')
+        
+        # Student details only for a successful claim
         cursor.execute("""
             SELECT 
-                o.*,
+                o.outpass_id,
+                o.out_date,
+                o.out_time,
+                o.expected_return_time,
+                o.destination,
+                o.reason,
                 s.full_name as student_name,
                 s.registration_no,
-                s.academic_year,
                 s.phone as student_phone,
                 s.profile_image,
-                d.dept_name,
-                d.dept_code
+                d.dept_name
             FROM outpasses o
             JOIN users s ON o.student_id = s.user_id
             LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE o.qr_code = %s
-        """, (qr_code,))
+            WHERE o.outpass_id = %s
+        """, (outpass_id,))
         
         outpass = cursor.fetchone()
-        
-        if not outpass:
-            cursor.close()
-            conn.close()
-            return jsonify({
-                'success': False,
-                'message': 'Invalid QR code',
-                'valid': False
-            }), 404
-        
-        # Validate QR code
-        is_valid, error_message = is_qr_valid(
-            outpass['qr_code'],
-            outpass['qr_expires_at'],
-            outpass['is_qr_used']
-        )
-        
-        if not is_valid:
-            cursor.close()
-            conn.close()
-            return jsonify({
-                'success': False,
-                'message': error_message,
-                'valid': False
-            }), 400
-        
-        # Check if outpass is approved
-        if outpass['final_status'] != 'approved':
-            cursor.close()
-            conn.close()
-            return jsonify({
-                'success': False,
-                'message': f'Outpass status: {outpass["final_status"]}',
-                'valid': False
-            }), 400
-        
-        # Check if outpass date is valid (today or future)
-        outpass_date = outpass['out_date']
-        if isinstance(outpass_date, str):
-            outpass_date = datetime.strptime(outpass_date, '%Y-%m-%d').date()
-        
-        if outpass_date > get_ist_now().date():
-            cursor.close()
-            conn.close()
-            return jsonify({
-                'success': False,
-                'message': 'Outpass is for a future date',
-                'valid': False,
-                'outpass_date': format_date(outpass_date)
-            }), 400
-        
-        # Record exit
-        cursor.execute("""
-            UPDATE outpasses 
-            SET actual_exit_time = NOW(),
-                exit_security_id = %s,
-                is_qr_used = TRUE,
-                final_status = 'used'
-            WHERE outpass_id = %s
-        """, (session['user_id'], outpass['outpass_id']))
-        
-        conn.commit()
-        
-        # Log action
-        log_action(conn, outpass['outpass_id'], session['user_id'], 'exit_scanned',
-                  f'Student exited via QR scan', get_client_ip())
-        
         cursor.close()
-        conn.close()
         
         # Return success with student details
         return jsonify({
@@ -161,14 +189,22 @@ def verify_qr():
         if not qr_code:
             return jsonify({'success': False, 'message': 'QR code required'}), 400
         
-        conn = get_db_connection()
+        # Reject forged or malformed signed tokens without a lookup. Expiry is left to
+        # the database check below: an expired pass may still belong to a returning student.
+        claims, token_error = verify_signed_qr_token(qr_code, check_expiry=False)
+        if token_error:
+            return jsonify({'success': False, 'message': token_error, 'valid': False}), 404
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
         # Find outpass by QR code
-        cursor.execute("""
+        lookup_filter = "o.outpass_id = %s AND o.qr_code = %s" if claims else "o.qr_code = %s"
+        lookup_params = (claims['outpass_id'], qr_code) if claims else (qr_code,)
+        cursor.execute(f"""
             SELECT 
                 o.*,
                 s.full_name as student_name,
@@ -180,14 +216,13 @@ def verify_qr():
             FROM outpasses o
             JOIN users s ON o.student_id = s.user_id
             LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE o.qr_code = %s
-        """, (qr_code,))
+            WHERE {lookup_filter}
+        """, lookup_params)
         
         outpass = cursor.fetchone()
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({
                 'success': False,
                 'message': 'Invalid QR code',
@@ -209,7 +244,6 @@ def verify_qr():
             error_message = None
             
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -252,7 +286,7 @@ def record_entry():
         if not outpass_id and not qr_code:
             return jsonify({'success': False, 'message': 'Outpass ID or QR code required'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -260,7 +294,15 @@ def record_entry():
         
         # Find outpass
         if qr_code:
-            cursor.execute("SELECT * FROM outpasses WHERE qr_code = %s", (qr_code,))
+            claims, token_error = verify_signed_qr_token(qr_code, check_expiry=False)
+            if token_error:
+                cursor.close()
+                return jsonify({'success': False, 'message': token_error}), 404
+            if claims:
+                cursor.execute("SELECT * FROM outpasses WHERE outpass_id = %s AND qr_code = %s",
+                               (claims['outpass_id'], qr_code))
+            else:
+                cursor.execute("SELECT * FROM outpasses WHERE qr_code = %s", (qr_code,))
         else:
             cursor.execute("SELECT * FROM outpasses WHERE outpass_id = %s", (outpass_id,))
         
@@ -268,41 +310,47 @@ def record_entry():
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found'}), 404
         
         # Check if already exited
         if not outpass['actual_exit_time']:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Student has not exited yet'}), 400
         
         # Check if already returned
         if outpass['actual_entry_time']:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Entry already recorded'}), 400
         
         # Record entry
         entry_time = get_ist_now()
-        is_late = check_is_late(outpass['out_date'], outpass['expected_return_time'], entry_time)
+        is_late = is_late_return(outpass['expected_return_at'], entry_time)
         
+        # Entry, log row and gate counter commit together; the conditional
+        # update keeps a concurrent second scan from recording entry twice
+        conn.start_transaction()
         cursor.execute("""
             UPDATE outpasses 
             SET actual_entry_time = %s,
                 entry_security_id = %s
             WHERE outpass_id = %s
+            AND actual_entry_time IS NULL
         """, (entry_time, session['user_id'], outpass['outpass_id']))
         
-        conn.commit()
+        if cursor.rowcount != 1:
+            conn.rollback()
+            cursor.close()
+            return jsonify({'success': False, 'message': 'Entry already recorded'}), 400
         
         # Log action
         log_msg = 'Student returned' + (' (LATE) ⏰' if is_late else '')
         log_action(conn, outpass['outpass_id'], session['user_id'], 'entry_scanned',
-                  log_msg, get_client_ip())
+                  log_msg, get_client_ip(), commit=False)
+        record_gate_movement(cursor, entry_time.date(), entries=1)
         
+        conn.commit()
+        dashboard_cache.invalidate('dashboard.security', 'all')
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -321,7 +369,7 @@ def get_recent_activity():
     try:
         limit = request.args.get('limit', 20, type=int)
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -335,6 +383,7 @@ def get_recent_activity():
                 o.expected_return_time,
                 o.actual_exit_time,
                 o.actual_entry_time,
+                (o.expected_return_at IS NOT NULL AND o.actual_entry_time > o.expected_return_at) as is_late,
                 s.full_name as student_name,
                 s.registration_no,
                 s.academic_year,
@@ -353,22 +402,13 @@ def get_recent_activity():
         
         # Format datetime and check late status
         for activity in activities:
-            is_late = False
-            if activity['actual_entry_time']:
-                is_late = check_is_late(
-                    activity['out_date'], 
-                    activity['expected_return_time'], 
-                    activity['actual_entry_time']
-                )
-            
-            activity['is_late'] = is_late
+            activity['is_late'] = bool(activity['is_late'])
             activity['out_date'] = format_date(activity['out_date'])
             activity['actual_exit_time'] = format_datetime(activity['actual_exit_time'])
             activity['actual_entry_time'] = format_datetime(activity['actual_entry_time'])
             activity['expected_return_time'] = format_time(activity['expected_return_time'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -384,12 +424,13 @@ def get_recent_activity():
 def get_students_currently_out():
     """Get list of students currently outside (exited but not returned)"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
+        # Range scan on idx_outpasses_currently_out; lateness comes from the stored expected_return_at
         cursor.execute("""
             SELECT 
                 o.outpass_id,
@@ -397,6 +438,7 @@ def get_students_currently_out():
                 o.out_time,
                 o.expected_return_time,
                 o.actual_exit_time,
+                (o.expected_return_at IS NOT NULL AND o.expected_return_at < NOW()) as is_late,
                 s.full_name as student_name,
                 s.registration_no,
                 s.academic_year,
@@ -406,62 +448,22 @@ def get_students_currently_out():
             FROM outpasses o
             JOIN users s ON o.student_id = s.user_id
             LEFT JOIN departments d ON s.dept_id = d.dept_id
-            WHERE o.actual_exit_time IS NOT NULL 
-            AND o.actual_entry_time IS NULL
+            WHERE o.actual_entry_time IS NULL
+            AND o.actual_exit_time IS NOT NULL
             ORDER BY o.actual_exit_time DESC
         """)
         
         students = cursor.fetchall()
         
-        # Format datetime and check for late status
-        now_time = get_ist_now()
+        # Format datetime fields
         for student in students:
-            # Check if late: NOW > expected_return_time on the same day OR out_date < today
-            is_late = False
-            out_date = student['out_date']
-            exp_return = student['expected_return_time']
-            # Ensure out_date is a date object
-            if isinstance(out_date, str):
-                try:
-                    out_date = datetime.strptime(out_date, '%Y-%m-%d').date()
-                except:
-                    continue # Skip invalid dates
-
-            # Convert time to datetime for comparison if needed
-            if isinstance(exp_return, timedelta):
-                # MySQL TIME returns timedelta
-                total_seconds = exp_return.total_seconds()
-                hours = int(total_seconds // 3600)
-                minutes = int((total_seconds % 3600) // 60)
-                # Handle cases where hours might be >= 24 (though rare for time of day)
-                try:
-                    exp_datetime = datetime.combine(out_date, datetime.min.time().replace(hour=hours % 24, minute=minutes))
-                except:
-                    exp_datetime = datetime.combine(out_date, datetime.max.time())
-            elif hasattr(exp_return, 'hour'): # It's a time object
-                exp_datetime = datetime.combine(out_date, exp_return)
-            else:
-                # Fallback if it's a string or other
-                try:
-                    exp_time = datetime.strptime(str(exp_return), '%H:%M:%S').time()
-                    exp_datetime = datetime.combine(out_date, exp_time)
-                except:
-                    exp_datetime = datetime.combine(out_date, datetime.max.time())
-            
-            # If expected return is 23:59:00, it's usually "Not Returning Today"
-            if str(exp_return) == '23:59:00':
-                is_late = False # Won't be marked late today
-            elif now_time > exp_datetime:
-                is_late = True
-
-            student['is_late'] = is_late
+            student['is_late'] = bool(student['is_late'])
             student['out_date'] = format_date(student['out_date'])
             student['out_time'] = format_time(student['out_time'])
             student['expected_return_time'] = format_time(student['expected_return_time'])
             student['actual_exit_time'] = format_datetime(student['actual_exit_time'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -473,68 +475,354 @@ def get_students_currently_out():
         print(f"Get students out error: {e}")
         return jsonify({'success': False, 'message': f'Failed to fetch students: {str(e)}'}), 500
 
+def _security_stats(conn):
+    """Gate dashboard figures; shared by every security user"""
+    cursor = conn.cursor(dictionary=True)
+    
+    # Students currently out and overdue among them: one range scan on idx_outpasses_currently_out
+    cursor.execute("""
+        SELECT 
+            COUNT(*) as students_out,
+            COALESCE(SUM(expected_return_at < NOW()), 0) as overdue_count
+        FROM outpasses
+        WHERE actual_entry_time IS NULL AND actual_exit_time IS NOT NULL
+    """)
+    currently_out = cursor.fetchone()
+    
+    # Exits/entries today from the daily gate counters (one primary key read)
+    exits_today, entries_today = get_gate_counts(cursor)
+    
+    cursor.close()
+    
+    return {
+        'students_currently_out': currently_out['students_out'],
+        'exits_today': exits_today,
+        'entries_today': entries_today,
+        'overdue_count': int(currently_out['overdue_count'])
+    }
+
 @security_bp.route('/dashboard-stats', methods=['GET'])
 @role_required('security')
 def get_security_stats():
     """Get dashboard statistics for security"""
     try:
-        conn = get_db_connection()
+        return jsonify({
+            'success': True,
+            'stats': dashboard_cache.get('dashboard.security', 'all', _security_stats)
+        }), 200
+        
+    except Exception as e:
+        print(f"Get stats error: {e}")
+        return jsonify({'success': False, 'message': f'Failed to fetch statistics: {str(e)}'}), 500
+
+# ================= OFFLINE KIOSK MODE =================
+
+KIOSK_SYNC_MAX_EVENTS = 500
+# Scans older than this are not accepted; a kiosk offline for longer must be cleared by hand
+KIOSK_MAX_OFFLINE_HOURS = float(os.getenv('KIOSK_MAX_OFFLINE_HOURS', 24))
+# Allowed drift of a kiosk clock against the server's when checking scans against token issue time
+KIOSK_CLOCK_SKEW = timedelta(minutes=5)
+
+def _parse_scanned_at(value, now):
+    """Parse a kiosk timestamp (IST 'YYYY-MM-DD HH:MM:SS'); never later than now"""
+    try:
+        scanned_at = datetime.strptime(str(value)[:19].replace('T', ' '), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return min(scanned_at, now)
+
+def _parse_outpass_id(value):
+    """Positive integer outpass id from a kiosk event, or None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        outpass_id = int(str(value).strip())
+    except ValueError:
+        return None
+    return outpass_id if outpass_id > 0 else None
+
+@security_bp.route('/kiosk-manifest', methods=['GET'])
+@role_required('security')
+def get_kiosk_manifest():
+    """
+    Compact manifest for offline gate kiosks
+    Approved passes for today and tomorrow (for exits) plus students
+    currently outside (for entries).
+    """
+    try:
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        # Students currently out
         cursor.execute("""
-            SELECT COUNT(*) as students_out
-            FROM outpasses
-            WHERE actual_exit_time IS NOT NULL AND actual_entry_time IS NULL
+            SELECT 
+                o.outpass_id,
+                o.qr_code,
+                o.out_date,
+                o.out_time,
+                o.expected_return_time,
+                o.qr_expires_at,
+                o.reason,
+                o.actual_exit_time,
+                s.full_name as student_name,
+                s.registration_no,
+                s.academic_year,
+                s.profile_image,
+                d.dept_name
+            FROM outpasses o
+            JOIN users s ON o.student_id = s.user_id
+            LEFT JOIN departments d ON s.dept_id = d.dept_id
+            WHERE (
+                o.final_status = 'approved'
+                AND o.is_qr_used = FALSE
+                AND o.out_date BETWEEN CURDATE() AND CURDATE() + INTERVAL 1 DAY
+            ) OR (
+                o.actual_exit_time IS NOT NULL AND o.actual_entry_time IS NULL
+            )
         """)
-        currently_out = cursor.fetchone()
+        rows = cursor.fetchall()
+        cursor.close()
         
-        # Total exits today
-        cursor.execute("""
-            SELECT COUNT(*) as exits_today
-            FROM outpasses
-            WHERE DATE(actual_exit_time) = CURDATE()
-        """)
-        exits_today = cursor.fetchone()
+        passes = []
+        for row in rows:
+            passes.append({
+                'outpass_id': row['outpass_id'],
+                'token': row['qr_code'],
+                'state': 'out' if row['actual_exit_time'] else 'approved',
+                'student_name': row['student_name'],
+                'registration_no': row['registration_no'],
+                'academic_year': row['academic_year'],
+                'department': row['dept_name'],
+                'profile_image': row['profile_image'].replace('uploads/', '', 1).lstrip('/') if row.get('profile_image') else None,
+                'out_date': format_date(row['out_date']),
+                'out_time': format_time(row['out_time']),
+                'expected_return_time': format_time(row['expected_return_time']),
+                'valid_until': format_datetime(row['qr_expires_at']),
+                'reason': row['reason']
+            })
         
-        # Total entries today
-        cursor.execute("""
-            SELECT COUNT(*) as entries_today
-            FROM outpasses
-            WHERE DATE(actual_entry_time) = CURDATE()
-        """)
-        entries_today = cursor.fetchone()
+        return jsonify({
+            'success': True,
+            'generated_at': format_datetime(get_ist_now()),
+            'passes': passes
+        }), 200
         
-        # Overdue students
-        cursor.execute("""
-            SELECT COUNT(*) as overdue_count
-            FROM outpasses
-            WHERE actual_exit_time IS NOT NULL 
-            AND actual_entry_time IS NULL
-            AND expected_return_time != '23:59:00'
-            AND (
-                DATE(out_date) < CURDATE()
-                OR (DATE(out_date) = CURDATE() AND TIME(expected_return_time) < TIME(NOW()))
-            )
-        """)
-        overdue = cursor.fetchone()
+    except Exception as e:
+        print(f"Kiosk manifest error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to build kiosk manifest'}), 500
+
+def _apply_kiosk_exit(cursor, conn, row_filter, row_params, scanned_at, kiosk_id):
+    """Apply one queued exit. Earliest exit wins when a token was scanned more than once."""
+    cursor.execute(f"""
+        UPDATE outpasses 
+        SET actual_exit_time = %s,
+            exit_security_id = %s,
+            is_qr_used = TRUE,
+            final_status = 'used',
+            outpass_id = LAST_INSERT_ID(outpass_id)
+        WHERE {row_filter}
+        AND is_qr_used = FALSE
+        AND final_status = 'approved'
+        AND (qr_expires_at IS NULL OR qr_expires_at >= %s)
+        AND out_date <= DATE(%s)
+    """, (scanned_at, session['user_id']) + row_params + (scanned_at, scanned_at))
+    
+    if cursor.rowcount == 1:
+        log_action(conn, cursor.lastrowid, session['user_id'], 'exit_scanned',
+                  f'Student exited via offline kiosk {kiosk_id}', get_client_ip(), commit=False)
+        record_gate_movement(cursor, scanned_at.date(), exits=1)
+        return 'applied', 'Exit recorded'
+    
+    cursor.execute(f"""
+        SELECT outpass_id, qr_code, qr_expires_at, is_qr_used, final_status, actual_exit_time
+        FROM outpasses WHERE {row_filter}
+    """, row_params)
+    outpass = cursor.fetchone()
+    
+    if not outpass:
+        return 'rejected', 'Invalid QR code'
+    
+    if outpass['actual_exit_time']:
+        # Scanned twice (another kiosk or the online gate): keep the earliest exit
+        if scanned_at < outpass['actual_exit_time']:
+            # The rollup refresh only sees the new day, so recount the old one here
+            buckets = outpass_buckets(cursor, "outpass_id = %s", (outpass['outpass_id'],))
+            cursor.execute("""
+                UPDATE outpasses SET actual_exit_time = %s
+                WHERE outpass_id = %s AND actual_exit_time > %s
+            """, (scanned_at, outpass['outpass_id'], scanned_at))
+            if cursor.rowcount == 1:
+                buckets |= outpass_buckets(cursor, "outpass_id = %s", (outpass['outpass_id'],))
+                recompute_buckets(cursor, buckets)
+                if scanned_at.date() != outpass['actual_exit_time'].date():
+                    record_gate_movement(cursor, outpass['actual_exit_time'].date(), exits=-1)
+                    record_gate_movement(cursor, scanned_at.date(), exits=1)
+            return 'merged', 'Exit already recorded; kept the earlier scan time'
+        return 'duplicate', 'Exit already recorded'
+    
+    if outpass['final_status'] != 'approved':
+        return 'rejected', f'Outpass status: {outpass["final_status"]}'
+    
+    if outpass['qr_expires_at'] and scanned_at > outpass['qr_expires_at']:
+        return 'rejected', 'QR code expired'
+    
+    return 'rejected', 'Outpass is for a future date'
+
+def _apply_kiosk_entry(cursor, conn, row_filter, row_params, scanned_at, kiosk_id):
+    """Apply one queued entry. Earliest entry wins when a return was scanned more than once."""
+    cursor.execute(f"""
+        UPDATE outpasses 
+        SET actual_entry_time = %s,
+            entry_security_id = %s,
+            outpass_id = LAST_INSERT_ID(outpass_id)
+        WHERE {row_filter}
+        AND actual_exit_time IS NOT NULL
+        AND actual_entry_time IS NULL
+        AND actual_exit_time <= %s
+    """, (scanned_at, session['user_id']) + row_params + (scanned_at,))
+    
+    applied = cursor.rowcount == 1
+    if applied:
+        outpass_id = cursor.lastrowid
+    
+    cursor.execute(f"""
+        SELECT outpass_id, expected_return_at, actual_exit_time, actual_entry_time
+        FROM outpasses WHERE {row_filter}
+    """, row_params)
+    outpass = cursor.fetchone()
+    
+    if applied:
+        is_late = is_late_return(outpass['expected_return_at'], scanned_at)
+        log_msg = f'Student returned via offline kiosk {kiosk_id}' + (' (LATE) ⏰' if is_late else '')
+        log_action(conn, outpass_id, session['user_id'], 'entry_scanned',
+                  log_msg, get_client_ip(), commit=False)
+        record_gate_movement(cursor, scanned_at.date(), entries=1)
+        return 'applied', 'Entry recorded' + (' (LATE) ⏰' if is_late else '')
+    
+    if not outpass:
+        return 'rejected', 'Outpass not found'
+    
+    if outpass['actual_entry_time']:
+        if scanned_at < outpass['actual_entry_time'] and scanned_at >= outpass['actual_exit_time']:
+            # As for exits: the old day's entry (and late return) is recounted here
+            buckets = outpass_buckets(cursor, "outpass_id = %s", (outpass['outpass_id'],))
+            cursor.execute("""
+                UPDATE outpasses SET actual_entry_time = %s
+                WHERE outpass_id = %s AND actual_entry_time > %s
+            """, (scanned_at, outpass['outpass_id'], scanned_at))
+            if cursor.rowcount == 1:
+                buckets |= outpass_buckets(cursor, "outpass_id = %s", (outpass['outpass_id'],))
+                recompute_buckets(cursor, buckets)
+                if scanned_at.date() != outpass['actual_entry_time'].date():
+                    record_gate_movement(cursor, outpass['actual_entry_time'].date(), entries=-1)
+                    record_gate_movement(cursor, scanned_at.date(), entries=1)
+            return 'merged', 'Entry already recorded; kept the earlier scan time'
+        return 'duplicate', 'Entry already recorded'
+    
+    if not outpass['actual_exit_time']:
+        return 'rejected', 'Student has not exited yet'
+    
+    return 'rejected', 'Entry scan is earlier than the recorded exit'
+
+@security_bp.route('/kiosk-sync', methods=['POST'])
+@role_required('security')
+def kiosk_sync():
+    """
+    Upload exit/entry events queued by an offline kiosk
+    Request body: {kiosk_id, events: [{event_id, type: 'exit'|'entry', qr_code, outpass_id, scanned_at}]}
+    Events are applied in scan order inside one transaction. Each gets an outcome:
+    applied, merged (already recorded, earlier time kept), duplicate or rejected.
+    """
+    try:
+        data = request.get_json() or {}
+        kiosk_id = str(data.get('kiosk_id') or 'unknown')[:40]
+        events = data.get('events') or []
+        
+        if not isinstance(events, list) or not events:
+            return jsonify({'success': False, 'message': 'No events to sync'}), 400
+        
+        if len(events) > KIOSK_SYNC_MAX_EVENTS:
+            return jsonify({'success': False, 'message': f'At most {KIOSK_SYNC_MAX_EVENTS} events per sync'}), 400
+        
+        now = get_ist_now()
+        oldest_scan = now - timedelta(hours=KIOSK_MAX_OFFLINE_HOURS)
+        results = []
+        pending = []
+        
+        # Validate offline first: malformed events and forged tokens never touch the database
+        for event in events:
+            if not isinstance(event, dict):
+                results.append({'event_id': None, 'status': 'rejected', 'message': 'Malformed event'})
+                continue
+            
+            event_id = event.get('event_id')
+            event_type = event.get('type')
+            qr_code = str(event.get('qr_code') or '').strip()
+            raw_outpass_id = event.get('outpass_id')
+            outpass_id = _parse_outpass_id(raw_outpass_id) if raw_outpass_id not in (None, '') else None
+            scanned_at = _parse_scanned_at(event.get('scanned_at'), now)
+            
+            error = None
+            if event_type not in ('exit', 'entry'):
+                error = 'Unknown event type'
+            elif scanned_at is None:
+                error = 'Invalid scan time'
+            elif scanned_at < oldest_scan:
+                error = f'Scan is older than {KIOSK_MAX_OFFLINE_HOURS:g} hours'
+            elif raw_outpass_id not in (None, '') and outpass_id is None:
+                error = 'Invalid outpass ID'
+            elif event_type == 'exit' and not qr_code:
+                error = 'QR code required'
+            elif not qr_code and not outpass_id:
+                error = 'Outpass ID or QR code required'
+            
+            claims = None
+            if not error and qr_code:
+                claims, error = verify_signed_qr_token(qr_code, check_expiry=False)
+            if claims and scanned_at < claims['valid_from'] - KIOSK_CLOCK_SKEW:
+                error = 'Scan time is before the QR code was issued'
+            
+            if error:
+                results.append({'event_id': event_id, 'status': 'rejected', 'message': error})
+                continue
+            
+            if claims:
+                row_filter, row_params = "outpass_id = %s AND qr_code = %s", (claims['outpass_id'], qr_code)
+            elif qr_code:
+                row_filter, row_params = "qr_code = %s", (qr_code,)
+            else:
+                row_filter, row_params = "outpass_id = %s", (outpass_id,)
+            
+            pending.append((scanned_at, event_type == 'entry', event, row_filter, row_params))
         
-        cursor.close()
-        conn.close()
+        if pending:
+            conn = get_db()
+            if not conn:
+                return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+            
+            cursor = conn.cursor(dictionary=True)
+            
+            # Scan order, exits before entries at the same instant
+            pending.sort(key=lambda p: (p[0], p[1]))
+            
+            conn.start_transaction()
+            for scanned_at, is_entry, event, row_filter, row_params in pending:
+                apply = _apply_kiosk_entry if is_entry else _apply_kiosk_exit
+                status, message = apply(cursor, conn, row_filter, row_params, scanned_at, kiosk_id)
+                results.append({'event_id': event.get('event_id'), 'status': status, 'message': message})
+            conn.commit()
+            dashboard_cache.invalidate('dashboard.security', 'all')
+            
+            cursor.close()
         
         return jsonify({
             'success': True,
-            'stats': {
-                'students_currently_out': currently_out['students_out'],
-                'exits_today': exits_today['exits_today'],
-                'entries_today': entries_today['entries_today'],
-                'overdue_count': overdue['overdue_count']
-            }
+            'results': results,
+            'applied': sum(1 for r in results if r['status'] == 'applied')
         }), 200
         
     except Exception as e:
-        print(f"Get stats error: {e}")
-        return jsonify({'success': False, 'message': f'Failed to fetch statistics: {str(e)}'}), 500
\ No newline at end of file
+        print(f"Kiosk sync error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to sync kiosk events'}), 500
@@ -4,23 +4,31 @@ Handles advisor operations: view pending requests, approve/reject, view history
 """
 
 from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
+from backend.config import get_db
 from backend.utils.helpers import (
     role_required, format_datetime, format_date, format_time,
-    log_action, get_client_ip, generate_unique_qr_token, generate_qr_code, get_ist_now
+    log_action, get_client_ip, generate_unique_qr_token, generate_qr_code, get_ist_now,
+    parse_id_list
 )
-from backend.utils.pdf_generator import generate_staff_monthly_report
+from backend.utils.reports import report_jobs, report_month, report_response, job_payload, job_scope
+from backend.utils.audit import insert_log_rows
+from backend.utils.context import current_user
+from backend.utils.dashboard_cache import dashboard_cache
 from datetime import datetime, timedelta
-from flask import Response
 
 staff_bp = Blueprint('staff', __name__, url_prefix='/api/staff')
 
+def _statistics_changed():
+    """Drop the cached figures an advisor decision changes: the advisor's and the HODs' pending counts"""
+    dashboard_cache.invalidate('dashboard.staff', session['user_id'])
+    dashboard_cache.invalidate('dashboard.hod')
+
 @staff_bp.route('/pending-requests', methods=['GET'])
 @role_required('staff', 'hod')
 def get_pending_requests():
     """Get all pending outpass requests for advisor"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -67,7 +75,6 @@ def get_pending_requests():
 
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -93,7 +100,7 @@ def approve_request(outpass_id):
         if not parent_called:
             return jsonify({'success': False, 'message': 'Parent confirmation is required before approval'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -109,12 +116,10 @@ def approve_request(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
         
         if outpass['advisor_status'] != 'pending':
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Request already processed'}), 400
         
         # Update outpass - advisor approval
@@ -128,13 +133,13 @@ def approve_request(outpass_id):
         """, (remarks, outpass_id))
         
         conn.commit()
+        _statistics_changed()
         
         # Log action
         log_action(conn, outpass_id, session['user_id'], 'advisor_approved', 
                   remarks, get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -159,7 +164,7 @@ def reject_request(outpass_id):
         if not remarks or remarks.strip() == '':
             return jsonify({'success': False, 'message': 'Remarks required for rejection'}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -175,12 +180,10 @@ def reject_request(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found or unauthorized'}), 404
         
         if outpass['advisor_status'] != 'pending':
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Request already processed'}), 400
         
         # Update outpass - advisor rejection
@@ -194,13 +197,13 @@ def reject_request(outpass_id):
         """, (remarks, outpass_id))
         
         conn.commit()
+        _statistics_changed()
         
         # Log action
         log_action(conn, outpass_id, session['user_id'], 'advisor_rejected', 
                   remarks, get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -211,12 +214,123 @@ def reject_request(outpass_id):
         print(f"Reject request error: {e}")
         return jsonify({'success': False, 'message': 'Failed to reject request'}), 500
 
+STAFF_BATCH_MAX = 200
+
+@staff_bp.route('/decide-batch', methods=['POST'])
+@role_required('staff')
+def decide_batch():
+    """
+    Approve and/or reject many outpass requests in one call (advisor level)
+    Request body: {approve_ids, reject_ids, approve_remarks, reject_remarks, parent_called}
+    Response: ids approved, ids rejected, and {id: reason} for those skipped
+    """
+    try:
+        data = request.get_json() or {}
+        
+        try:
+            approve_ids = parse_id_list(data.get('approve_ids'))
+            reject_ids = parse_id_list(data.get('reject_ids'))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'approve_ids and reject_ids must be lists of ids'}), 400
+        
+        approve_remarks = data.get('approve_remarks') or 'Approved by advisor'
+        reject_remarks = (data.get('reject_remarks') or '').strip()
+        
+        if not approve_ids and not reject_ids:
+            return jsonify({'success': False, 'message': 'No requests selected'}), 400
+        if set(approve_ids) & set(reject_ids):
+            return jsonify({'success': False, 'message': 'A request cannot be approved and rejected together'}), 400
+        if len(approve_ids) + len(reject_ids) > STAFF_BATCH_MAX:
+            return jsonify({'success': False, 'message': f'At most {STAFF_BATCH_MAX} requests per batch'}), 400
+        if approve_ids and not data.get('parent_called', False):
+            return jsonify({'success': False, 'message': 'Parent confirmation is required before approval'}), 400
+        if reject_ids and not reject_remarks:
+            return jsonify({'success': False, 'message': 'Remarks required for rejection'}), 400
+        
+        conn = get_db()
+        if not conn:
+            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        
+        cursor = conn.cursor(dictionary=True)
+        all_ids = approve_ids + reject_ids
+        
+        conn.start_transaction()
+        
+        # Ownership and state for every id in one query, locked until commit
+        cursor.execute(f"""
+            SELECT outpass_id, advisor_status FROM outpasses
+            WHERE outpass_id IN ({', '.join(['%s'] * len(all_ids))}) AND advisor_id = %s
+            FOR UPDATE
+        """, (*all_ids, session['user_id']))
+        status_by_id = {row['outpass_id']: row['advisor_status'] for row in cursor.fetchall()}
+        
+        skipped = {}
+        def pending_only(ids):
+            ready = []
+            for outpass_id in ids:
+                if outpass_id not in status_by_id:
+                    skipped[outpass_id] = 'not_found'
+                elif status_by_id[outpass_id] != 'pending':
+                    skipped[outpass_id] = 'already_processed'
+                else:
+                    ready.append(outpass_id)
+            return ready
+        
+        approved = pending_only(approve_ids)
+        rejected = pending_only(reject_ids)
+        
+        if approved:
+            cursor.execute(f"""
+                UPDATE outpasses 
+                SET advisor_status = 'approved',
+                    advisor_remarks = %s,
+                    advisor_action_time = NOW(),
+                    hod_status = 'pending'
+                WHERE outpass_id IN ({', '.join(['%s'] * len(approved))})
+                AND advisor_id = %s AND advisor_status = 'pending'
+            """, (approve_remarks, *approved, session['user_id']))
+        
+        if rejected:
+            cursor.execute(f"""
+                UPDATE outpasses 
+                SET advisor_status = 'rejected',
+                    advisor_remarks = %s,
+                    advisor_action_time = NOW(),
+                    final_status = 'rejected'
+                WHERE outpass_id IN ({', '.join(['%s'] * len(rejected))})
+                AND advisor_id = %s AND advisor_status = 'pending'
+            """, (reject_remarks, *rejected, session['user_id']))
+        
+        if approved or rejected:
+            now = get_ist_now()
+            ip_address = get_client_ip()
+            insert_log_rows(cursor,
+                [(i, session['user_id'], 'advisor_approved', approve_remarks, ip_address, now) for i in approved] +
+                [(i, session['user_id'], 'advisor_rejected', reject_remarks, ip_address, now) for i in rejected])
+            conn.commit()
+            _statistics_changed()
+        else:
+            conn.rollback()
+        
+        cursor.close()
+        
+        return jsonify({
+            'success': True,
+            'approved': approved,
+            'rejected': rejected,
+            'skipped': skipped
+        }), 200
+        
+    except Exception as e:
+        print(f"Decide batch error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to process requests'}), 500
+
 @staff_bp.route('/student-history/<int:student_id>', methods=['GET'])
 @role_required('staff', 'hod')
 def get_student_history(student_id):
     """Get outpass history for a specific student"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -233,17 +347,17 @@ def get_student_history(student_id):
         
         # If HOD, can view any student in department
         if not student and session['role'] == 'hod':
-            cursor.execute("""
-                SELECT u.*, d.dept_name FROM users u
-                JOIN users h ON u.dept_id = h.dept_id
-                LEFT JOIN departments d ON u.dept_id = d.dept_id
-                WHERE u.user_id = %s AND h.user_id = %s
-            """, (student_id, session['user_id']))
-            student = cursor.fetchone()
+            hod = current_user()
+            if hod and hod.dept_id is not None:
+                cursor.execute("""
+                    SELECT u.*, d.dept_name FROM users u
+                    LEFT JOIN departments d ON u.dept_id = d.dept_id
+                    WHERE u.user_id = %s AND u.dept_id = %s
+                """, (student_id, hod.dept_id))
+                student = cursor.fetchone()
         
         if not student:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Student not found or unauthorized'}), 404
         
         # Get outpass history
@@ -271,7 +385,6 @@ def get_student_history(student_id):
             item['hod_action_time'] = format_datetime(item['hod_action_time'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -295,7 +408,7 @@ def get_student_history(student_id):
 def get_my_students():
     """Get list of students assigned to this advisor"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -324,7 +437,6 @@ def get_my_students():
         students = cursor.fetchall()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -335,57 +447,57 @@ def get_my_students():
         print(f"Get students error: {e}")
         return jsonify({'success': False, 'message': 'Failed to fetch students'}), 500
 
+def _staff_stats(conn, advisor_id):
+    """Dashboard figures for one advisor"""
+    cursor = conn.cursor(dictionary=True)
+    
+    # Get pending requests count
+    cursor.execute("""
+        SELECT COUNT(*) as pending_count
+        FROM outpasses
+        WHERE advisor_id = %s AND advisor_status = 'pending'
+    """, (advisor_id,))
+    
+    pending = cursor.fetchone()
+    
+    # Get total students
+    cursor.execute("""
+        SELECT COUNT(*) as student_count
+        FROM users
+        WHERE advisor_id = %s AND role = 'student' AND is_active = TRUE
+    """, (advisor_id,))
+    
+    students = cursor.fetchone()
+    
+    # Get total processed this month
+    cursor.execute("""
+        SELECT COUNT(*) as processed_count
+        FROM outpasses
+        WHERE advisor_id = %s 
+        AND advisor_status != 'pending'
+        AND MONTH(advisor_action_time) = MONTH(CURRENT_DATE())
+        AND YEAR(advisor_action_time) = YEAR(CURRENT_DATE())
+    """, (advisor_id,))
+    
+    processed = cursor.fetchone()
+    
+    cursor.close()
+    
+    return {
+        'pending_requests': pending['pending_count'],
+        'total_students': students['student_count'],
+        'processed_this_month': processed['processed_count']
+    }
+
 @staff_bp.route('/dashboard-stats', methods=['GET'])
 @role_required('staff')
 def get_staff_stats():
     """Get dashboard statistics for staff"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get pending requests count
-        cursor.execute("""
-            SELECT COUNT(*) as pending_count
-            FROM outpasses
-            WHERE advisor_id = %s AND advisor_status = 'pending'
-        """, (session['user_id'],))
-        
-        pending = cursor.fetchone()
-        
-        # Get total students
-        cursor.execute("""
-            SELECT COUNT(*) as student_count
-            FROM users
-            WHERE advisor_id = %s AND role = 'student' AND is_active = TRUE
-        """, (session['user_id'],))
-        
-        students = cursor.fetchone()
-        
-        # Get total processed this month
-        cursor.execute("""
-            SELECT COUNT(*) as processed_count
-            FROM outpasses
-            WHERE advisor_id = %s 
-            AND advisor_status != 'pending'
-            AND MONTH(advisor_action_time) = MONTH(CURRENT_DATE())
-            AND YEAR(advisor_action_time) = YEAR(CURRENT_DATE())
-        """, (session['user_id'],))
-        
-        processed = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
+        advisor_id = session['user_id']
         return jsonify({
             'success': True,
-            'stats': {
-                'pending_requests': pending['pending_count'],
-                'total_students': students['student_count'],
-                'processed_this_month': processed['processed_count']
-            }
+            'stats': dashboard_cache.get('dashboard.staff', advisor_id, lambda conn: _staff_stats(conn, advisor_id))
         }), 200
         
     except Exception as e:
@@ -395,57 +507,53 @@ def get_staff_stats():
 @staff_bp.route('/download-history', methods=['GET'])
 @role_required('staff')
 def download_history():
-    """Download monthly outpass history report for staff"""
+    """
+    Monthly report of the requests this advisor processed
+    Query params: month (YYYY-MM, default current month)
+    Returns the PDF when an up to date copy exists, otherwise 202 with a job to poll.
+    """
     try:
-        conn = get_db_connection()
+        month = report_month(request.args.get('month'), get_ist_now())
+        if not month:
+            return jsonify({'success': False, 'message': 'month must be YYYY-MM'}), 400
+        
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
-        cursor = conn.cursor(dictionary=True)
+        job = report_jobs.submit(conn, 'advisor', session['user_id'], month)
+        if not job:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
         
-        # Get processed requests for this month for this advisor
-        query = """
-            SELECT 
-                o.*,
-                s.full_name as student_name,
-                s.registration_no
-            FROM outpasses o
-            JOIN users s ON o.student_id = s.user_id
-            WHERE o.advisor_id = %s 
-            AND o.advisor_status != 'pending'
-            AND MONTH(o.advisor_action_time) = MONTH(CURRENT_DATE())
-            AND YEAR(o.advisor_action_time) = YEAR(CURRENT_DATE())
-            ORDER BY o.advisor_action_time DESC
-        """
-        
-        cursor.execute(query, (session['user_id'],))
-        records = cursor.fetchall()
-        
-        # Format dates for PDF
-        for rec in records:
-            rec['out_date'] = format_date(rec['out_date'])
-            
-        # Get staff name
-        cursor.execute("SELECT full_name FROM users WHERE user_id = %s", (session['user_id'],))
-        staff_user = cursor.fetchone()
-        staff_name = staff_user['full_name'] if staff_user else 'Staff'
-        
-        cursor.close()
-        conn.close()
-        
-        now = get_ist_now()
-        month_name = now.strftime('%B')
-        year = now.strftime('%Y')
-        
-        pdf_bytes = generate_staff_monthly_report(staff_name, month_name, year, records)
-        
-        # Use Response to return binary PDF
-        return Response(
-            bytes(pdf_bytes),
-            mimetype="application/pdf",
-            headers={"Content-disposition": f"attachment; filename=Outpass_History_{month_name}_{year}.pdf"}
-        )
+        return report_response(job, '/api/staff/reports', 'Outpass_History')
         
     except Exception as e:
         print(f"Download history error: {e}")
-        return jsonify({'success': False, 'message': 'Failed to generate PDF history'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'Failed to generate PDF history'}), 500
+
+@staff_bp.route('/reports/<job_id>', methods=['GET'])
+@role_required('staff')
+def report_status(job_id):
+    """Poll a report job started by download-history"""
+    try:
+        if job_scope(job_id) != ('advisor', session['user_id']):
+            return jsonify({'success': False, 'message': 'Report not found'}), 404
+        return jsonify(job_payload(report_jobs.status(job_id), '/api/staff/reports')), 200
+    except Exception as e:
+        print(f"Report status error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to fetch report status'}), 500
+
+@staff_bp.route('/reports/<job_id>/download', methods=['GET'])
+@role_required('staff')
+def report_download(job_id):
+    """Download a finished report"""
+    try:
+        if job_scope(job_id) != ('advisor', session['user_id']):
+            return jsonify({'success': False, 'message': 'Report not found'}), 404
+        job = report_jobs.status(job_id)
+        if job['status'] != 'done':
+            return jsonify(job_payload(job, '/api/staff/reports')), 409
+        return report_response(job, '/api/staff/reports', 'Outpass_History')
+    except Exception as e:
+        print(f"Report download error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to download report'}), 500
\ No newline at end of file
@@ -4,15 +4,26 @@ Handles student-specific operations: apply for outpass, view status, history, et
 """
 
 from flask import Blueprint, request, jsonify, session
-from backend.config import get_db_connection
+from backend.config import get_db
 from backend.utils.helpers import (
     login_required, role_required, format_datetime, format_date, format_time,
     validate_outpass_timing, log_action, get_client_ip
 )
+from backend.utils.gate_counters import record_gate_movement
+from backend.utils.routing import routing_cache
+from backend.utils.reasons import categorize_reason
+from backend.utils.daily_stats import outpass_buckets, recompute_buckets
+from backend.utils.dashboard_cache import dashboard_cache
 from datetime import datetime
 
 student_bp = Blueprint('student', __name__, url_prefix='/api/student')
 
+def _statistics_changed(advisor_id, dept_id):
+    """Drop the cached figures a student's request counts towards: its advisor's and its HOD's"""
+    if advisor_id:
+        dashboard_cache.invalidate('dashboard.staff', advisor_id)
+    dashboard_cache.invalidate('dashboard.hod', dept_id)
+
 @student_bp.route('/apply-outpass', methods=['POST'])
 @role_required('student')
 def apply_outpass():
@@ -38,81 +49,40 @@ def apply_outpass():
         if not is_valid:
             return jsonify({'success': False, 'message': error_msg}), 400
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
         cursor = conn.cursor(dictionary=True)
         
-        # Get student's advisor, department, and academic year
-        cursor.execute("""
-            SELECT u.advisor_id, u.dept_id, u.academic_year, d.dept_name
-            FROM users u
-            LEFT JOIN departments d ON u.dept_id = d.dept_id
-            WHERE u.user_id = %s
-        """, (session['user_id'],))
+        # Advisor (own, or a fallback from the department) and HOD from the routing cache
+        route = routing_cache.resolve(conn, session['user_id'])
         
-        student_info = cursor.fetchone()
-        
-        if not student_info:
+        if not route:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Student record not found'}), 404
-            
-        advisor_id = student_info['advisor_id']
         
-        # Fallback: If no advisor is assigned, find STAFF in the SAME DEPT and SAME YEAR
+        dept_id, advisor_id, hod_id = route
         if not advisor_id:
-            cursor.execute("""
-                SELECT user_id FROM users 
-                WHERE role = 'staff' 
-                AND dept_id = %s 
-                AND academic_year = %s
-                AND is_active = TRUE 
-                LIMIT 1
-            """, (student_info['dept_id'], student_info['academic_year']))
-            fallback_staff = cursor.fetchone()
-            if fallback_staff:
-                advisor_id = fallback_staff['user_id']
-            else:
-                # Absolute Fallback: if no year-matched staff, find any staff in dept
-                cursor.execute("""
-                    SELECT user_id FROM users 
-                    WHERE role = 'staff' AND dept_id = %s AND is_active = TRUE 
-                    LIMIT 1
-                """, (student_info['dept_id'],))
-                fallback_any_staff = cursor.fetchone()
-                if fallback_any_staff:
-                    advisor_id = fallback_any_staff['user_id']
-                else:
-                    cursor.close()
-                    conn.close()
-                    return jsonify({'success': False, 'message': 'No staff/advisor available in your department. Contact admin.'}), 400
-        
-        # Get HOD for department
-        cursor.execute("""
-            SELECT user_id FROM users 
-            WHERE role = 'hod' AND dept_id = %s AND is_active = TRUE
-            LIMIT 1
-        """, (student_info['dept_id'],))
-        
-        hod = cursor.fetchone()
-        hod_id = hod['user_id'] if hod else None
+            cursor.close()
+            return jsonify({'success': False, 'message': 'No staff/advisor available in your department. Contact admin.'}), 400
         
         # Insert outpass request
         query = """
             INSERT INTO outpasses 
-            (student_id, out_date, out_time, expected_return_time, reason, 
-             destination, advisor_id, hod_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            (student_id, dept_id, out_date, out_time, expected_return_time, reason, 
+             reason_category_id, destination, advisor_id, hod_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         
         cursor.execute(query, (
             session['user_id'],
+            dept_id,
             data['out_date'],
             data['out_time'],
             data['expected_return_time'],
             data['reason'],
+            categorize_reason(data['reason']),
             data.get('destination', ''),
             advisor_id,
             hod_id
@@ -120,13 +90,13 @@ def apply_outpass():
         
         outpass_id = cursor.lastrowid
         conn.commit()
+        _statistics_changed(advisor_id, dept_id)
         
         # Log the action
         log_action(conn, outpass_id, session['user_id'], 'created', 
                   'Outpass request created', get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -145,7 +115,7 @@ def get_my_outpasses():
     try:
         status_filter = request.args.get('status')  # Optional filter by status
         
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -192,7 +162,6 @@ def get_my_outpasses():
             outpass['actual_entry_time'] = format_datetime(outpass['actual_entry_time'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -208,7 +177,7 @@ def get_my_outpasses():
 def get_outpass_details(outpass_id):
     """Get detailed information about a specific outpass"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -240,7 +209,6 @@ def get_outpass_details(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found'}), 404
         
         # Format datetime fields
@@ -273,7 +241,6 @@ def get_outpass_details(outpass_id):
             log['created_at'] = format_datetime(log['created_at'])
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -290,7 +257,7 @@ def get_outpass_details(outpass_id):
 def cancel_outpass(outpass_id):
     """Cancel a pending outpass request"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -306,12 +273,10 @@ def cancel_outpass(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found'}), 404
         
         if outpass['final_status'] not in ['pending']:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Cannot cancel this outpass'}), 400
         
         # Update status to rejected
@@ -324,13 +289,13 @@ def cancel_outpass(outpass_id):
         """, (outpass_id,))
         
         conn.commit()
+        _statistics_changed(outpass['advisor_id'], outpass['dept_id'])
         
         # Log action
-        log_action(conn, outpass_id, session['user_id'], 'rejected', 
+        log_action(conn, outpass_id, session['user_id'], 'advisor_rejected', 
                   'Cancelled by student', get_client_ip())
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -346,7 +311,7 @@ def cancel_outpass(outpass_id):
 def get_dashboard_stats():
     """Get dashboard statistics for student"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -367,7 +332,6 @@ def get_dashboard_stats():
         stats = cursor.fetchone()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -383,7 +347,7 @@ def get_dashboard_stats():
 def delete_outpass(outpass_id):
     """Delete an outpass record (for history cleanup)"""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         if not conn:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
@@ -399,20 +363,31 @@ def delete_outpass(outpass_id):
         
         if not outpass:
             cursor.close()
-            conn.close()
             return jsonify({'success': False, 'message': 'Outpass not found'}), 404
         
         # Allow deletion of any outpass by students for cleanup
         
+        conn.start_transaction()
+        
         # Delete associated logs first (foreign key constraint)
         cursor.execute("DELETE FROM outpass_logs WHERE outpass_id = %s", (outpass_id,))
         
-        # Delete the outpass
+        # Delete the outpass and recount the rollup days it was in
+        buckets = outpass_buckets(cursor, "outpass_id = %s", (outpass_id,))
         cursor.execute("DELETE FROM outpasses WHERE outpass_id = %s", (outpass_id,))
+        recompute_buckets(cursor, buckets)
+        
+        # Keep the daily gate counters in step with the removed movement
+        if outpass['actual_exit_time']:
+            record_gate_movement(cursor, outpass['actual_exit_time'].date(), exits=-1)
+        if outpass['actual_entry_time']:
+            record_gate_movement(cursor, outpass['actual_entry_time'].date(), entries=-1)
         
         conn.commit()
+        _statistics_changed(outpass['advisor_id'], outpass['dept_id'])
+        if outpass['actual_exit_time']:
+            dashboard_cache.invalidate('dashboard.security', 'all')
         cursor.close()
-        conn.close()
         
         return jsonify({
             'success': True,
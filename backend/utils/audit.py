@@ -0,0 +1,226 @@
+"""
+Audit log writer for outpass_logs
+Log records are queued in memory and written by a background thread with
+multi-row INSERTs, so request threads never wait on the audit write. Callers
+that need the log row committed atomically with their own state change insert
+it synchronously on their connection instead (see helpers.log_action).
+
+A failed batch is kept and retried with a backoff capped at AUDIT_MAX_BACKOFF.
+After AUDIT_MAX_RETRIES failures it is written row by row; rows that still
+cannot be written are appended to AUDIT_SPILL_FILE and replayed after the next
+successful write, so an outage delays records but never loses them. Rows the
+database rejects outright (a deleted outpass, bad data) would fail on every
+replay and go to AUDIT_SPILL_FILE + '.rejected' for an operator instead.
+"""
+
+import os
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+
+import mysql.connector
+from backend.config import BASE_DIR, get_db_connection
+
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_MAX_BACKOFF = float(os.getenv('AUDIT_MAX_BACKOFF', 30))
+AUDIT_SPILL_FILE = os.getenv('AUDIT_SPILL_FILE', os.path.join(BASE_DIR, 'audit_spill.jsonl'))
+AUDIT_MAX_RETRIES = 3
+
+LOG_COLUMNS = "(outpass_id, action_by, action_type, remarks, ip_address, created_at)"
+
+logger = logging.getLogger(__name__)
+
+
+def insert_log_rows(cursor, rows):
+    """Write log rows (tuples in LOG_COLUMNS order) with a single INSERT"""
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for row in rows for value in row]
+    cursor.execute(f"INSERT INTO outpass_logs {LOG_COLUMNS} VALUES {placeholders}", params)
+
+
+def _dump_row(row):
+    return json.dumps(list(row[:5]) + [row[5].isoformat()])
+
+
+def _load_row(line):
+    values = json.loads(line)
+    return tuple(values[:5]) + (datetime.fromisoformat(values[5]),)
+
+
+class AuditLogWriter:
+    """Bounded queue drained by one background thread per process"""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.shutdown)
+
+    def submit(self, row):
+        """
+        Queue a log row
+        Returns False when the queue is full; the caller should write it synchronously.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pending = []
+        retries = 0
+        while not self._stop.is_set():
+            if retries == 0:
+                try:
+                    pending.append(self._queue.get(timeout=AUDIT_FLUSH_INTERVAL))
+                except queue.Empty:
+                    pass
+                self._drain_into(pending)
+            if not pending:
+                continue
+            if self._write(pending):
+                pending = []
+                retries = 0
+                self._replay_spill()
+                continue
+            retries += 1
+            if retries >= AUDIT_MAX_RETRIES:
+                pending = self._spill(self._write_individually(pending))
+                if not pending:
+                    retries = 0
+                    continue
+            # The failed batch stays in pending; back off before trying it again
+            self._stop.wait(min(AUDIT_FLUSH_INTERVAL * 2 ** (retries - 1), AUDIT_MAX_BACKOFF))
+        # Shutdown: whatever was accepted is still written, or spilled for the next start
+        self._drain_into(pending, limit=None)
+        if pending and not self._write(pending):
+            unwritten = self._spill(self._write_individually(pending))
+            if unwritten:
+                logger.error("Audit log: could not write or spill %d record(s) at shutdown", len(unwritten))
+
+    def _drain_into(self, pending, limit=AUDIT_BATCH_SIZE):
+        while limit is None or len(pending) < limit:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _write(self, rows):
+        conn = get_db_connection()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            insert_log_rows(cursor, rows)
+            conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning("Audit log batch write error: %s", e)
+            return False
+        finally:
+            conn.close()
+
+    def _write_individually(self, rows):
+        """
+        One row at a time so a single bad row cannot hold back the batch
+        Returns: rows not written because the database could not be reached
+        """
+        conn = get_db_connection()
+        if not conn:
+            logger.warning("Audit log: database unavailable, %d record(s) not written", len(rows))
+            return rows
+        unwritten = []
+        rejected = []
+        try:
+            cursor = conn.cursor()
+            for row in rows:
+                try:
+                    insert_log_rows(cursor, [row])
+                    conn.commit()
+                except (mysql.connector.errors.IntegrityError, mysql.connector.errors.DataError) as e:
+                    logger.error("Audit log: record for outpass %s rejected: %s", row[0], e)
+                    rejected.append(row)
+                except Exception as e:
+                    logger.warning("Audit log: record for outpass %s not written: %s", row[0], e)
+                    unwritten.append(row)
+            cursor.close()
+        finally:
+            conn.close()
+        if rejected:
+            unwritten.extend(self._append(AUDIT_SPILL_FILE + '.rejected', rejected))
+        return unwritten
+
+    def _append(self, path, rows):
+        """Append rows to a spill file; returns the rows that could not be stored"""
+        try:
+            # One write of whole lines, so workers appending at once do not interleave
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(''.join(_dump_row(row) + '\n' for row in rows))
+            return []
+        except OSError as e:
+            logger.error("Audit log: cannot write %s: %s", path, e)
+            return rows
+
+    def _spill(self, rows):
+        """Keep unwritten rows on disk for replay; returns rows that could not be spilled"""
+        if not rows:
+            return []
+        unspilled = self._append(AUDIT_SPILL_FILE, rows)
+        if not unspilled:
+            logger.warning("Audit log: %d record(s) spilled to %s for replay", len(rows), AUDIT_SPILL_FILE)
+        return unspilled
+
+    def _replay_spill(self):
+        """Write back rows spilled by any worker, now that the database accepts writes"""
+        if not os.path.exists(AUDIT_SPILL_FILE):
+            return
+        # Claim the file, so each spilled row is replayed by one worker only
+        claimed = f"{AUDIT_SPILL_FILE}.{os.getpid()}"
+        try:
+            os.replace(AUDIT_SPILL_FILE, claimed)
+            with open(claimed, encoding='utf-8') as f:
+                rows = [_load_row(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.error("Audit log: cannot replay %s: %s", AUDIT_SPILL_FILE, e)
+            return
+        for start in range(0, len(rows), AUDIT_BATCH_SIZE):
+            batch = rows[start:start + AUDIT_BATCH_SIZE]
+            if not self._write(batch) and self._spill(self._write_individually(batch)):
+                # Not written and not spilled again: keep what is left in the claimed file
+                with open(claimed, 'w', encoding='utf-8') as f:
+                    f.write(''.join(_dump_row(row) + '\n' for row in rows[start:]))
+                logger.error("Audit log: replay stopped; remaining records kept in %s", claimed)
+                return
+        os.remove(claimed)
+        logger.info("Audit log: replayed %d spilled record(s)", len(rows))
+
+    def shutdown(self, timeout=10.0):
+        """Stop the writer thread after it has written everything queued"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+
+audit_writer = AuditLogWriter()
@@ -0,0 +1,390 @@
+"""
+Shared cache
+One namespaced cache behind every cached lookup (routing, profiles,
+departments, dashboards), consistent across gunicorn workers.
+
+Tiers:
+    local   bounded LRU with TTL in each process; answers repeated reads with no I/O
+    shared  store every worker reads and writes, selected by CACHE_BACKEND:
+        sqlite   - local SQLite file CACHE_FILE (default; one machine, no server)
+        redis    - network adapter for a Redis server at CACHE_URL (needs the redis package)
+        loopback - the network adapter over an in-process stand-in client; for
+                   exercising that path without a server (not shared between workers)
+        memory   - no shared tier; each worker keeps its own copy until the TTL
+
+With a shared tier, local entries live at most CACHE_LOCAL_TTL seconds, so a
+change made in one worker is seen by the others within that time.
+
+Namespaces: keys live in a namespace and invalidate(namespace) drops all of
+them at once by bumping the namespace's generation, which is part of every
+shared key. Old generations simply expire. A value computed while its
+namespace is invalidated must not be stored under the new generation, so
+callers read generation() before computing and pass it to set(), which skips
+the write when the namespace has moved on. Values are pickled for the shared
+tier. Values returned from the local tier are shared between requests and
+must not be modified.
+"""
+
+import abc
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend.config import BASE_DIR
+
+CACHE_LOCAL_SIZE = int(os.getenv('CACHE_LOCAL_SIZE', 10000))
+CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 1))
+CACHE_PREFIX = os.getenv('CACHE_PREFIX', 'outpass:')
+# Expired SQLite rows are purged every this many writes per process
+CACHE_PURGE_EVERY = 500
+
+MISSING = object()
+
+
+class LocalLRU:
+    """Per-process tier: (namespace, key) -> value, least recently used evicted first"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # (namespace, key) -> (expires_at, value)
+
+    def get(self, namespace, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return MISSING
+            if entry[0] <= now:
+                del self._entries[(namespace, key)]
+                return MISSING
+            self._entries.move_to_end((namespace, key))
+            return entry[1]
+
+    def set(self, namespace, key, value, ttl):
+        with self._lock:
+            self._entries[(namespace, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def drop_namespace(self, namespace):
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[entry_key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedStore(abc.ABC):
+    """Shared tier interface: bytes values under string keys; ttl None = no expiry"""
+    name = 'base'
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Value of key, or None"""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store value under key"""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Drop key if present"""
+
+    @abc.abstractmethod
+    def incr(self, key):
+        """Add one to an integer key (missing = 0) and return the new value"""
+
+
+class SQLiteStore(SharedStore):
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL
+                )
+            """)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, None if ttl is None else now + ttl)
+        )
+        self._writes += 1
+        if self._writes % CACHE_PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def incr(self, key):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, str(value).encode())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+
+class NetworkStore(SharedStore):
+    """Adapter over a Redis-compatible client (get, set with ex=, delete, incr)"""
+
+    def __init__(self, client, name='redis'):
+        self.client = client
+        self.name = name
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=None if ttl is None else max(1, int(ttl + 0.5)))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+
+class LoopbackClient:
+    """In-process stand-in for the network client, implementing the calls NetworkStore makes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}          # key -> (expires_at or None, bytes)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= time.time()):
+                return None
+            return entry[1]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (None if ex is None else time.time() + ex, value)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return 1 if self._data.pop(key, None) else 0
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self._data[key] = (None, str(value).encode())
+            return value
+
+
+class Cache:
+    def __init__(self, local, shared=None, local_ttl=CACHE_LOCAL_TTL):
+        self.local = local
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self._lock = threading.Lock()
+        self._generations = {}   # namespace -> (read_at, generation)
+        self._counts = dict.fromkeys(
+            ('local_hits', 'shared_hits', 'misses', 'sets', 'stale_sets', 'invalidations', 'errors'), 0
+        )
+
+    @property
+    def backend(self):
+        return self.shared.name if self.shared else 'memory'
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _generation(self, namespace, fresh=False):
+        """
+        Current generation of a namespace, re-read from the shared tier at most
+        every local_ttl unless fresh. Without a shared tier generations are per process.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._generations.get(namespace)
+        if not self.shared:
+            return cached[1] if cached else 0
+        if cached and not fresh and now - cached[0] < self.local_ttl:
+            return cached[1]
+        value = self.shared.get(f"{CACHE_PREFIX}gen:{namespace}")
+        generation = int(value) if value else 0
+        with self._lock:
+            # Generations only grow; never let a read that raced an invalidate() go back
+            recorded = self._generations.get(namespace)
+            if recorded and recorded[1] > generation:
+                generation = recorded[1]
+            self._generations[namespace] = (now, generation)
+        return generation
+
+    def _shared_key(self, namespace, key, generation=None):
+        if generation is None:
+            generation = self._generation(namespace)
+        return f"{CACHE_PREFIX}{namespace}:{generation}:{key}"
+
+    def generation(self, namespace):
+        """Generation to pass to set() for a value about to be computed; None if unknown"""
+        try:
+            return self._generation(namespace)
+        except Exception as e:
+            print(f"Cache generation error ({namespace}): {e}")
+            self._count('errors')
+            return None
+
+    def get(self, namespace, key, default=None):
+        """Cached value, or default"""
+        value = self.local.get(namespace, key)
+        if value is not MISSING:
+            self._count('local_hits')
+            return value
+        if self.shared:
+            try:
+                raw = self.shared.get(self._shared_key(namespace, key))
+            except Exception as e:
+                # A broken shared tier degrades to a miss, never to a failed request
+                print(f"Cache get error ({namespace}): {e}")
+                self._count('errors')
+                raw = None
+            if raw is not None:
+                value = pickle.loads(raw)
+                self.local.set(namespace, key, value, self.local_ttl)
+                self._count('shared_hits')
+                return value
+        self._count('misses')
+        return default
+
+    def set(self, namespace, key, value, ttl, generation=None):
+        """
+        Cache value for ttl seconds
+        Args:
+            generation: generation() read before value was computed; the value is
+                        not stored if the namespace was invalidated since (or the
+                        current generation cannot be read)
+        """
+        if generation is not None:
+            try:
+                current = self._generation(namespace, fresh=True)
+            except Exception as e:
+                print(f"Cache set error ({namespace}): {e}")
+                self._count('errors')
+                return
+            if current != generation:
+                self._count('stale_sets')
+                return
+        self.local.set(namespace, key, value, min(ttl, self.local_ttl) if self.shared else ttl)
+        if generation is not None:
+            # invalidate() in this process may have run since the check. It records the new
+            # generation before dropping local keys, so the value was either dropped with
+            # them or the new generation is visible here.
+            with self._lock:
+                moved = self._generations.get(namespace, (0, 0))[1] != generation
+            if moved:
+                self.local.delete(namespace, key)
+                self._count('stale_sets')
+                return
+        self._count('sets')
+        if self.shared:
+            try:
+                self.shared.set(self._shared_key(namespace, key, generation),
+                                pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+            except Exception as e:
+                print(f"Cache set error ({namespace}): {e}")
+                self._count('errors')
+
+    def delete(self, namespace, key):
+        """Drop one key"""
+        self.local.delete(namespace, key)
+        if self.shared:
+            try:
+                self.shared.delete(self._shared_key(namespace, key))
+            except Exception as e:
+                print(f"Cache delete error ({namespace}): {e}")
+                self._count('errors')
+
+    def invalidate(self, *namespaces):
+        """Drop every key of the given namespaces, in all workers"""
+        for namespace in namespaces:
+            # The new generation is recorded before local keys go; set() relies on the order
+            self._count('invalidations')
+            if not self.shared:
+                with self._lock:
+                    generation = self._generations.get(namespace, (0, 0))[1] + 1
+                    self._generations[namespace] = (time.monotonic(), generation)
+            else:
+                try:
+                    generation = self.shared.incr(f"{CACHE_PREFIX}gen:{namespace}")
+                    with self._lock:
+                        self._generations[namespace] = (time.monotonic(), generation)
+                except Exception as e:
+                    print(f"Cache invalidate error ({namespace}): {e}")
+                    self._count('errors')
+            self.local.drop_namespace(namespace)
+
+    def stats(self):
+        """Counters of this worker process"""
+        with self._lock:
+            return dict(self._counts, backend=self.backend, local_keys=len(self.local), pid=os.getpid())
+
+
+def create_cache():
+    """Build the cache selected by CACHE_BACKEND"""
+    local = LocalLRU(CACHE_LOCAL_SIZE)
+    choice = os.environ.get('CACHE_BACKEND', 'sqlite').lower()
+    if choice == 'memory':
+        return Cache(local)
+    if choice == 'loopback':
+        return Cache(local, NetworkStore(LoopbackClient(), name='loopback'))
+    if choice == 'redis':
+        try:
+            import redis
+            return Cache(local, NetworkStore(redis.Redis.from_url(os.environ.get('CACHE_URL', 'redis://localhost:6379/0'))))
+        except ImportError:
+            print("⚠️ redis package not installed. Falling back to the sqlite cache backend.")
+    return Cache(local, SQLiteStore(os.environ.get('CACHE_FILE', os.path.join(BASE_DIR, 'cache.sqlite3'))))
+
+
+cache = create_cache()
@@ -0,0 +1,30 @@
+"""
+Request context
+Routes need the acting user's role, department and name for scoping queries.
+current_user() resolves them once per request from the profile cache (primed
+at login, see backend/utils/profiles.py) instead of each route running its own
+"SELECT dept_id FROM users" first.
+"""
+
+from flask import g, session
+from backend.config import get_db
+from backend.utils.profiles import profile_cache
+
+
+def current_user():
+    """
+    ActingUser(user_id, role, dept_id, full_name) of the logged-in user
+    Returns None when there is no session, the user is no longer active or the
+    database is unreachable on a cache miss. Kept on flask.g for the request.
+    """
+    if 'acting_user' not in g:
+        acting = None
+        user_id = session.get('user_id')
+        if user_id is not None:
+            acting = profile_cache.cached_acting(user_id)
+            if acting is None:
+                conn = get_db()
+                if conn and profile_cache.load(conn, user_id):
+                    acting = profile_cache.cached_acting(user_id)
+        g.acting_user = acting
+    return g.acting_user
@@ -0,0 +1,171 @@
+"""
+Daily outpass rollup
+outpass_daily_stats keeps per (day, dept_id, academic_year) counts so the HOD and
+admin statistics read a few hundred small rows instead of aggregating outpasses.
+A row's status counts are for passes created that day; exits, entries and late
+returns are for movements through the gate that day. dept_id 0 stands for
+outpasses without a department.
+
+Every state change bumps outpasses.updated_at, which is the change feed:
+refresh_daily_stats() recomputes the (day, dept) buckets that outpasses updated
+since the last refresh now fall in. A bucket a change moves an outpass out of
+is not visible there: deletes, and kiosk merges that move an exit or entry to
+an earlier day, recompute their old buckets themselves (see outpass_buckets). A full
+rebuild is available from scripts/rebuild_daily_stats.py.
+"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+
+STATS_REFRESH_INTERVAL = float(os.getenv('STATS_REFRESH_INTERVAL', 5))
+# Rows updated by a transaction that commits after a refresh has read past them
+# are picked up by the next refresh as long as it commits within this window
+STATS_REFRESH_OVERLAP = 120
+STATS_LOCK_NAME = 'outpass_daily_stats'
+
+STATS_COLUMNS = "(day, dept_id, academic_year, created, pending, approved, rejected, used, exits, entries, late_returns)"
+
+# One row per counted fact, in the order of STATS_COLUMNS after dept_id.
+# {where_created}, {where_exit} and {where_entry} narrow each part to the slice being computed.
+_FACTS_SQL = """
+    SELECT DATE(o.created_at) AS day, COALESCE(o.dept_id, 0) AS dept_id,
+           COALESCE(s.academic_year, 0) AS academic_year, 1 AS created,
+           o.final_status = 'pending' AS pending, o.final_status = 'approved' AS approved,
+           o.final_status = 'rejected' AS rejected, o.final_status = 'used' AS used,
+           0 AS exits, 0 AS entries, 0 AS late_returns
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    WHERE {where_created}
+    UNION ALL
+    SELECT DATE(o.actual_exit_time), COALESCE(o.dept_id, 0), COALESCE(s.academic_year, 0),
+           0, 0, 0, 0, 0, 1, 0, 0
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    WHERE {where_exit}
+    UNION ALL
+    SELECT DATE(o.actual_entry_time), COALESCE(o.dept_id, 0), COALESCE(s.academic_year, 0),
+           0, 0, 0, 0, 0, 0, 1,
+           o.expected_return_at IS NOT NULL AND o.actual_entry_time > o.expected_return_at
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    WHERE {where_entry}
+"""
+
+_SUM_SQL = f"""
+    INSERT INTO outpass_daily_stats {STATS_COLUMNS}
+    SELECT day, dept_id, academic_year, SUM(created), SUM(pending), SUM(approved), SUM(rejected),
+           SUM(used), SUM(exits), SUM(entries), SUM(late_returns)
+    FROM ({{facts}}) facts
+    GROUP BY day, dept_id, academic_year
+"""
+
+
+def outpass_buckets(cursor, where, params):
+    """
+    (day, dept_id) buckets the matching outpasses count towards
+    Call before deleting outpasses or moving their movement times and pass the
+    result to recompute_buckets afterwards, in the same transaction.
+    """
+    cursor.execute(f"""
+        SELECT DATE(created_at), COALESCE(dept_id, 0) FROM outpasses WHERE {where}
+        UNION
+        SELECT DATE(actual_exit_time), COALESCE(dept_id, 0) FROM outpasses
+        WHERE ({where}) AND actual_exit_time IS NOT NULL
+        UNION
+        SELECT DATE(actual_entry_time), COALESCE(dept_id, 0) FROM outpasses
+        WHERE ({where}) AND actual_entry_time IS NOT NULL
+    """, list(params) * 3)
+    return {tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in cursor.fetchall()}
+
+
+def recompute_buckets(cursor, buckets):
+    """Rewrite the rollup rows of each (day, dept_id) bucket from outpasses"""
+    for day, dept_id in buckets:
+        start, end = day, day + timedelta(days=1)
+        # <=> so dept 0 (NULL on outpasses) can still use the dept index
+        dept = dept_id or None
+        cursor.execute("DELETE FROM outpass_daily_stats WHERE day = %s AND dept_id = %s", (day, dept_id))
+        cursor.execute(_SUM_SQL.format(facts=_FACTS_SQL.format(
+            where_created="o.dept_id <=> %s AND o.created_at >= %s AND o.created_at < %s",
+            where_exit="o.dept_id <=> %s AND o.actual_exit_time >= %s AND o.actual_exit_time < %s",
+            where_entry="o.dept_id <=> %s AND o.actual_entry_time >= %s AND o.actual_entry_time < %s"
+        )), (dept, start, end) * 3)
+
+
+class DailyStatsRefresher:
+    """Applies outpass changes to the rollup, at most once per STATS_REFRESH_INTERVAL per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_run = 0.0
+
+    def refresh(self, conn, force=False):
+        """
+        Bring the rollup up to date
+        Skipped when this process refreshed recently or another connection is
+        refreshing right now; readers then see counts at most a few seconds old.
+        Returns: number of buckets recomputed, or None if skipped
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_run < STATS_REFRESH_INTERVAL:
+                return None
+            self._last_run = now
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (STATS_LOCK_NAME,))
+        if cursor.fetchone()[0] != 1:
+            cursor.close()
+            return None
+        try:
+            cursor.execute("SELECT refreshed_to, NOW() FROM outpass_daily_stats_state WHERE id = 1")
+            refreshed_to, db_now = cursor.fetchone()
+
+            buckets = outpass_buckets(
+                cursor, "updated_at >= %s", (refreshed_to - timedelta(seconds=STATS_REFRESH_OVERLAP),)
+            )
+            conn.start_transaction()
+            try:
+                recompute_buckets(cursor, buckets)
+                cursor.execute("UPDATE outpass_daily_stats_state SET refreshed_to = %s WHERE id = 1", (db_now,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return len(buckets)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (STATS_LOCK_NAME,))
+            cursor.fetchone()
+            cursor.close()
+
+
+def rebuild_daily_stats(conn):
+    """
+    Recompute the whole rollup from outpasses in one transaction
+    Returns: number of rollup rows written
+    """
+    cursor = conn.cursor()
+    conn.start_transaction()
+    try:
+        cursor.execute("SELECT NOW()")
+        db_now = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM outpass_daily_stats")
+        cursor.execute(_SUM_SQL.format(facts=_FACTS_SQL.format(
+            where_created="TRUE",
+            where_exit="o.actual_exit_time IS NOT NULL",
+            where_entry="o.actual_entry_time IS NOT NULL"
+        )))
+        rows = cursor.rowcount
+        cursor.execute("UPDATE outpass_daily_stats_state SET refreshed_to = %s WHERE id = 1", (db_now,))
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+daily_stats = DailyStatsRefresher()
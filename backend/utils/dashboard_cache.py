@@ -0,0 +1,149 @@
+"""
+Dashboard statistics cache
+Dashboards poll their statistics, and a shift change or the end of a class
+brings dozens of identical requests at once. Results are cached per endpoint
+namespace and scope (department, advisor) in the shared cache, so every worker
+serves the same figures:
+
+    fresh   younger than DASHBOARD_CACHE_TTL: served as is
+    stale   for DASHBOARD_STALE_TTL after that: served as is while one
+            background thread recomputes it
+    miss    otherwise: the first request computes, concurrent requests for the
+            same key wait for that result instead of running the queries too
+
+Requests are coalesced within a worker; across workers at most one
+computation per worker runs for a key. Routes whose writes change a dashboard
+call invalidate() afterwards. A computation records the namespace generation
+before it starts and its result is not stored if an invalidation came in
+meanwhile. Requests after the invalidation start a new computation instead of
+waiting for the old one. Computations check out their own pooled
+connection, so they can run outside the request that triggered them. Counters
+are per process; see stats().
+"""
+
+import os
+import threading
+import time
+
+from backend.config import get_db_connection
+from backend.utils.cache import cache
+
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 5))
+DASHBOARD_STALE_TTL = float(os.getenv('DASHBOARD_STALE_TTL', 30))
+# Waiters give up on a computation that takes longer than this
+DASHBOARD_WAIT_TIMEOUT = 30
+
+
+class _Flight:
+    """One in-progress computation and the requests waiting on it"""
+
+    def __init__(self, generation):
+        self.generation = generation    # cache.generation() before computing
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class DashboardCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}       # (namespace, scope) -> _Flight
+        self._counts = dict.fromkeys(('hits', 'stale_hits', 'misses', 'coalesced', 'refreshes', 'errors'), 0)
+
+    def _compute(self, compute):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        try:
+            return compute(conn)
+        finally:
+            conn.close()
+
+    def _run(self, key, flight, compute):
+        """Compute key for flight, store the result and release the waiters"""
+        try:
+            flight.value = self._compute(compute)
+            # Wall clock: the entry's age is judged by other workers too
+            cache.set(key[0], key[1], (time.time(), flight.value), DASHBOARD_CACHE_TTL + DASHBOARD_STALE_TTL,
+                      generation=flight.generation)
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._counts['errors'] += 1
+        finally:
+            with self._lock:
+                # An invalidation may already have replaced this flight
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def _refresh(self, key, flight, compute):
+        self._run(key, flight, compute)
+        if flight.error:
+            print(f"Dashboard refresh error ({key}): {flight.error}")
+
+    def get(self, namespace, scope, compute):
+        """
+        Cached value of compute(conn) for namespace and scope
+        Args:
+            namespace: Cache namespace of the endpoint, e.g. 'dashboard.hod'
+            scope: Whose figures (dept_id, advisor user_id; 'all' when shared)
+            compute: Callable taking a connection; must not use the request (session, g)
+        Raises whatever compute raised when there is no usable cached value
+        """
+        key = (namespace, scope)
+        generation = cache.generation(namespace)
+        entry = cache.get(namespace, scope)
+        age = time.time() - entry[0] if entry else None
+        with self._lock:
+            if entry and age < DASHBOARD_CACHE_TTL:
+                self._counts['hits'] += 1
+                return entry[1]
+
+            flight = self._flights.get(key)
+            if entry and age < DASHBOARD_CACHE_TTL + DASHBOARD_STALE_TTL:
+                self._counts['stale_hits'] += 1
+                if flight is None:
+                    flight = self._flights[key] = _Flight(generation)
+                    self._counts['refreshes'] += 1
+                    threading.Thread(
+                        target=self._refresh, args=(key, flight, compute),
+                        name='dashboard-refresh', daemon=True
+                    ).start()
+                return entry[1]
+
+            if flight is not None:
+                self._counts['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight(generation)
+                self._counts['misses'] += 1
+                leader = True
+
+        if leader:
+            self._run(key, flight, compute)
+        elif not flight.done.wait(DASHBOARD_WAIT_TIMEOUT):
+            raise TimeoutError(f'Timed out waiting for {key}')
+        if flight.error:
+            raise flight.error
+        return flight.value
+
+    def invalidate(self, namespace, scope=None):
+        """
+        Drop a namespace after a write changed the figures of scope (None: any)
+        The whole namespace moves to a new generation, which is what keeps
+        computations already running from storing their result; running
+        computations still answer the requests waiting on them.
+        """
+        with self._lock:
+            for key in [key for key in self._flights if key[0] == namespace and scope in (None, key[1])]:
+                del self._flights[key]
+        cache.invalidate(namespace)
+
+    def stats(self):
+        """Counters since the process started"""
+        with self._lock:
+            return dict(self._counts, in_flight=len(self._flights), pid=os.getpid())
+
+
+dashboard_cache = DashboardCache()
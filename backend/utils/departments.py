@@ -0,0 +1,93 @@
+"""
+Department catalog cache
+Departments change a few times a year but are listed on every registration
+form and admin screen. The catalog is loaded once per DEPARTMENT_CACHE_TTL and
+versioned by a hash of its contents, which doubles as the ETag: every worker
+holding the same rows hands out the same tag, so browsers revalidate with
+If-None-Match and get a 304 without a body (or a query, while warm).
+
+Member counts move with user changes rather than department changes, so they
+are cached on their own, shorter DEPARTMENT_COUNTS_TTL and dropped by the user
+routes through invalidate_counts(). add/update/delete-department call
+invalidate(). Both live in the shared cache (backend/utils/cache.py, namespaces
+"departments" and "departments.counts").
+"""
+
+import hashlib
+import json
+import os
+
+from backend.utils.cache import cache
+from backend.utils.helpers import format_datetime
+
+DEPARTMENT_CACHE_TTL = int(os.getenv('DEPARTMENT_CACHE_TTL', 300))
+DEPARTMENT_COUNTS_TTL = int(os.getenv('DEPARTMENT_COUNTS_TTL', 30))
+NAMESPACE = 'departments'
+COUNTS_NAMESPACE = 'departments.counts'
+
+
+def _version(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class DepartmentCatalog:
+    def cached_version(self):
+        """Version of the cached catalog if it is still fresh, else None"""
+        catalog = cache.get(NAMESPACE, 'catalog')
+        return catalog[2] if catalog else None
+
+    def cached_counts_version(self):
+        """Version of the cached member counts if they are still fresh, else None"""
+        counts = cache.get(COUNTS_NAMESPACE, 'counts')
+        return counts[1] if counts else None
+
+    def catalog(self, conn):
+        """
+        Returns: (departments ordered by dept_id, departments ordered by dept_name, version)
+                 Rows are shared between callers; copy before changing them.
+        """
+        catalog = cache.get(NAMESPACE, 'catalog')
+        if catalog is None:
+            generation = cache.generation(NAMESPACE)
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT dept_id, dept_name, dept_code, created_at FROM departments ORDER BY dept_id")
+            departments = cursor.fetchall()
+            cursor.close()
+            for dept in departments:
+                dept['created_at'] = format_datetime(dept['created_at'])
+            by_name = sorted(departments, key=lambda dept: dept['dept_name'])
+            catalog = (departments, by_name, _version(departments))
+            cache.set(NAMESPACE, 'catalog', catalog, DEPARTMENT_CACHE_TTL, generation=generation)
+        return catalog
+
+    def member_counts(self, conn):
+        """
+        Active students and staff per department, counted in one pass over users
+        Returns: ({dept_id: (student_count, staff_count)}, version)
+        """
+        counts = cache.get(COUNTS_NAMESPACE, 'counts')
+        if counts is None:
+            generation = cache.generation(COUNTS_NAMESPACE)
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT dept_id, SUM(role = 'student'), SUM(role = 'staff')
+                FROM users
+                WHERE dept_id IS NOT NULL AND role IN ('student', 'staff') AND is_active = TRUE
+                GROUP BY dept_id
+            """)
+            by_dept = {dept_id: (int(students), int(staff)) for dept_id, students, staff in cursor.fetchall()}
+            cursor.close()
+            counts = (by_dept, _version(sorted(by_dept.items())))
+            cache.set(COUNTS_NAMESPACE, 'counts', counts, DEPARTMENT_COUNTS_TTL, generation=generation)
+        return counts
+
+    def invalidate(self):
+        """Drop the catalog and the counts; the next lookup reloads them"""
+        cache.invalidate(NAMESPACE, COUNTS_NAMESPACE)
+
+    def invalidate_counts(self):
+        """Drop the member counts after users join, leave or change department"""
+        cache.invalidate(COUNTS_NAMESPACE)
+
+
+department_catalog = DepartmentCatalog()
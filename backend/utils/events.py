@@ -0,0 +1,309 @@
+"""
+Live outpass events for dashboards (Server-Sent Events)
+Every state change is already recorded in outpass_logs by log_action, so the log
+table is the event source. One tailer thread per worker reads new rows by primary
+key and fans them out to that worker's subscribers, which keeps every worker in
+step without extra infrastructure and lets clients resume with Last-Event-ID.
+
+log_ids are allocated when a row is inserted but become visible when its
+transaction commits, so a long transaction (kiosk sync, batch approval, the
+audit writer's batches) can commit an id below one already read. Ids skipped
+over are kept as open gaps and read again on every poll until they show up or
+EVENTS_GAP_TIMEOUT passes (rolled back inserts leave ids that never appear).
+Late events are therefore published out of id order; replay follows the order
+they were published in.
+"""
+
+import os
+import json
+import queue
+import threading
+import time
+from collections import deque
+from backend.config import get_db_connection
+from backend.utils.helpers import format_date, format_time, format_datetime
+
+# outpass_logs.action_type -> event type sent to clients
+EVENT_TYPES = {
+    'created': 'created',
+    'advisor_approved': 'advisor_approved',
+    'advisor_rejected': 'rejected',
+    'hod_approved': 'hod_approved',
+    'hod_rejected': 'rejected',
+    'exit_scanned': 'exit_scanned',
+    'entry_scanned': 'entry_scanned'
+}
+
+# Security only follows the gate: passes becoming valid and movements through it
+SECURITY_EVENT_TYPES = ('hod_approved', 'exit_scanned', 'entry_scanned')
+
+# Contact details stay with the roles whose lists already show them
+PARENT_FIELDS = ('parent_name', 'parent_mobile')
+
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 1.0))
+EVENTS_BACKLOG = 1000
+EVENTS_BATCH_SIZE = 500
+# Longest a transaction may hold an allocated log_id before its event is given up on
+EVENTS_GAP_TIMEOUT = float(os.getenv('EVENTS_GAP_TIMEOUT', 120))
+EVENTS_MAX_GAPS = 1000
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Sentinel telling a subscriber it missed events and must refetch its snapshot
+RESYNC = object()
+
+
+class Subscription:
+    """One connected client: its scope and pending events"""
+
+    def __init__(self, role, user_id, dept_id):
+        self.role = role
+        self.user_id = user_id
+        self.dept_id = dept_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def wants(self, event):
+        """Role and department scoping, mirroring what each dashboard can list"""
+        outpass = event['outpass']
+        if self.role == 'admin':
+            return True
+        if self.role == 'security':
+            return event['type'] in SECURITY_EVENT_TYPES
+        if self.role == 'hod':
+            return outpass['dept_id'] == self.dept_id or outpass['hod_id'] == self.user_id
+        if self.role == 'staff':
+            return outpass['advisor_id'] == self.user_id
+        if self.role == 'student':
+            return outpass['student_id'] == self.user_id
+        return False
+
+    def payload(self, event):
+        if self.role in ('staff', 'hod', 'admin'):
+            return event
+        outpass = {k: v for k, v in event['outpass'].items() if k not in PARENT_FIELDS}
+        return dict(event, outpass=outpass)
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # A client this far behind is better served by a fresh snapshot
+            self.reset()
+            self.queue.put_nowait(RESYNC)
+
+    def reset(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class EventBroker:
+    """Tails outpass_logs and delivers scoped events to subscribers in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=EVENTS_BACKLOG)
+        self._floor = None      # Events after this log_id are all in _recent
+        self._last_id = None    # Highest log_id read so far
+        self._gaps = {}         # log_id below _last_id not read yet -> monotonic time first missed
+        self._thread = None
+
+    def subscribe(self, role, user_id, dept_id, last_event_id=None):
+        """
+        Register a client
+        Events published after last_event_id are replayed when still buffered;
+        otherwise the client is told to resync.
+        """
+        sub = Subscription(role, user_id, dept_id)
+        with self._lock:
+            self._ensure_started()
+            if last_event_id is not None:
+                if self._floor is not None and last_event_id == self._floor:
+                    replay = list(self._recent)
+                else:
+                    replay = None
+                    for index, event in enumerate(self._recent):
+                        if event['id'] == last_event_id:
+                            replay = list(self._recent)[index + 1:]
+                            break
+                if replay is None:
+                    sub.push(RESYNC)
+                else:
+                    for event in replay:
+                        if sub.wants(event):
+                            sub.push(sub.payload(event))
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='outpass-events', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._subscribers
+                if idle:
+                    # Nobody listening: forget the position and start from the head next time
+                    self._last_id = None
+                    self._floor = None
+                    self._gaps.clear()
+                    self._recent.clear()
+            if not idle:
+                try:
+                    self._poll()
+                except Exception as e:
+                    print(f"Event stream poll error: {e}")
+            time.sleep(EVENTS_POLL_INTERVAL)
+
+    def _poll(self):
+        conn = get_db_connection()
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor(dictionary=True)
+            if self._last_id is None:
+                cursor.execute("SELECT COALESCE(MAX(log_id), 0) as last_id FROM outpass_logs")
+                head = cursor.fetchone()['last_id']
+                with self._lock:
+                    self._last_id = head
+                    self._floor = head
+                cursor.close()
+                return
+
+            # Primary key range read plus the open gaps; the joins are all on primary keys.
+            # Every action type is read so that only uncommitted ids look like gaps.
+            gaps = sorted(self._gaps)
+            gap_filter = f" OR l.log_id IN ({', '.join(['%s'] * len(gaps))})" if gaps else ""
+            cursor.execute(f"""
+                SELECT
+                    l.log_id,
+                    l.action_type,
+                    l.action_by,
+                    l.remarks,
+                    l.created_at as logged_at,
+                    o.outpass_id,
+                    o.student_id,
+                    o.advisor_id,
+                    o.hod_id,
+                    o.out_date,
+                    o.out_time,
+                    o.expected_return_time,
+                    o.reason,
+                    o.destination,
+                    o.advisor_status,
+                    o.hod_status,
+                    o.final_status,
+                    o.actual_exit_time,
+                    o.actual_entry_time,
+                    o.created_at,
+                    (o.expected_return_at IS NOT NULL
+                     AND COALESCE(o.actual_entry_time, NOW()) > o.expected_return_at) as is_late,
+                    s.full_name as student_name,
+                    s.registration_no,
+                    s.academic_year,
+                    s.dept_id,
+                    s.parent_name,
+                    s.parent_mobile,
+                    a.full_name as advisor_name,
+                    d.dept_name
+                FROM outpass_logs l
+                JOIN outpasses o ON l.outpass_id = o.outpass_id
+                JOIN users s ON o.student_id = s.user_id
+                LEFT JOIN users a ON o.advisor_id = a.user_id
+                LEFT JOIN departments d ON s.dept_id = d.dept_id
+                WHERE l.log_id > %s{gap_filter}
+                ORDER BY l.log_id
+                LIMIT %s
+            """, (self._last_id, *gaps, EVENTS_BATCH_SIZE + len(gaps)))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+
+        self._track_gaps([row['log_id'] for row in rows])
+        events = [_to_event(row) for row in rows if row['action_type'] in EVENT_TYPES]
+        if events:
+            self._publish(events)
+
+    def _track_gaps(self, read_ids):
+        """Advance past the ids read, remembering the ones skipped over"""
+        now = time.monotonic()
+        with self._lock:
+            for log_id in read_ids:
+                self._gaps.pop(log_id, None)
+            new_ids = [log_id for log_id in read_ids if log_id > self._last_id]
+            if new_ids:
+                seen = set(new_ids)
+                for log_id in range(self._last_id + 1, new_ids[-1]):
+                    if log_id not in seen:
+                        self._gaps[log_id] = now
+                self._last_id = new_ids[-1]
+            expired = [log_id for log_id, since in self._gaps.items() if now - since > EVENTS_GAP_TIMEOUT]
+            overflow = sorted(self._gaps)[:max(0, len(self._gaps) - EVENTS_MAX_GAPS)]
+            for log_id in set(expired) | set(overflow):
+                del self._gaps[log_id]
+
+    def _publish(self, events):
+        with self._lock:
+            for event in events:
+                if len(self._recent) == self._recent.maxlen:
+                    self._floor = self._recent[0]['id']
+                self._recent.append(event)
+                for sub in self._subscribers:
+                    if sub.wants(event):
+                        sub.push(sub.payload(event))
+
+
+def _to_event(row):
+    outpass = {
+        'outpass_id': row['outpass_id'],
+        'student_id': row['student_id'],
+        'advisor_id': row['advisor_id'],
+        'hod_id': row['hod_id'],
+        'dept_id': row['dept_id'],
+        'student_name': row['student_name'],
+        'registration_no': row['registration_no'],
+        'academic_year': row['academic_year'],
+        'dept_name': row['dept_name'],
+        'advisor_name': row['advisor_name'],
+        'parent_name': row['parent_name'],
+        'parent_mobile': row['parent_mobile'],
+        'out_date': format_date(row['out_date']),
+        'out_time': format_time(row['out_time']),
+        'expected_return_time': format_time(row['expected_return_time']),
+        'reason': row['reason'],
+        'destination': row['destination'],
+        'advisor_status': row['advisor_status'],
+        'hod_status': row['hod_status'],
+        'final_status': row['final_status'],
+        'actual_exit_time': format_datetime(row['actual_exit_time']),
+        'actual_entry_time': format_datetime(row['actual_entry_time']),
+        'is_late': bool(row['is_late']),
+        'created_at': format_datetime(row['created_at'])
+    }
+    return {
+        'id': row['log_id'],
+        'type': EVENT_TYPES[row['action_type']],
+        'action_by': row['action_by'],
+        'remarks': row['remarks'],
+        'at': format_datetime(row['logged_at']),
+        'outpass': outpass
+    }
+
+
+def format_sse(event):
+    """Serialize an event (or the resync sentinel) as an SSE frame"""
+    if event is RESYNC:
+        return "event: resync\ndata: {}\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+broker = EventBroker()
@@ -0,0 +1,75 @@
+"""
+Daily gate counters
+Per-day exit/entry totals kept in gate_daily_counters. Scans bump them in the
+same transaction that records the movement; rebuild_gate_counters recomputes
+them from outpasses when they drift (e.g. after outpasses are deleted).
+"""
+
+def record_gate_movement(cursor, day=None, exits=0, entries=0):
+    """
+    Add to a day's counters
+    Args:
+        cursor: Cursor on the connection holding the scan's transaction
+        day: Date of the movement (None = today, per the session time zone)
+        exits: Exits to add (may be negative to move a scan to another day)
+        entries: Entries to add
+    """
+    if day is None:
+        cursor.execute("""
+            INSERT INTO gate_daily_counters (day, exits, entries)
+            VALUES (CURDATE(), %s, %s)
+            ON DUPLICATE KEY UPDATE exits = exits + VALUES(exits), entries = entries + VALUES(entries)
+        """, (exits, entries))
+    else:
+        cursor.execute("""
+            INSERT INTO gate_daily_counters (day, exits, entries)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE exits = exits + VALUES(exits), entries = entries + VALUES(entries)
+        """, (day, exits, entries))
+
+def get_gate_counts(cursor, day=None):
+    """Return (exits, entries) for a day (None = today)"""
+    if day is None:
+        cursor.execute("SELECT exits, entries FROM gate_daily_counters WHERE day = CURDATE()")
+    else:
+        cursor.execute("SELECT exits, entries FROM gate_daily_counters WHERE day = %s", (day,))
+    row = cursor.fetchone()
+    if not row:
+        return 0, 0
+    if isinstance(row, dict):
+        return row['exits'], row['entries']
+    return row[0], row[1]
+
+def rebuild_gate_counters(conn):
+    """
+    Recompute every day's counters from outpasses in one transaction
+    Returns: number of days written
+    """
+    cursor = conn.cursor()
+    conn.start_transaction()
+    try:
+        cursor.execute("DELETE FROM gate_daily_counters")
+        cursor.execute("""
+            INSERT INTO gate_daily_counters (day, exits, entries)
+            SELECT day, SUM(exits), SUM(entries)
+            FROM (
+                SELECT DATE(actual_exit_time) as day, COUNT(*) as exits, 0 as entries
+                FROM outpasses
+                WHERE actual_exit_time IS NOT NULL
+                GROUP BY DATE(actual_exit_time)
+                UNION ALL
+                SELECT DATE(actual_entry_time) as day, 0 as exits, COUNT(*) as entries
+                FROM outpasses
+                WHERE actual_entry_time IS NOT NULL
+                GROUP BY DATE(actual_entry_time)
+            ) movements
+            GROUP BY day
+        """)
+        days = cursor.rowcount
+        conn.commit()
+        return days
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
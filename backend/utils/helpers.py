@@ -4,6 +4,7 @@ Includes authentication, QR code generation, validation, etc.
 """
 
 import hashlib
+import hmac
 import secrets
 import qrcode
 import io
@@ -11,7 +12,8 @@ import base64
 from datetime import datetime, timedelta
 from functools import wraps
 import os
-from flask import session, jsonify, request
+from flask import session, jsonify, request, make_response
+from backend.utils.audit import audit_writer, insert_log_rows
 
 def get_ist_now():
     """Get current time in IST (+05:30)"""
@@ -61,6 +63,116 @@ def generate_unique_qr_token(outpass_id):
     random_str = secrets.token_hex(8)
     return f"QR-{outpass_id:08d}-{timestamp}-{random_str}"
 
+# Signed QR tokens: QR2.{kid}.{outpass_id}.{student_id}.{valid_from}.{valid_until}.{signature}
+# Times are IST epoch seconds. The signature is an HMAC-SHA256 over everything before it,
+# so forged, expired or malformed tokens can be rejected without a database lookup.
+SIGNED_QR_PREFIX = 'QR2'
+
+def _ist_epoch(dt):
+    """Seconds since epoch for a naive IST datetime (as produced by get_ist_now)"""
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+def _from_ist_epoch(seconds):
+    return datetime(1970, 1, 1) + timedelta(seconds=seconds)
+
+def get_qr_signing_keys():
+    """
+    Load QR signing keys from the environment
+    QR_SIGNING_KEYS: comma separated kid:secret pairs, e.g. "k2:new-secret,k1:old-secret"
+    QR_SIGNING_KEY_ID: kid used to sign new tokens (defaults to the first pair)
+    Keep retired keys listed until tokens signed with them have expired.
+    Returns: (active_kid, {kid: secret_bytes})
+    """
+    keys = {}
+    for pair in os.environ.get('QR_SIGNING_KEYS', '').split(','):
+        kid, sep, secret = pair.strip().partition(':')
+        if sep and kid and secret:
+            keys[kid] = secret.encode()
+    
+    if not keys:
+        # Fall back to a key derived from the Flask secret
+        secret_key = os.environ.get('SECRET_KEY', 'dev-secret-123')
+        keys['k0'] = hashlib.sha256(f"qr-signing:{secret_key}".encode()).digest()
+    
+    active_kid = os.environ.get('QR_SIGNING_KEY_ID') or next(iter(keys))
+    return active_kid, keys
+
+def _sign_qr_payload(secret, payload):
+    digest = hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+def generate_signed_qr_token(outpass_id, student_id, valid_until, valid_from=None):
+    """
+    Generate a signed QR token for an outpass
+    Args:
+        outpass_id: ID of the outpass
+        student_id: ID of the student the pass belongs to
+        valid_until: Expiry datetime (IST)
+        valid_from: Start of validity (IST), defaults to now
+    Returns:
+        Token string (fits outpasses.qr_code)
+    """
+    active_kid, keys = get_qr_signing_keys()
+    if active_kid not in keys:
+        raise ValueError(f"QR signing key '{active_kid}' is not configured")
+    
+    valid_from = valid_from or get_ist_now()
+    payload = (
+        f"{SIGNED_QR_PREFIX}.{active_kid}.{int(outpass_id)}.{int(student_id)}."
+        f"{_ist_epoch(valid_from)}.{_ist_epoch(valid_until)}"
+    )
+    return f"{payload}.{_sign_qr_payload(keys[active_kid], payload)}"
+
+def verify_signed_qr_token(token, check_expiry=True):
+    """
+    Verify a QR token offline (no database access)
+    Args:
+        token: Scanned QR string
+        check_expiry: Reject tokens outside their validity window
+    Returns:
+        (claims, error_message)
+        claims is a dict {kid, outpass_id, student_id, valid_from, valid_until}.
+        Any token without the signed prefix is a legacy token (QR-..., or the
+        QR<id>-<timestamp> codes in existing data), carries no signature and
+        returns (None, None); it must be looked up in the database as before.
+    """
+    if not token.startswith(SIGNED_QR_PREFIX + '.'):
+        return None, None
+    
+    parts = token.split('.')
+    if len(parts) != 7:
+        return None, "Invalid QR code"
+    
+    _, kid, outpass_id, student_id, valid_from, valid_until, signature = parts
+    _, keys = get_qr_signing_keys()
+    secret = keys.get(kid)
+    if secret is None:
+        return None, "Invalid QR code"
+    
+    payload = token.rsplit('.', 1)[0]
+    if not hmac.compare_digest(_sign_qr_payload(secret, payload), signature):
+        return None, "Invalid QR code"
+    
+    try:
+        claims = {
+            'kid': kid,
+            'outpass_id': int(outpass_id),
+            'student_id': int(student_id),
+            'valid_from': _from_ist_epoch(int(valid_from)),
+            'valid_until': _from_ist_epoch(int(valid_until))
+        }
+    except ValueError:
+        return None, "Invalid QR code"
+    
+    if check_expiry:
+        now = get_ist_now()
+        if now > claims['valid_until']:
+            return None, "QR code expired"
+        if now < claims['valid_from']:
+            return None, "QR code not yet valid"
+    
+    return claims, None
+
 def login_required(f):
     """Decorator to require login for routes"""
     @wraps(f)
@@ -85,6 +197,23 @@ def role_required(*allowed_roles):
         return decorated_function
     return decorator
 
+def etag_matches(etag):
+    """True if the request's If-None-Match already names this version"""
+    return etag in request.if_none_match
+
+def json_with_etag(etag, payload, private=False):
+    """
+    JSON response tagged with an ETag the browser must revalidate (no-cache)
+    A matching If-None-Match gets an empty 304 instead and payload is not used.
+    """
+    if etag_matches(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+    return response
+
 def format_datetime(dt):
     """Format datetime object to string"""
     if dt is None:
@@ -115,6 +244,21 @@ def format_time(t):
         return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
     return t.strftime('%H:%M:%S')
 
+def parse_id_list(values):
+    """
+    Distinct ids from a JSON list, in order; a missing value is an empty list
+    Raises ValueError for anything but a list of positive integers (strings,
+    objects and booleans included), so "123" never becomes ids 1, 2 and 3.
+    """
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        raise ValueError('ids must be a list')
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f'invalid id: {value!r}')
+    return list(dict.fromkeys(values))
+
 def validate_outpass_timing(out_date, out_time, expected_return_time):
     """
     Validate outpass date and time
@@ -145,7 +289,7 @@ def validate_outpass_timing(out_date, out_time, expected_return_time):
     except ValueError as e:
         return False, f"Invalid date/time format: {str(e)}"
 
-def log_action(conn, outpass_id, action_by, action_type, remarks=None, ip_address=None):
+def log_action(conn, outpass_id, action_by, action_type, remarks=None, ip_address=None, commit=True):
     """
     Log an action in outpass_logs table
     Args:
@@ -155,19 +299,26 @@ def log_action(conn, outpass_id, action_by, action_type, remarks=None, ip_addres
         action_type: Type of action (created, approved, rejected, etc.)
         remarks: Optional remarks
         ip_address: Optional IP address
+        commit: True hands the record to the background audit writer, which commits
+                it in a batch shortly after. Pass False inside an open transaction to
+                insert it on conn, so it commits (or rolls back) with the state change.
     """
+    row = (outpass_id, action_by, action_type, remarks, ip_address, get_ist_now())
+    if commit and audit_writer.submit(row):
+        return True
+
+    # Synchronous path: atomic callers, or the audit queue is full
     try:
         cursor = conn.cursor()
-        query = """
-            INSERT INTO outpass_logs (outpass_id, action_by, action_type, remarks, ip_address)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (outpass_id, action_by, action_type, remarks, ip_address))
-        conn.commit()
+        insert_log_rows(cursor, [row])
+        if commit:
+            conn.commit()
         cursor.close()
         return True
     except Exception as e:
         print(f"Error logging action: {e}")
+        if not commit:
+            raise
         return False
 
 def get_client_ip():
@@ -188,42 +339,6 @@ def send_notification(user_email, subject, message):
     print(f"Message: {message}")
     return True
 
-def send_sms_notification(phone, message):
-    """
-    Send SMS notification to mobile number using Twilio
-    """
-    try:
-        from twilio.rest import Client
-        account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
-        auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
-        from_number = os.environ.get('TWILIO_PHONE_NUMBER')
-
-        if not all([account_sid, auth_token, from_number]):
-            print("⚠️ Twilio credentials missing in environment. Falling back to simulation.")
-            print(f"📱 Simulated SMS to {phone}")
-            print(f"Message: {message}")
-            return False
-
-        client = Client(account_sid, auth_token)
-        
-        # Ensure phone number is in E.164 format (starts with +)
-        # Assuming user provides 10 digits, we might need to add country code (+91 for India)
-        formatted_phone = phone if phone.startswith('+') else f"+91{phone}"
-
-        message = client.messages.create(
-            body=message,
-            from_=from_number,
-            to=formatted_phone
-        )
-        print(f"✅ SMS sent successfully! SID: {message.sid}")
-        return True
-    except Exception as e:
-        print(f"❌ Error sending SMS via Twilio: {e}")
-        # Fallback to simulation for visibility
-        print(f"📱 Simulated SMS to {phone}")
-        print(f"Message: {message}")
-        return False
-
 def is_qr_valid(qr_code, qr_expires_at, is_qr_used):
     """
     Check if QR code is valid for scanning
@@ -254,6 +369,15 @@ def calculate_duration(start_time, end_time):
     hours = duration.total_seconds() / 3600
     return round(hours, 2)
 
+def is_late_return(expected_return_at, actual_entry_time):
+    """
+    Check if entry is late against the stored outpasses.expected_return_at
+    (NULL for "Not Returning Today" passes, which are never late)
+    """
+    if not expected_return_at or not actual_entry_time:
+        return False
+    return actual_entry_time > expected_return_at
+
 def check_is_late(out_date, expected_return_time, actual_entry_time):
     """
     Check if entry is late
@@ -0,0 +1,242 @@
+"""
+Parent SMS notifications
+Routes queue messages in notification_outbox inside their own transaction
+(enqueue_sms) and a small pool of worker threads sends them through a single
+provider client, retrying failures with exponential backoff.
+
+Providers (SMS_PROVIDER):
+    twilio   - Twilio REST API (default when TWILIO_* credentials are set)
+    file     - append each message as a JSON line to SMS_OUTBOX_FILE (default otherwise)
+    loopback - keep messages in memory; for throughput tests without a network
+"""
+
+import abc
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from backend.config import get_db_connection, BASE_DIR
+
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', 2))
+NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 20))
+NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', 5))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', 5))
+NOTIFY_RETRY_BASE = int(os.getenv('NOTIFY_RETRY_BASE', 30))
+NOTIFY_RETRY_MAX = 3600
+# A row stuck in 'sending' this long belonged to a worker that died; it is claimed again
+NOTIFY_CLAIM_TIMEOUT = 300
+OUTBOX_TABLE = 'notification_outbox'
+
+
+def format_phone(phone):
+    """E.164 form; bare 10 digit numbers are assumed to be Indian (+91)"""
+    phone = phone.strip().replace(' ', '')
+    return phone if phone.startswith('+') else f"+91{phone}"
+
+
+class SMSProvider(abc.ABC):
+    """Provider interface: send() returns a provider reference or raises on failure"""
+    name = 'base'
+
+    @abc.abstractmethod
+    def send(self, to, body):
+        """Deliver body to the E.164 number to"""
+
+
+class TwilioProvider(SMSProvider):
+    name = 'twilio'
+
+    def __init__(self, account_sid, auth_token, from_number):
+        from twilio.rest import Client
+        # One client (and HTTP session) for the whole process
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send(self, to, body):
+        message = self.client.messages.create(body=body, from_=self.from_number, to=to)
+        return message.sid
+
+
+class FileProvider(SMSProvider):
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        ref = f"file-{uuid.uuid4().hex[:12]}"
+        line = json.dumps({'ref': ref, 'to': to, 'body': body, 'at': time.time()})
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        return ref
+
+
+class LoopbackProvider(SMSProvider):
+    name = 'loopback'
+
+    def __init__(self, keep=10000):
+        self.sent = deque(maxlen=keep)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        with self._lock:
+            self.count += 1
+            self.sent.append((to, body))
+            return f"loop-{self.count}"
+
+
+def create_sms_provider():
+    """Build the provider selected by SMS_PROVIDER"""
+    account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
+    auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
+    from_number = os.environ.get('TWILIO_PHONE_NUMBER')
+    has_twilio = all([account_sid, auth_token, from_number])
+
+    choice = os.environ.get('SMS_PROVIDER', 'twilio' if has_twilio else 'file').lower()
+    if choice == 'twilio':
+        if not has_twilio:
+            print("⚠️ Twilio credentials missing in environment. Falling back to file provider.")
+        else:
+            return TwilioProvider(account_sid, auth_token, from_number)
+    if choice == 'loopback':
+        return LoopbackProvider()
+    return FileProvider(os.environ.get('SMS_OUTBOX_FILE', os.path.join(BASE_DIR, 'sms_outbox.log')))
+
+
+def enqueue_sms(cursor, phone, message, dedup_key, outpass_id=None):
+    """
+    Queue an SMS in notification_outbox
+    Runs on the caller's cursor so the message commits with the change it announces.
+    Args:
+        dedup_key: Identifies the notification, e.g. "hod_approved:42"; a number
+                   that already has this key queued or sent is not messaged again
+    Returns: True if queued, False if it was a duplicate or there is no number
+    """
+    return enqueue_sms_batch(cursor, [(phone, message, dedup_key, outpass_id)]) == 1
+
+
+def enqueue_sms_batch(cursor, items, table=OUTBOX_TABLE):
+    """
+    Queue several SMS with one multi-row INSERT
+    Args:
+        items: (phone, message, dedup_key, outpass_id) tuples; entries without a number are skipped
+        table: Outbox table; only the benchmark uses another one
+    Returns: number of messages queued (duplicates are not counted)
+    """
+    rows = [(format_phone(phone), message, dedup_key, outpass_id)
+            for phone, message, dedup_key, outpass_id in items
+            if phone and phone.strip()]
+    if not rows:
+        return 0
+    placeholders = ', '.join(["('sms', %s, %s, %s, %s)"] * len(rows))
+    cursor.execute(f"""
+        INSERT IGNORE INTO {table} (channel, recipient, message, dedup_key, outpass_id)
+        VALUES {placeholders}
+    """, [value for row in rows for value in row])
+    return cursor.rowcount
+
+
+class NotificationDispatcher:
+    """Worker threads that drain an outbox table in this process"""
+
+    def __init__(self, table=OUTBOX_TABLE, provider_factory=create_sms_provider):
+        self.table = table
+        self._provider_factory = provider_factory
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+        self._pid = None
+        self.provider = None
+
+    def start(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own pool
+        with self._lock:
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self.provider = self._provider_factory()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'notify-{i}', daemon=True)
+                for i in range(NOTIFY_WORKERS)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def wake(self):
+        """Call after committing new outbox rows so they go out without waiting for a poll"""
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                sent = self._process_batch()
+            except Exception as e:
+                print(f"Notification worker error: {e}")
+                sent = 0
+            if sent == 0:
+                self._wake.wait(NOTIFY_POLL_INTERVAL)
+                self._wake.clear()
+
+    def _process_batch(self):
+        """Claim due rows, send them and record the outcome. Returns rows handled."""
+        conn = get_db_connection()
+        if not conn:
+            return 0
+        try:
+            cursor = conn.cursor(dictionary=True)
+            claim = uuid.uuid4().hex
+            cursor.execute(f"""
+                UPDATE {self.table}
+                SET status = 'sending', claimed_by = %s, claimed_at = NOW()
+                WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                OR (status = 'sending' AND claimed_at < NOW() - INTERVAL %s SECOND)
+                ORDER BY next_attempt_at
+                LIMIT %s
+            """, (claim, NOTIFY_CLAIM_TIMEOUT, NOTIFY_BATCH_SIZE))
+            conn.commit()
+            if cursor.rowcount == 0:
+                cursor.close()
+                return 0
+
+            cursor.execute(f"""
+                SELECT notification_id, recipient, message, attempts
+                FROM {self.table}
+                WHERE claimed_by = %s AND status = 'sending'
+            """, (claim,))
+            rows = cursor.fetchall()
+
+            for row in rows:
+                try:
+                    ref = self.provider.send(row['recipient'], row['message'])
+                    cursor.execute(f"""
+                        UPDATE {self.table}
+                        SET status = 'sent', sent_at = NOW(), provider_ref = %s,
+                            attempts = attempts + 1, last_error = NULL
+                        WHERE notification_id = %s AND claimed_by = %s
+                    """, (ref, row['notification_id'], claim))
+                except Exception as e:
+                    attempts = row['attempts'] + 1
+                    delay = min(NOTIFY_RETRY_BASE * (2 ** (attempts - 1)), NOTIFY_RETRY_MAX)
+                    status = 'failed' if attempts >= NOTIFY_MAX_ATTEMPTS else 'pending'
+                    print(f"❌ SMS to {row['recipient']} failed (attempt {attempts}): {e}")
+                    cursor.execute(f"""
+                        UPDATE {self.table}
+                        SET status = %s, attempts = %s, last_error = %s,
+                            next_attempt_at = NOW() + INTERVAL %s SECOND
+                        WHERE notification_id = %s AND claimed_by = %s
+                    """, (status, attempts, str(e)[:1000], delay, row['notification_id'], claim))
+                conn.commit()
+
+            cursor.close()
+            return len(rows)
+        finally:
+            conn.close()
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -44,7 +44,148 @@ def fmt_t(t):
         return t.strftime('%I:%M %p')
     return str(t)
 
-def generate_staff_monthly_report(staff_name, month_name, year, records):
+class Column:
+    """
+    One table column
+    value: function(row) -> raw value; format: function(value) -> text (default safe_str)
+    max_chars: longer text is cut to max_chars - 3 characters plus '...'
+    """
+    __slots__ = ('header', 'width', 'value', 'format', 'align', 'max_chars')
+
+    def __init__(self, header, width, value, format=None, align='L', max_chars=None):
+        self.header = header
+        self.width = width
+        self.value = value
+        self.format = format or safe_str
+        self.align = align
+        self.max_chars = max_chars
+
+
+def prepare_rows(records, columns):
+    """Yield each record as a tuple of final cell strings, formatting every value exactly once"""
+    for row in records:
+        cells = []
+        for col in columns:
+            text = col.format(col.value(row))
+            if col.max_chars and len(text) > col.max_chars:
+                text = text[:col.max_chars - 3] + '...'
+            cells.append(text)
+        yield tuple(cells)
+
+
+def draw_table(pdf, columns, rows, row_height, font_size, header_font_size):
+    """
+    Draw a bordered table, repeating the header row on every page it spills onto
+    Body rows are drawn as plain text plus one rule per row, and the column
+    lines once per page, instead of a full pdf.cell() (text layout, border and
+    graphics state handling) for every cell.
+    """
+    left = pdf.l_margin
+    edges = [left]
+    for col in columns:
+        edges.append(edges[-1] + col.width)
+    right = edges[-1]
+
+    def draw_header():
+        pdf.set_fill_color(241, 245, 249)
+        pdf.set_font('helvetica', 'B', header_font_size)
+        for col in columns:
+            pdf.cell(col.width, row_height, col.header, border=1, align='C', fill=True)
+        pdf.ln(row_height)
+        pdf.set_font('helvetica', '', font_size)
+
+    def draw_column_lines(top, bottom):
+        if bottom > top:
+            for x in edges:
+                pdf.line(x, top, x, bottom)
+
+    # Same text placement as pdf.cell(): c_margin padding, baseline 0.3 font sizes below the middle
+    margin = pdf.c_margin
+    widths = {}
+    layout = [(edges[i], col.width, col.align) for i, col in enumerate(columns)]
+
+    draw_header()
+    top = y = pdf.y
+    baseline = 0.5 * row_height + 0.3 * pdf.font_size
+    for cells in rows:
+        if y + row_height > pdf.page_break_trigger:
+            draw_column_lines(top, y)
+            pdf.add_page()
+            draw_header()
+            top = y = pdf.y
+        for (x, width, align), text in zip(layout, cells):
+            if not text:
+                continue
+            if align != 'L':
+                text_width = widths.get(text)
+                if text_width is None:
+                    text_width = widths[text] = pdf.get_string_width(text)
+                x += (width - text_width) / 2 if align == 'C' else width - margin - text_width
+            else:
+                x += margin
+            pdf.text(x, y + baseline, text)
+        y += row_height
+        pdf.line(left, y, right, y)
+    draw_column_lines(top, y)
+    pdf.set_y(y)
+
+
+def write_pdf(pdf, out=None):
+    """
+    Finish the document
+    out: path or binary file object to write to; without it the PDF is returned as bytes.
+    The output buffer is written as is rather than copied into a new bytes object.
+    """
+    data = pdf.output()
+    if out is None:
+        return bytes(data)
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'wb') as f:
+            f.write(data)
+    else:
+        out.write(data)
+    return None
+
+
+def _student_name(row):
+    return row.get('student_name', row.get('full_name', 'Unknown'))
+
+
+def _entry_with_late(row):
+    entry = row.get('actual_entry_time')
+    text = fmt_t(entry)
+    if entry and check_is_late(row.get('out_date'), row.get('expected_return_time'), entry):
+        text += ' (LATE)'
+    return text
+
+
+def _status(value):
+    return safe_str(value).capitalize()
+
+
+STAFF_REPORT_COLUMNS = [
+    Column('Student', 50, _student_name),
+    Column('Reg No', 30, lambda r: r.get('registration_no', '-'), align='C'),
+    Column('Date', 25, lambda r: r.get('out_date', '-'), align='C'),
+    Column('Exit Time', 35, lambda r: r.get('actual_exit_time'), format=fmt_t, align='C'),
+    Column('Entry Time', 35, lambda r: r, format=_entry_with_late, align='C'),
+    Column('Reason', 65, lambda r: r.get('reason', '-'), max_chars=40),
+    Column('Status', 30, lambda r: r.get('final_status', 'Pending'), format=_status, align='C')
+]
+
+HOD_REPORT_COLUMNS = [
+    Column('Student', 45, _student_name),
+    Column('Reg No', 25, lambda r: r.get('registration_no', '-'), align='C'),
+    Column('Date', 22, lambda r: r.get('out_date', '-'), align='C'),
+    Column('Exit', 30, lambda r: r.get('actual_exit_time'), format=fmt_t, align='C'),
+    Column('Entry', 30, lambda r: r, format=_entry_with_late, align='C'),
+    Column('Reason', 50, lambda r: r.get('reason', '-'), max_chars=30),
+    Column('Advisor', 35, lambda r: r.get('advisor_name', 'N/A')),
+    Column('Status', 20, lambda r: r.get('final_status', 'Pending'), format=_status, align='C')
+]
+
+
+def generate_staff_monthly_report(staff_name, month_name, year, records, out=None):
     pdf = OutpassPDF(orientation='L') # Landscape
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.alias_nb_pages()
@@ -59,51 +200,12 @@ def generate_staff_monthly_report(staff_name, month_name, year, records):
     pdf.cell(0, 10, f'Advisor: {safe_str(staff_name)}', ln=True)
     pdf.ln(5)
     
-    # Table Header
-    pdf.set_fill_color(241, 245, 249)
-    pdf.set_font('helvetica', 'B', 10)
+    draw_table(pdf, STAFF_REPORT_COLUMNS, prepare_rows(records, STAFF_REPORT_COLUMNS),
+               row_height=10, font_size=9, header_font_size=10)
     
-    cols = [
-        ('Student', 50),
-        ('Reg No', 30),
-        ('Date', 25),
-        ('Exit Time', 35),
-        ('Entry Time', 35),
-        ('Reason', 65),
-        ('Status', 30)
-    ]
-    
-    for col_name, width in cols:
-        pdf.cell(width, 10, col_name, border=1, align='C', fill=True)
-    pdf.ln()
-    
-    # Table Content
-    pdf.set_font('helvetica', '', 9)
-    for row in records:
-        pdf.cell(50, 10, safe_str(row.get('student_name', row.get('full_name', 'Unknown'))), border=1)
-        pdf.cell(30, 10, safe_str(row.get('registration_no', '-')), border=1, align='C')
-        pdf.cell(25, 10, safe_str(row.get('out_date', '-')), border=1, align='C')
-        
-        pdf.cell(35, 10, fmt_t(row.get('actual_exit_time')), border=1, align='C')
-        # Entry Time with late indicator
-        entry_time_str = fmt_t(row.get('actual_entry_time'))
-        if row.get('actual_entry_time') and check_is_late(row.get('out_date'), row.get('expected_return_time'), row.get('actual_entry_time')):
-            entry_time_str += ' (LATE)'
-        pdf.cell(35, 10, entry_time_str, border=1, align='C')
-        
-        # Multiline reason
-        reason = safe_str(row.get('reason', '-'))
-        if len(reason) > 40:
-            reason = reason[:37] + '...'
-        pdf.cell(65, 10, reason, border=1)
-        
-        status = row.get('final_status', 'Pending')
-        pdf.cell(30, 10, safe_str(status).capitalize(), border=1, align='C')
-        pdf.ln()
-        
-    return bytes(pdf.output())
+    return write_pdf(pdf, out)
 
-def generate_hod_monthly_report(dept_name, month_name, year, records_by_year):
+def generate_hod_monthly_report(dept_name, month_name, year, records_by_year, out=None):
     pdf = OutpassPDF(orientation='L') # Landscape
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.alias_nb_pages()
@@ -127,48 +229,9 @@ def generate_hod_monthly_report(dept_name, month_name, year, records_by_year):
         pdf.cell(0, 10, f'{academic_year} Students', ln=True)
         pdf.ln(2)
         
-        # Table Header
-        pdf.set_fill_color(241, 245, 249)
-        pdf.set_font('helvetica', 'B', 9)
-        
-        cols = [
-            ('Student', 45),
-            ('Reg No', 25),
-            ('Date', 22),
-            ('Exit', 30),
-            ('Entry', 30),
-            ('Reason', 50),
-            ('Advisor', 35),
-            ('Status', 20)
-        ]
-        
-        for col_name, width in cols:
-            pdf.cell(width, 8, col_name, border=1, align='C', fill=True)
-        pdf.ln()
-        
-        # Table Content
-        pdf.set_font('helvetica', '', 8)
-        for row in records:
-            pdf.cell(45, 8, safe_str(row.get('student_name', row.get('full_name', 'Unknown'))), border=1)
-            pdf.cell(25, 8, safe_str(row.get('registration_no', '-')), border=1, align='C')
-            pdf.cell(22, 8, safe_str(row.get('out_date', '-')), border=1, align='C')
-            
-            pdf.cell(30, 8, fmt_t(row.get('actual_exit_time')), border=1, align='C')
-            # Entry Time with late indicator
-            entry_time_str = fmt_t(row.get('actual_entry_time'))
-            if row.get('actual_entry_time') and check_is_late(row.get('out_date'), row.get('expected_return_time'), row.get('actual_entry_time')):
-                entry_time_str += ' (LATE)'
-            pdf.cell(30, 8, entry_time_str, border=1, align='C')
-            
-            reason = safe_str(row.get('reason', '-'))
-            if len(reason) > 30:
-                reason = reason[:27] + '...'
-            pdf.cell(50, 8, reason, border=1)
-            
-            pdf.cell(35, 8, safe_str(row.get('advisor_name', 'N/A')), border=1)
-            pdf.cell(20, 8, safe_str(row.get('final_status', 'Pending')).capitalize(), border=1, align='C')
-            pdf.ln()
+        draw_table(pdf, HOD_REPORT_COLUMNS, prepare_rows(records, HOD_REPORT_COLUMNS),
+                   row_height=8, font_size=8, header_font_size=9)
         
         pdf.ln(10)
         
-    return bytes(pdf.output())
+    return write_pdf(pdf, out)
@@ -0,0 +1,109 @@
+"""
+User profile cache
+check_session runs on every page load. The profile it returns (user joined with
+department and advisor) is kept per user for PROFILE_CACHE_TTL seconds, so a
+warm session check does not touch MySQL. login primes the entry. Next to the
+profile each entry keeps the ActingUser that routes read through
+backend.utils.context.current_user().
+
+Routes that change what a profile shows call profile_cache.invalidate(user_id)
+or profile_cache.clear() for department edits. Entries live in the shared
+cache (backend/utils/cache.py, namespace "profiles"), so invalidation reaches
+every worker.
+"""
+
+import os
+from collections import namedtuple
+
+from backend.utils.cache import cache
+
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 60))
+NAMESPACE = 'profiles'
+
+ActingUser = namedtuple('ActingUser', 'user_id role dept_id full_name')
+
+# The advisor name comes from the same row; no second query per student
+PROFILE_QUERY = """
+    SELECT u.*, d.dept_name, d.dept_code, a.full_name AS advisor_name
+    FROM users u
+    LEFT JOIN departments d ON u.dept_id = d.dept_id
+    LEFT JOIN users a ON u.role = 'student' AND a.user_id = u.advisor_id
+    WHERE {where} AND u.is_active = TRUE
+"""
+
+
+def profile_data(user):
+    """Public profile fields of a PROFILE_QUERY row (no password hash)"""
+    return {
+        'user_id': user['user_id'],
+        'username': user['username'],
+        'email': user['email'],
+        'full_name': user['full_name'],
+        'role': user['role'],
+        'dept_name': user.get('dept_name'),
+        'dept_code': user.get('dept_code'),
+        'registration_no': user.get('registration_no'),
+        'academic_year': user.get('academic_year'),
+        'phone': user.get('phone'),
+        'parent_name': user.get('parent_name'),
+        'parent_mobile': user.get('parent_mobile'),
+        'profile_image': user.get('profile_image').replace('uploads/', '', 1) if user.get('profile_image') else None,
+        'advisor_name': user.get('advisor_name')
+    }
+
+
+class ProfileCache:
+    """Entries are (profile, ActingUser) under the user's id"""
+
+    def put(self, user, generation=None):
+        """Cache the profile of a PROFILE_QUERY row; returns the profile"""
+        profile = profile_data(user)
+        acting = ActingUser(user['user_id'], user['role'], user.get('dept_id'), user['full_name'])
+        cache.set(NAMESPACE, user['user_id'], (profile, acting), PROFILE_CACHE_TTL, generation=generation)
+        return profile
+
+    def cached(self, user_id):
+        """Fresh cached profile, or None"""
+        entry = cache.get(NAMESPACE, user_id)
+        return entry[0] if entry else None
+
+    def cached_acting(self, user_id):
+        """Fresh cached ActingUser, or None"""
+        entry = cache.get(NAMESPACE, user_id)
+        return entry[1] if entry else None
+
+    def load(self, conn, user_id):
+        """
+        Read a profile from the database and cache it
+        Returns: profile dict, or None if the user does not exist or is inactive
+        """
+        generation = cache.generation(NAMESPACE)
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(PROFILE_QUERY.format(where="u.user_id = %s"), (user_id,))
+        user = cursor.fetchone()
+        cursor.close()
+        if not user:
+            cache.delete(NAMESPACE, user_id)
+            return None
+        return self.put(user, generation)
+
+    def invalidate(self, *user_ids):
+        """
+        Drop the given users
+        Students show their advisor's name, so unless every user is a known
+        student the whole namespace goes.
+        """
+        for user_id in user_ids:
+            acting = self.cached_acting(user_id)
+            if not acting or acting.role != 'student':
+                self.clear()
+                return
+        for user_id in user_ids:
+            cache.delete(NAMESPACE, user_id)
+
+    def clear(self):
+        """Drop every profile"""
+        cache.invalidate(NAMESPACE)
+
+
+profile_cache = ProfileCache()
@@ -0,0 +1,173 @@
+"""
+Outpass reason categories
+Reasons are free text. apply_outpass files each one under a small category id
+(outpasses.reason_category_id) so "top reasons" can count categories instead of
+grouping the TEXT column, where "home", "Home " and "going home" all differ.
+
+Matching is by keyword on normalised words; words within a typo or two of a
+keyword ("hospitl", "medicel") also count. The category with the most matched
+keywords wins; ties go to the category earlier in TIE_PRIORITY, which puts
+Emergency first and the broad Going Home last ("father's death" is an
+emergency, not a trip home). Ids are stored in the database:
+add new categories at the end and never renumber. After changing the keywords,
+run scripts/backfill_reason_categories.py --all to refile history.
+"""
+
+import re
+from difflib import get_close_matches
+
+OTHER_CATEGORY = 0
+
+# id -> (label, keywords)
+REASON_CATEGORIES = {
+    1: ('Medical', (
+        'medical', 'hospital', 'doctor', 'clinic', 'sick', 'ill', 'illness', 'fever', 'health',
+        'treatment', 'checkup', 'dentist', 'dental', 'medicine', 'medicines', 'pharmacy', 'injury',
+        'scan', 'test', 'eye', 'pain', 'unwell', 'surgery', 'appointment'
+    )),
+    2: ('Going Home', (
+        'home', 'house', 'native', 'hometown', 'village', 'parents', 'parent', 'mother', 'father',
+        'family', 'weekend', 'vacation', 'holiday', 'holidays'
+    )),
+    3: ('Family Function', (
+        'function', 'wedding', 'marriage', 'engagement', 'ceremony', 'birthday', 'festival',
+        'celebration', 'reception', 'housewarming', 'relative', 'relatives', 'cousin'
+    )),
+    4: ('Emergency', (
+        'emergency', 'urgent', 'death', 'funeral', 'demise', 'accident', 'critical',
+        'serious', 'hospitalised', 'hospitalized'
+    )),
+    5: ('Academic / Official', (
+        'exam', 'exams', 'interview', 'placement', 'internship', 'seminar', 'workshop',
+        'conference', 'symposium', 'hackathon', 'competition', 'project', 'college', 'university',
+        'office', 'official', 'certificate', 'documents', 'document', 'admission', 'training', 'course'
+    )),
+    6: ('Government / Bank Work', (
+        'bank', 'passport', 'aadhar', 'aadhaar', 'license', 'licence', 'government', 'govt',
+        'registration', 'verification', 'vote', 'voting', 'election', 'police', 'court', 'atm'
+    )),
+    7: ('Shopping / Personal', (
+        'shopping', 'purchase', 'buy', 'buying', 'market', 'personal', 'haircut', 'salon',
+        'barber', 'clothes', 'dress', 'mobile', 'laptop', 'repair', 'stationery', 'groceries'
+    )),
+    8: ('Religious Visit', (
+        'temple', 'church', 'mosque', 'pooja', 'puja', 'prayer', 'worship', 'pilgrimage', 'mass'
+    )),
+    9: ('Travel', (
+        'travel', 'trip', 'journey', 'train', 'bus', 'flight', 'airport', 'station', 'ticket',
+        'railway', 'tour'
+    )),
+}
+
+# Tie-break order, most specific first; every category id appears once
+TIE_PRIORITY = (4, 1, 3, 5, 6, 8, 9, 7, 2)
+_TIE_RANK = {category_id: rank for rank, category_id in enumerate(TIE_PRIORITY)}
+
+_KEYWORDS = {}
+for _category_id, (_label, _words) in REASON_CATEGORIES.items():
+    for _word in _words:
+        _KEYWORDS.setdefault(_word, _category_id)
+_VOCABULARY = list(_KEYWORDS)
+_WORD_PATTERN = re.compile(r'[a-z]+')
+# Short words are left to exact matches; "ill" is one letter from too much
+_FUZZY_MIN_LENGTH = 5
+_FUZZY_CUTOFF = 0.85
+
+
+def _keyword_for(word):
+    if word in _KEYWORDS:
+        return word
+    # Plain plurals/verb forms: "exams", "doctors", "weddings"
+    if word.endswith('s') and word[:-1] in _KEYWORDS:
+        return word[:-1]
+    if len(word) >= _FUZZY_MIN_LENGTH:
+        match = get_close_matches(word, _VOCABULARY, n=1, cutoff=_FUZZY_CUTOFF)
+        if match:
+            return match[0]
+    return None
+
+
+def categorize_reason(text):
+    """
+    Category id for a free-text reason; OTHER_CATEGORY when nothing matches
+
+    >>> reason_label(categorize_reason("Fathers death"))
+    'Emergency'
+    >>> reason_label(categorize_reason("family emergency"))
+    'Emergency'
+    >>> reason_label(categorize_reason("father unwell"))
+    'Medical'
+    >>> reason_label(categorize_reason("Going home for the weekend"))
+    'Going Home'
+    >>> reason_label(categorize_reason("cousin's wedding at home"))
+    'Family Function'
+    """
+    if not text:
+        return OTHER_CATEGORY
+    scores = {}
+    for word in set(_WORD_PATTERN.findall(text.lower())):
+        keyword = _keyword_for(word)
+        if keyword:
+            category_id = _KEYWORDS[keyword]
+            scores[category_id] = scores.get(category_id, 0) + 1
+    if not scores:
+        return OTHER_CATEGORY
+    return max(scores, key=lambda category_id: (scores[category_id], -_TIE_RANK[category_id]))
+
+
+def reason_label(category_id):
+    """Display label for a category id (NULL means not yet categorised)"""
+    if category_id is None:
+        return 'Uncategorised'
+    category = REASON_CATEGORIES.get(category_id)
+    return category[0] if category else 'Other'
+
+
+def label_top_reasons(rows):
+    """Turn rows of reason_category_id and count into [{reason (label), category_id, count}]"""
+    return [
+        {'reason': reason_label(row['reason_category_id']), 'category_id': row['reason_category_id'], 'count': row['count']}
+        for row in rows
+    ]
+
+
+def backfill_reason_categories(conn, recategorize=False, batch_size=1000):
+    """
+    File existing outpasses under reason categories, batch_size rows per transaction
+    Args:
+        recategorize: Refile every outpass, not only those without a category
+    Returns: number of outpasses updated
+    """
+    cursor = conn.cursor()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute(f"""
+                SELECT outpass_id, reason, reason_category_id FROM outpasses
+                WHERE outpass_id > %s {'' if recategorize else 'AND reason_category_id IS NULL'}
+                ORDER BY outpass_id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            changes = []
+            for outpass_id, reason, current in rows:
+                category_id = categorize_reason(reason)
+                if category_id != current:
+                    changes.append((category_id, outpass_id))
+            if changes:
+                conn.start_transaction()
+                # updated_at is kept: refiling is not a change the rollup or report caches care about
+                cursor.executemany(
+                    "UPDATE outpasses SET reason_category_id = %s, updated_at = updated_at WHERE outpass_id = %s",
+                    changes
+                )
+                conn.commit()
+                updated += len(changes)
+        return updated
+    finally:
+        cursor.close()
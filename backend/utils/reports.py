@@ -0,0 +1,354 @@
+"""
+Monthly history report jobs
+PDF reports are rendered in a process pool and stored on disk, named by
+(scope, month, data version). The version is a cheap aggregate over the
+outpass rows a report covers, so asking for an unchanged report finds the
+finished file and serves it without rendering again.
+
+All job state lives in REPORTS_DIR, so any gunicorn worker can answer a poll:
+    <job_id>.json   job spec, written on submit
+    <job_id>.lock   held while a render is running
+    <job_id>.pdf    finished report
+    <job_id>.err    last failure message
+"""
+
+import os
+import re
+import time
+import hashlib
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import jsonify, send_file
+from backend.config import get_db_connection, BASE_DIR
+
+REPORTS_DIR = os.getenv('REPORTS_DIR', os.path.join(BASE_DIR, 'reports_cache'))
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))
+# A lock older than this belonged to a render that died; the job is started again
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', 600))
+
+JOB_ID_PATTERN = re.compile(r'^(dept|advisor)-(\d+)-(\d{4}-\d{2})-[0-9a-f]{16}$')
+
+
+def _month_bounds(month):
+    """'YYYY-MM' to (first day, first day of the next month)"""
+    start = datetime.strptime(month, '%Y-%m')
+    return start, datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def _data_version(cursor, scope, scope_id, month):
+    """
+    Fingerprint of everything the report prints, computed in SQL
+    Student and advisor details are joined in, so renaming either changes it.
+    Returns None when the department or advisor does not exist.
+    """
+    start, end = _month_bounds(month)
+    digest = """
+        COUNT(o.outpass_id) AS row_count,
+        MAX(o.updated_at) AS last_change,
+        BIT_XOR(CRC32(CONCAT_WS('|', o.outpass_id, o.out_date, o.reason, o.final_status,
+                                o.expected_return_time, o.actual_exit_time, o.actual_entry_time,
+                                o.advisor_id, o.updated_at, s.full_name, s.registration_no,
+                                s.academic_year, a.full_name))) AS digest
+    """
+    people = """
+        LEFT JOIN users s ON s.user_id = o.student_id
+        LEFT JOIN users a ON a.user_id = o.advisor_id
+    """
+    if scope == 'dept':
+        cursor.execute(f"""
+            SELECT d.dept_name AS title, {digest}
+            FROM departments d
+            LEFT JOIN outpasses o ON o.dept_id = d.dept_id
+                AND o.final_status IN ('approved', 'used')
+                AND ((o.advisor_action_time >= %s AND o.advisor_action_time < %s)
+                     OR (o.hod_action_time >= %s AND o.hod_action_time < %s))
+            {people}
+            WHERE d.dept_id = %s
+            GROUP BY d.dept_id, d.dept_name
+        """, (start, end, start, end, scope_id))
+    else:
+        cursor.execute(f"""
+            SELECT u.full_name AS title, {digest}
+            FROM users u
+            LEFT JOIN outpasses o ON o.advisor_id = u.user_id
+                AND o.advisor_status != 'pending'
+                AND o.advisor_action_time >= %s AND o.advisor_action_time < %s
+            {people}
+            WHERE u.user_id = %s
+            GROUP BY u.user_id, u.full_name
+        """, (start, end, scope_id))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    raw = '|'.join(str(value) for value in row)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _load_dept_report(cursor, dept_id, month):
+    from backend.utils.helpers import format_date
+
+    start, end = _month_bounds(month)
+    cursor.execute("SELECT dept_name FROM departments WHERE dept_id = %s", (dept_id,))
+    dept = cursor.fetchone()
+    cursor.execute("""
+        SELECT o.*, u.full_name as student_name, u.registration_no, u.academic_year, d.dept_name, a.full_name as advisor_name
+        FROM outpasses o
+        JOIN users u ON o.student_id = u.user_id
+        JOIN departments d ON o.dept_id = d.dept_id
+        LEFT JOIN users a ON o.advisor_id = a.user_id
+        WHERE o.dept_id = %s
+        AND o.final_status IN ('approved', 'used')
+        AND (
+            (o.advisor_action_time >= %s AND o.advisor_action_time < %s)
+            OR (o.hod_action_time >= %s AND o.hod_action_time < %s)
+        )
+        ORDER BY u.academic_year ASC, o.out_date DESC
+    """, (dept_id, start, end, start, end))
+    records = cursor.fetchall()
+
+    records_by_year = {}
+    for rec in records:
+        rec['out_date'] = format_date(rec['out_date'])
+        # Use academic_year if available, otherwise infer it from the batch year in the registration no
+        year_level = rec.get('academic_year')
+        if not year_level:
+            match = re.search(r'(\d{4})', rec.get('registration_no') or '')
+            if match:
+                academic_start_year = start.year if start.month >= 7 else start.year - 1
+                year_level = min(max(academic_start_year - int(match.group(1)) + 1, 1), 3)
+            else:
+                year_level = 0
+        year_label = f"Year {year_level}" if year_level > 0 else "Unknown Year"
+        records_by_year.setdefault(year_label, []).append(rec)
+
+    return (dept['dept_name'] if dept else 'Department'), records_by_year
+
+
+def _load_advisor_report(cursor, advisor_id, month):
+    from backend.utils.helpers import format_date
+
+    start, end = _month_bounds(month)
+    cursor.execute("SELECT full_name FROM users WHERE user_id = %s", (advisor_id,))
+    staff = cursor.fetchone()
+    cursor.execute("""
+        SELECT
+            o.*,
+            s.full_name as student_name,
+            s.registration_no
+        FROM outpasses o
+        JOIN users s ON o.student_id = s.user_id
+        WHERE o.advisor_id = %s
+        AND o.advisor_status != 'pending'
+        AND o.advisor_action_time >= %s AND o.advisor_action_time < %s
+        ORDER BY o.advisor_action_time DESC
+    """, (advisor_id, start, end))
+    records = cursor.fetchall()
+    for rec in records:
+        rec['out_date'] = format_date(rec['out_date'])
+    return (staff['full_name'] if staff else 'Staff'), records
+
+
+def render_report(job_id, spec):
+    """Process pool entry point: query the data, render the PDF and store it"""
+    from backend.utils.pdf_generator import generate_hod_monthly_report, generate_staff_monthly_report
+
+    paths = _paths(job_id)
+    try:
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError('Database connection failed')
+        try:
+            cursor = conn.cursor(dictionary=True)
+            if spec['scope'] == 'dept':
+                title, records = _load_dept_report(cursor, spec['scope_id'], spec['month'])
+            else:
+                title, records = _load_advisor_report(cursor, spec['scope_id'], spec['month'])
+            cursor.close()
+        finally:
+            conn.close()
+
+        start, _ = _month_bounds(spec['month'])
+        month_name, year = start.strftime('%B'), start.strftime('%Y')
+        generate = generate_hod_monthly_report if spec['scope'] == 'dept' else generate_staff_monthly_report
+        tmp_path = f"{paths['pdf']}.{os.getpid()}.tmp"
+        generate(title, month_name, year, records, out=tmp_path)
+        os.replace(tmp_path, paths['pdf'])
+        _remove_older_versions(job_id)
+    except Exception as e:
+        with open(paths['err'], 'w', encoding='utf-8') as f:
+            f.write(str(e)[:1000])
+        raise
+    finally:
+        _remove(paths['lock'])
+
+
+def _paths(job_id):
+    base = os.path.join(REPORTS_DIR, job_id)
+    return {ext: f"{base}.{ext}" for ext in ('json', 'lock', 'pdf', 'err')}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_older_versions(job_id):
+    """Once a report is rendered, earlier versions of the same scope and month are stale"""
+    prefix = job_id.rsplit('-', 1)[0] + '-'
+    for name in os.listdir(REPORTS_DIR):
+        other, _, ext = name.partition('.')
+        if not other.startswith(prefix) or other == job_id or ext not in ('json', 'pdf', 'err'):
+            continue
+        # Leave renders that are still running alone
+        if not os.path.exists(_paths(other)['lock']):
+            _remove(os.path.join(REPORTS_DIR, name))
+
+
+class ReportJobs:
+    """Submits render jobs to a per-process pool and reports their state from disk"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # A pool inherited across fork is unusable, so each gunicorn worker makes its own.
+        # Children are spawned so they do not inherit this process's threads and sockets.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=REPORT_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, conn, scope, scope_id, month):
+        """
+        Find or start the report for the current data
+        Returns: job dict as from status(), or None if the scope does not exist
+        """
+        cursor = conn.cursor()
+        version = _data_version(cursor, scope, scope_id, month)
+        cursor.close()
+        if version is None:
+            return None
+
+        job_id = f"{scope}-{scope_id}-{month}-{version}"
+        paths = _paths(job_id)
+        if not os.path.exists(paths['pdf']):
+            os.makedirs(REPORTS_DIR, exist_ok=True)
+            with open(paths['json'], 'w', encoding='utf-8') as f:
+                json.dump({'scope': scope, 'scope_id': scope_id, 'month': month}, f)
+            self._start(job_id)
+        return self.status(job_id)
+
+    def _start(self, job_id):
+        """Claim the job's lock file and queue the render; a no-op if another worker holds it"""
+        paths = _paths(job_id)
+        try:
+            if time.time() - os.path.getmtime(paths['lock']) > REPORT_JOB_TIMEOUT:
+                _remove(paths['lock'])
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(paths['lock'], os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return
+        _remove(paths['err'])
+
+        with open(paths['json'], encoding='utf-8') as f:
+            spec = json.load(f)
+        try:
+            future = self._get_executor().submit(render_report, job_id, spec)
+        except Exception:
+            _remove(paths['lock'])
+            raise
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        error = future.exception()
+        if error is None:
+            return
+        print(f"Report job {job_id} failed: {error}")
+        paths = _paths(job_id)
+        # A crashed child never got to record the failure itself
+        if not os.path.exists(paths['err']):
+            with open(paths['err'], 'w', encoding='utf-8') as f:
+                f.write(str(error)[:1000] or type(error).__name__)
+        _remove(paths['lock'])
+
+    def status(self, job_id):
+        """
+        Current state of a job: done, running, failed or not_found
+        A job whose render was lost (its worker restarted) is started again here.
+        """
+        if not JOB_ID_PATTERN.match(job_id):
+            return {'job_id': job_id, 'status': 'not_found'}
+        paths = _paths(job_id)
+        if os.path.exists(paths['pdf']):
+            return {'job_id': job_id, 'status': 'done'}
+        if os.path.exists(paths['err']) and not os.path.exists(paths['lock']):
+            with open(paths['err'], encoding='utf-8') as f:
+                return {'job_id': job_id, 'status': 'failed', 'error': f.read()}
+        if not os.path.exists(paths['json']):
+            return {'job_id': job_id, 'status': 'not_found'}
+        if not os.path.exists(paths['lock']):
+            self._start(job_id)
+        else:
+            try:
+                if time.time() - os.path.getmtime(paths['lock']) > REPORT_JOB_TIMEOUT:
+                    self._start(job_id)
+            except FileNotFoundError:
+                pass
+        return {'job_id': job_id, 'status': 'running'}
+
+
+
+def report_month(value, now):
+    """Validated 'YYYY-MM' month for a request, defaulting to the month of now; None if invalid"""
+    if not value:
+        return now.strftime('%Y-%m')
+    try:
+        return datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+    except ValueError:
+        return None
+
+
+def report_response(job, url_base, filename_prefix):
+    """The PDF if the job is done, otherwise 202 with the job to poll at url_base/<job_id>"""
+    if job['status'] == 'done':
+        return send_file(_paths(job['job_id'])['pdf'], mimetype='application/pdf', as_attachment=True,
+                         download_name=job_filename(job['job_id'], filename_prefix))
+    return jsonify(job_payload(job, url_base)), 202
+
+
+def job_payload(job, url_base):
+    payload = {'success': job['status'] != 'failed', **job, 'status_url': f"{url_base}/{job['job_id']}"}
+    if job['status'] == 'done':
+        payload['download_url'] = f"{url_base}/{job['job_id']}/download"
+    return payload
+
+
+def job_scope(job_id):
+    """(scope, scope_id) a job id belongs to, for ownership checks"""
+    match = JOB_ID_PATTERN.match(job_id)
+    if not match:
+        return None, None
+    return match.group(1), int(match.group(2))
+
+
+def job_filename(job_id, prefix):
+    """Download name like Dept_Outpass_History_October_2026.pdf"""
+    month = JOB_ID_PATTERN.match(job_id).group(3)
+    start, _ = _month_bounds(month)
+    return f"{prefix}_{start.strftime('%B')}_{start.strftime('%Y')}.pdf"
+
+
+report_jobs = ReportJobs()
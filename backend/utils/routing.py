@@ -0,0 +1,101 @@
+"""
+Outpass routing cache
+Maps a student to the advisor and HOD their requests go to, so apply_outpass
+does not look them up on every submission. Routing only changes when admins
+edit users or departments; those routes call routing_cache.invalidate().
+
+Resolution order (same as the original per-request lookups):
+    1. The student's own advisor_id (per-student override)
+    2. First active staff in the same department and academic year
+    3. First active staff in the same department
+HOD: first active HOD of the student's department.
+
+The snapshot holds only the small per-department staff and HOD maps and
+lives in the shared cache (backend/utils/cache.py, namespace "routing") for
+ROUTING_CACHE_TTL seconds, so one worker's build serves all of them and
+invalidate() reaches every worker. Students are cached one key each
+("student:<id>"), filled by a primary key read on first use.
+"""
+
+import os
+
+from backend.utils.cache import cache
+
+ROUTING_CACHE_TTL = int(os.getenv('ROUTING_CACHE_TTL', 60))
+NAMESPACE = 'routing'
+
+
+class RoutingCache:
+    def build(self, conn):
+        """
+        Load staff and HOD routing with one query
+        Returns: (year_staff, dept_staff, dept_hod) where
+            year_staff: (dept_id, academic_year) -> staff user_id
+            dept_staff: dept_id -> staff user_id
+            dept_hod:   dept_id -> hod user_id
+        """
+        generation = cache.generation(NAMESPACE)
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT user_id, role, dept_id, academic_year
+            FROM users
+            WHERE role IN ('staff', 'hod') AND is_active = TRUE AND dept_id IS NOT NULL
+            ORDER BY user_id
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+
+        year_staff, dept_staff, dept_hod = {}, {}, {}
+        for row in rows:
+            if row['role'] == 'staff':
+                dept_staff.setdefault(row['dept_id'], row['user_id'])
+                if row['academic_year'] is not None:
+                    year_staff.setdefault((row['dept_id'], row['academic_year']), row['user_id'])
+            else:
+                dept_hod.setdefault(row['dept_id'], row['user_id'])
+
+        snapshot = (year_staff, dept_staff, dept_hod)
+        cache.set(NAMESPACE, 'snapshot', snapshot, ROUTING_CACHE_TTL, generation=generation)
+        return snapshot
+
+    def invalidate(self):
+        """Drop the cache in every worker; the next lookup rebuilds it"""
+        cache.invalidate(NAMESPACE)
+
+    def _student(self, conn, student_id):
+        """(dept_id, academic_year, advisor_id) of a student, or None"""
+        key = f'student:{student_id}'
+        student = cache.get(NAMESPACE, key)
+        if student is None:
+            generation = cache.generation(NAMESPACE)
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT dept_id, academic_year, advisor_id FROM users
+                WHERE user_id = %s AND role = 'student'
+            """, (student_id,))
+            row = cursor.fetchone()
+            cursor.close()
+            if not row:
+                return None
+            student = (row['dept_id'], row['academic_year'], row['advisor_id'])
+            cache.set(NAMESPACE, key, student, ROUTING_CACHE_TTL, generation=generation)
+        return student
+
+    def resolve(self, conn, student_id):
+        """
+        Find where a student's request goes
+        Returns: (dept_id, advisor_id, hod_id), or None if the student does not exist.
+                 advisor_id is None when the department has no staff.
+        """
+        student = self._student(conn, student_id)
+        if student is None:
+            return None
+        year_staff, dept_staff, dept_hod = cache.get(NAMESPACE, 'snapshot') or self.build(conn)
+
+        dept_id, academic_year, advisor_id = student
+        if not advisor_id:
+            advisor_id = year_staff.get((dept_id, academic_year)) or dept_staff.get(dept_id)
+        return dept_id, advisor_id, dept_hod.get(dept_id)
+
+
+routing_cache = RoutingCache()
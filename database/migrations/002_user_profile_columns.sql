@@ -0,0 +1,7 @@
+-- Migration 002: Profile columns on users
+-- Databases created before these columns were part of the users table.
+-- Duplicate column errors are ignored when the column already exists.
+
+ALTER TABLE users ADD COLUMN profile_image VARCHAR(255) AFTER parent_mobile;
+
+ALTER TABLE users ADD COLUMN academic_year INT AFTER registration_no;
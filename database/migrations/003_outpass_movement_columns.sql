@@ -0,0 +1,11 @@
+-- Migration 003: Exit/Entry movement columns on outpasses
+-- Databases created before gate scanning recorded movement times.
+-- Duplicate column errors are ignored when the column already exists.
+
+ALTER TABLE outpasses ADD COLUMN actual_exit_time TIMESTAMP NULL AFTER is_qr_used;
+
+ALTER TABLE outpasses ADD COLUMN actual_entry_time TIMESTAMP NULL AFTER actual_exit_time;
+
+ALTER TABLE outpasses ADD COLUMN exit_security_id INT AFTER actual_entry_time;
+
+ALTER TABLE outpasses ADD COLUMN entry_security_id INT AFTER exit_security_id;
@@ -0,0 +1,27 @@
+-- Migration 004: Daily gate counters
+-- Exits/entries per day, maintained in the same transaction as each scan
+-- so the security dashboard does not scan outpasses for today's totals.
+
+CREATE TABLE IF NOT EXISTS gate_daily_counters (
+    day DATE PRIMARY KEY,
+    exits INT NOT NULL DEFAULT 0,
+    entries INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Backfill from existing movement history
+INSERT INTO gate_daily_counters (day, exits, entries)
+SELECT day, SUM(exits), SUM(entries)
+FROM (
+    SELECT DATE(actual_exit_time) as day, COUNT(*) as exits, 0 as entries
+    FROM outpasses
+    WHERE actual_exit_time IS NOT NULL
+    GROUP BY DATE(actual_exit_time)
+    UNION ALL
+    SELECT DATE(actual_entry_time) as day, 0 as exits, COUNT(*) as entries
+    FROM outpasses
+    WHERE actual_entry_time IS NOT NULL
+    GROUP BY DATE(actual_entry_time)
+) movements
+GROUP BY day
+ON DUPLICATE KEY UPDATE exits = VALUES(exits), entries = VALUES(entries);
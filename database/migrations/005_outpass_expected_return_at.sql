@@ -0,0 +1,12 @@
+-- Migration 005: Persisted expected return datetime
+-- out_date + expected_return_time as one indexable DATETIME. NULL for passes
+-- without a same-day return (expected_return_time 23:59, "Not Returning Today"),
+-- which are never counted as late. A STORED generated column is filled in for
+-- existing rows when added and kept current by MySQL on every insert and update.
+
+ALTER TABLE outpasses ADD COLUMN expected_return_at DATETIME AS (
+    IF(TIME_FORMAT(expected_return_time, '%H:%i') = '23:59', NULL, TIMESTAMP(out_date, expected_return_time))
+) STORED;
+
+-- Students currently out (entry NULL, exit set) and overdue among them are range scans on this index
+CREATE INDEX idx_outpasses_currently_out ON outpasses(actual_entry_time, actual_exit_time, expected_return_at);
@@ -0,0 +1,24 @@
+-- Migration 006: Notification outbox
+-- Parent SMS is queued here in the same transaction as the approval and sent by
+-- background workers. (recipient, dedup_key) is unique so a number receives each
+-- notification at most once.
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    notification_id INT PRIMARY KEY AUTO_INCREMENT,
+    channel VARCHAR(20) NOT NULL DEFAULT 'sms',
+    recipient VARCHAR(20) NOT NULL,
+    message TEXT NOT NULL,
+    dedup_key VARCHAR(100) NOT NULL,
+    outpass_id INT NULL,
+    status ENUM('pending', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claimed_by VARCHAR(64) NULL,
+    claimed_at TIMESTAMP NULL,
+    provider_ref VARCHAR(100) NULL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP NULL,
+    UNIQUE KEY uq_outbox_recipient_dedup (recipient, dedup_key),
+    INDEX idx_outbox_due (status, next_attempt_at)
+);
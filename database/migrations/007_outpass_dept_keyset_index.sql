@@ -0,0 +1,13 @@
+-- Migration 007: Department on outpasses for keyset pagination
+-- The department audit list pages through a department's outpasses newest first.
+-- Storing the student's department on the outpass (set when it is applied for)
+-- lets that walk use one composite index instead of joining users and sorting.
+
+ALTER TABLE outpasses ADD COLUMN dept_id INT NULL AFTER student_id;
+
+UPDATE outpasses o
+JOIN users s ON o.student_id = s.user_id
+SET o.dept_id = s.dept_id
+WHERE o.dept_id IS NULL;
+
+CREATE INDEX idx_outpasses_dept_created ON outpasses(dept_id, created_at, outpass_id);
@@ -0,0 +1,5 @@
+-- Migration 008: Prefix search on users
+-- The admin user list searches by the start of a name, username or register number.
+-- username and registration_no are already UNIQUE (and so indexed), full_name is not.
+
+CREATE INDEX idx_users_full_name ON users(full_name);
@@ -0,0 +1,5 @@
+-- Migration 009: Index outpasses by creation time
+-- The admin export streams a date range newest first. With this index MySQL walks
+-- the range in order and starts sending rows at once instead of sorting it first.
+
+CREATE INDEX idx_outpasses_created ON outpasses(created_at);
@@ -0,0 +1,66 @@
+-- Migration 010: Daily outpass rollup
+-- Per (day, department, academic year) counts read by the HOD statistics and the
+-- admin system report. Status counts are by creation day, movements by the day
+-- they happened. dept_id 0 holds outpasses without a department.
+-- The application keeps it current from outpasses.updated_at (see
+-- backend/utils/daily_stats.py) and scripts/rebuild_daily_stats.py recomputes it.
+
+CREATE TABLE IF NOT EXISTS outpass_daily_stats (
+    day DATE NOT NULL,
+    dept_id INT NOT NULL,
+    academic_year INT NOT NULL,
+    created INT NOT NULL DEFAULT 0,
+    pending INT NOT NULL DEFAULT 0,
+    approved INT NOT NULL DEFAULT 0,
+    rejected INT NOT NULL DEFAULT 0,
+    used INT NOT NULL DEFAULT 0,
+    exits INT NOT NULL DEFAULT 0,
+    entries INT NOT NULL DEFAULT 0,
+    late_returns INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, dept_id, academic_year),
+    INDEX idx_daily_stats_dept_day (dept_id, day)
+);
+
+-- Single row: outpass changes up to refreshed_to are in the rollup
+CREATE TABLE IF NOT EXISTS outpass_daily_stats_state (
+    id TINYINT PRIMARY KEY,
+    refreshed_to DATETIME NOT NULL
+);
+
+INSERT IGNORE INTO outpass_daily_stats_state (id, refreshed_to) VALUES (1, NOW());
+
+-- The refresh finds changed outpasses by updated_at and recomputes a day's exits by exit time
+CREATE INDEX idx_outpasses_updated ON outpasses(updated_at);
+
+CREATE INDEX idx_outpasses_exit ON outpasses(actual_exit_time);
+
+-- Backfill from existing outpasses
+INSERT INTO outpass_daily_stats (day, dept_id, academic_year, created, pending, approved, rejected, used, exits, entries, late_returns)
+SELECT day, dept_id, academic_year, SUM(created), SUM(pending), SUM(approved), SUM(rejected),
+       SUM(used), SUM(exits), SUM(entries), SUM(late_returns)
+FROM (
+    SELECT DATE(o.created_at) AS day, COALESCE(o.dept_id, 0) AS dept_id,
+           COALESCE(s.academic_year, 0) AS academic_year, 1 AS created,
+           o.final_status = 'pending' AS pending, o.final_status = 'approved' AS approved,
+           o.final_status = 'rejected' AS rejected, o.final_status = 'used' AS used,
+           0 AS exits, 0 AS entries, 0 AS late_returns
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    UNION ALL
+    SELECT DATE(o.actual_exit_time), COALESCE(o.dept_id, 0), COALESCE(s.academic_year, 0),
+           0, 0, 0, 0, 0, 1, 0, 0
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    WHERE o.actual_exit_time IS NOT NULL
+    UNION ALL
+    SELECT DATE(o.actual_entry_time), COALESCE(o.dept_id, 0), COALESCE(s.academic_year, 0),
+           0, 0, 0, 0, 0, 0, 1,
+           o.expected_return_at IS NOT NULL AND o.actual_entry_time > o.expected_return_at
+    FROM outpasses o
+    JOIN users s ON o.student_id = s.user_id
+    WHERE o.actual_entry_time IS NOT NULL
+) facts
+GROUP BY day, dept_id, academic_year
+ON DUPLICATE KEY UPDATE created = VALUES(created), pending = VALUES(pending), approved = VALUES(approved),
+    rejected = VALUES(rejected), used = VALUES(used), exits = VALUES(exits), entries = VALUES(entries),
+    late_returns = VALUES(late_returns);
@@ -0,0 +1,12 @@
+-- Migration 011: Reason categories
+-- apply_outpass files each free-text reason under a small category id
+-- (backend/utils/reasons.py) so top-reason reports count integers instead of
+-- grouping the TEXT reason. NULL means not categorised yet. Existing rows are
+-- filled in by scripts/backfill_reason_categories.py.
+
+ALTER TABLE outpasses ADD COLUMN reason_category_id TINYINT UNSIGNED NULL AFTER reason;
+
+-- Department top reasons are answered from an index. Date-range top reasons read
+-- the range through idx_outpasses_created (migration 009), which is kept as it is
+-- rather than rebuilt with the category on the largest table.
+CREATE INDEX idx_outpasses_dept_reason ON outpasses(dept_id, reason_category_id);
@@ -53,10 +53,10 @@ INSERT INTO users (username, email, password_hash, full_name, role, dept_id, reg
 ('student5', 'ece2021002@vetias.ac.in', 'ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f', 'Karthik Reddy', 'student', 2, 'ECE2021002', '9876543222', 6);
 
 -- Sample Outpasses (with different statuses for testing)
-INSERT INTO outpasses (student_id, out_date, out_time, expected_return_time, reason, destination, advisor_id, hod_id) VALUES
-(9, '2026-02-03', '14:00:00', '18:00:00', 'Medical appointment', 'City Hospital', 4, 2),
-(10, '2026-02-03', '10:00:00', '16:00:00', 'Family function', 'Home', 4, 2),
-(11, '2026-02-04', '09:00:00', '17:00:00', 'Bank work', 'SBI Bank', 5, 2);
+INSERT INTO outpasses (student_id, dept_id, out_date, out_time, expected_return_time, reason, destination, advisor_id, hod_id) VALUES
+(9, 1, '2026-02-03', '14:00:00', '18:00:00', 'Medical appointment', 'City Hospital', 4, 2),
+(10, 1, '2026-02-03', '10:00:00', '16:00:00', 'Family function', 'Home', 4, 2),
+(11, 1, '2026-02-04', '09:00:00', '17:00:00', 'Bank work', 'SBI Bank', 5, 2);
 
 -- Update some outpasses to approved status with QR codes
 UPDATE outpasses SET 
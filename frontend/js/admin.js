@@ -62,132 +62,202 @@ async function loadAdminDashboard() {
     }
 }
 
+const adminUsers = {
+    nextCursor: null,
+    loaded: 0,
+    role: '',
+    deptId: '',
+    active: '',
+    q: '',
+    searchTimer: null,
+    requestSeq: 0
+};
+
+const USER_ROLE_COLORS = {
+    'admin': 'rgba(239, 68, 68, 0.1); color: var(--danger);',
+    'hod': 'rgba(79, 70, 229, 0.1); color: var(--primary);',
+    'staff': 'rgba(245, 158, 11, 0.1); color: var(--warning);',
+    'student': 'rgba(16, 185, 129, 0.1); color: var(--success);',
+    'security': 'rgba(100, 116, 139, 0.1); color: var(--text-muted);'
+};
+
 async function loadManageUsers() {
-    try {
-        const response = await fetch(`${app.API_BASE}/admin/users`);
-        const data = await response.json();
+    const deptOptions = await loadDepartmentsForForm();
 
-        if (data.success) {
-            let html = `
-                <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
-                    <div>
-                        <h2 class="login-title" style="font-size: 1.75rem;">User Management</h2>
-                        <p style="color: var(--text-muted); font-size: 1rem;">Control institution-wide access.</p>
-                    </div>
-                    <button onclick="showAddUserForm()" class="btn-modern btn-modern-primary" style="width: auto;">
-                        <i class="ph ph-user-plus"></i> Add New User
-                    </button>
-                </div>
-                
-                <div class="glass-panel" style="background: white; border: none; display: flex; align-items: center; gap: 1.25rem; flex-wrap: wrap; margin-bottom: 1.5rem;">
-                    <div style="flex: 1; min-width: 250px; position: relative;">
-                        <i class="ph ph-magnifying-glass" style="position: absolute; left: 0.75rem; top: 0.75rem; color: var(--text-muted);"></i>
-                        <input type="text" placeholder="Search users by name or email..." style="width: 100%; padding: 0.625rem 0.625rem 0.625rem 2.5rem; border-radius: 0.5rem; border: 1px solid #e2e8f0;" onkeyup="searchUsers(this.value)">
-                    </div>
-                    <div>
-                        <select id="roleFilter" onchange="filterUsersByRole(this.value)" style="padding: 0.625rem; border-radius: 0.5rem; border: 1px solid #e2e8f0; min-width: 150px; width: 100%;">
-                            <option value="">All Roles</option>
-                            <option value="student">Students</option>
-                            <option value="staff">Staff</option>
-                            <option value="hod">HODs</option>
-                            <option value="security">Security</option>
-                            <option value="admin">Admins</option>
-                        </select>
-                    </div>
-                </div>
-                
-                <div class="table-wrapper">
-                    <div class="table-responsive">
-                    <table class="modern-table" id="usersTable">
-                        <thead>
-                            <tr>
-                                <th>Identity</th>
-                                <th>Name</th>
-                                <th>Role</th>
-                                <th>Dept/Year</th>
-                                <th>Username/Email</th>
-                                <th>Status</th>
-                                <th>Actions</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
+    document.getElementById('moduleContent').innerHTML = `
+        <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
+            <div>
+                <h2 class="login-title" style="font-size: 1.75rem;">User Management</h2>
+                <p style="color: var(--text-muted); font-size: 1rem;">Control institution-wide access.</p>
+            </div>
+            <button onclick="showAddUserForm()" class="btn-modern btn-modern-primary" style="width: auto;">
+                <i class="ph ph-user-plus"></i> Add New User
+            </button>
+        </div>
+        
+        <div class="glass-panel" style="background: white; border: none; display: flex; align-items: center; gap: 1.25rem; flex-wrap: wrap; margin-bottom: 1.5rem;">
+            <div style="flex: 1; min-width: 250px; position: relative;">
+                <i class="ph ph-magnifying-glass" style="position: absolute; left: 0.75rem; top: 0.75rem; color: var(--text-muted);"></i>
+                <input type="text" id="userSearch" placeholder="Search by name, username or register no..." style="width: 100%; padding: 0.625rem 0.625rem 0.625rem 2.5rem; border-radius: 0.5rem; border: 1px solid #e2e8f0;" oninput="searchUsers(this.value)">
+            </div>
+            <div>
+                <select id="roleFilter" onchange="filterUsersByRole(this.value)" style="padding: 0.625rem; border-radius: 0.5rem; border: 1px solid #e2e8f0; min-width: 150px; width: 100%;">
+                    <option value="">All Roles</option>
+                    <option value="student">Students</option>
+                    <option value="staff">Staff</option>
+                    <option value="hod">HODs</option>
+                    <option value="security">Security</option>
+                    <option value="admin">Admins</option>
+                </select>
+            </div>
+            <div>
+                <select id="deptFilter" onchange="adminUsers.deptId = this.value; loadMoreUsers(true);" style="padding: 0.625rem; border-radius: 0.5rem; border: 1px solid #e2e8f0; min-width: 150px; width: 100%;">
+                    <option value="">All Departments</option>
+                    ${deptOptions || ''}
+                </select>
+            </div>
+            <div>
+                <select id="activeFilter" onchange="adminUsers.active = this.value; loadMoreUsers(true);" style="padding: 0.625rem; border-radius: 0.5rem; border: 1px solid #e2e8f0; min-width: 130px; width: 100%;">
+                    <option value="">Any Status</option>
+                    <option value="true">Active</option>
+                    <option value="false">Locked</option>
+                </select>
+            </div>
+        </div>
+        
+        <div class="table-wrapper">
+            <div class="table-responsive">
+            <table class="modern-table" id="usersTable">
+                <thead>
+                    <tr>
+                        <th>Identity</th>
+                        <th>Role</th>
+                        <th>Dept/Year</th>
+                        <th>Username/Email</th>
+                        <th>Status</th>
+                        <th>Actions</th>
+                    </tr>
+                </thead>
+                <tbody id="usersBody"></tbody>
+            </table>
+            </div>
+        </div>
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-top: 1rem;">
+            <span id="usersCount" style="color: var(--text-muted); font-size: 13px;"></span>
+            <button id="usersMore" onclick="loadMoreUsers()" class="btn-modern" style="width: auto; display: none;">
+                <i class="ph ph-arrow-down"></i> Load More
+            </button>
+        </div>
+    `;
 
-            data.users.forEach(user => {
-                const roleColors = {
-                    'admin': 'rgba(239, 68, 68, 0.1); color: var(--danger);',
-                    'hod': 'rgba(79, 70, 229, 0.1); color: var(--primary);',
-                    'staff': 'rgba(245, 158, 11, 0.1); color: var(--warning);',
-                    'student': 'rgba(16, 185, 129, 0.1); color: var(--success);',
-                    'security': 'rgba(100, 116, 139, 0.1); color: var(--text-muted);'
-                };
+    document.getElementById('userSearch').value = adminUsers.q;
+    document.getElementById('roleFilter').value = adminUsers.role;
+    document.getElementById('deptFilter').value = adminUsers.deptId;
+    document.getElementById('activeFilter').value = adminUsers.active;
+    await loadMoreUsers(true);
+}
 
-                const deptYear = user.role === 'student' ?
-                    `${user.dept_code || 'N/A'}${user.academic_year ? ` (Yr ${user.academic_year})` : ''}` :
-                    (user.dept_code || '-');
+async function loadMoreUsers(reset = false) {
+    if (reset) {
+        adminUsers.nextCursor = null;
+        adminUsers.loaded = 0;
+    }
 
-                html += `
-                    <tr data-role="${user.role}">
-                        <td>
-                            <div style="display: flex; align-items: center; gap: 12px;">
-                                <div style="width: 36px; height: 36px; border-radius: 50%; background: #f1f5f9; display: flex; align-items: center; justify-content: center; font-weight: 700; color: var(--primary);">
-                                    ${user.full_name.charAt(0)}
-                                </div>
-                                <div>
-                                    <div style="font-weight: 600;">${user.full_name}</div>
-                                    <div style="font-size: 12px; color: var(--text-muted);">${user.registration_no || ''}</div>
-                                </div>
-                            </div>
-                        </td>
-                        <td>
-                            <span class="status-badge" style="background: ${roleColors[user.role] || ''};">${user.role.toUpperCase()}</span>
-                        </td>
-                        <td>
-                            <div style="font-weight: 500;">${deptYear}</div>
-                        </td>
-                        <td>
-                            <div style="font-size: 13px;">@${user.username}</div>
-                            <div style="font-size: 11px; color: var(--text-muted);">${user.email}</div>
-                        </td>
-                        <td>
-                            <span class="status-badge ${user.is_active ? 'badge-approved' : 'badge-rejected'}">
-                                ${user.is_active ? 'Active' : 'Locked'}
-                            </span>
-                        </td>
-                        <td>
-                            <div style="display: flex; gap: 8px; justify-content: flex-end;">
-                                <button onclick="editUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px;" title="Edit Profile"><i class="ph ph-pencil-simple"></i></button>
-                                <button onclick="resetUserPassword(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #f1f5f9; color: var(--text-main);" title="Reset Password"><i class="ph ph-key"></i></button>
-                                ${user.is_active ?
-                        `<button onclick="deactivateUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #fee2e2; color: var(--danger);" title="Lock Account"><i class="ph ph-lock"></i></button>` :
-                        `<button onclick="activateUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #d1fae5; color: var(--success);" title="Unlock Account"><i class="ph ph-lock-open"></i></button>`
-                    }
-                                <button onclick="hardDeleteUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #fee2e2; color: var(--danger);" title="Permanent Delete"><i class="ph ph-trash"></i></button>
-                            </div>
-                        </td>
-                    </tr>
-                `;
-            });
+    const params = new URLSearchParams({ limit: 50 });
+    if (adminUsers.role) params.set('role', adminUsers.role);
+    if (adminUsers.deptId) params.set('dept_id', adminUsers.deptId);
+    if (adminUsers.active) params.set('active', adminUsers.active);
+    if (adminUsers.q) params.set('q', adminUsers.q);
+    if (adminUsers.nextCursor) params.set('cursor', adminUsers.nextCursor);
 
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
-        } else {
+    // Filters can change while a page is in flight; only the latest request renders
+    const seq = ++adminUsers.requestSeq;
+
+    try {
+        const response = await fetch(`${app.API_BASE}/admin/users?${params}`);
+        const data = await response.json();
+        if (seq !== adminUsers.requestSeq) return;
+
+        if (!data.success) {
             document.getElementById('moduleContent').innerHTML = `<div class="card"><p>${data.message || 'Error loading users'}</p></div>`;
+            return;
         }
+
+        const body = document.getElementById('usersBody');
+        if (!body) return;
+
+        if (reset) body.innerHTML = '';
+        if (reset && data.users.length === 0) {
+            body.innerHTML = `
+                <tr>
+                    <td colspan="6" style="text-align: center; padding: 48px; color: var(--text-muted);">No users match these filters.</td>
+                </tr>
+            `;
+        } else {
+            body.insertAdjacentHTML('beforeend', data.users.map(renderUserRow).join(''));
+        }
+
+        adminUsers.nextCursor = data.next_cursor;
+        adminUsers.loaded += data.users.length;
+
+        document.getElementById('usersCount').textContent = `Showing ${adminUsers.loaded} user${adminUsers.loaded === 1 ? '' : 's'}`;
+        document.getElementById('usersMore').style.display = data.has_more ? 'inline-flex' : 'none';
     } catch (error) {
         console.error('Error:', error);
     }
 }
 
-function filterUsersByRole(role) {
-    const rows = document.querySelectorAll('#usersTable tbody tr');
-    rows.forEach(row => {
-        if (!role || row.getAttribute('data-role') === role) {
-            row.style.display = '';
-        } else {
-            row.style.display = 'none';
+function renderUserRow(user) {
+    const deptYear = user.role === 'student' ?
+        `${user.dept_code || 'N/A'}${user.academic_year ? ` (Yr ${user.academic_year})` : ''}` :
+        (user.dept_code || '-');
+
+    return `
+        <tr data-role="${user.role}">
+            <td>
+                <div style="display: flex; align-items: center; gap: 12px;">
+                    <div style="width: 36px; height: 36px; border-radius: 50%; background: #f1f5f9; display: flex; align-items: center; justify-content: center; font-weight: 700; color: var(--primary);">
+                        ${user.full_name.charAt(0)}
+                    </div>
+                    <div>
+                        <div style="font-weight: 600;">${user.full_name}</div>
+                        <div style="font-size: 12px; color: var(--text-muted);">${user.registration_no || ''}</div>
+                    </div>
+                </div>
+            </td>
+            <td>
+                <span class="status-badge" style="background: ${USER_ROLE_COLORS[user.role] || ''};">${user.role.toUpperCase()}</span>
+            </td>
+            <td>
+                <div style="font-weight: 500;">${deptYear}</div>
+            </td>
+            <td>
+                <div style="font-size: 13px;">@${user.username}</div>
+                <div style="font-size: 11px; color: var(--text-muted);">${user.email}</div>
+            </td>
+            <td>
+                <span class="status-badge ${user.is_active ? 'badge-approved' : 'badge-rejected'}">
+                    ${user.is_active ? 'Active' : 'Locked'}
+                </span>
+            </td>
+            <td>
+                <div style="display: flex; gap: 8px; justify-content: flex-end;">
+                    <button onclick="editUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px;" title="Edit Profile"><i class="ph ph-pencil-simple"></i></button>
+                    <button onclick="resetUserPassword(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #f1f5f9; color: var(--text-main);" title="Reset Password"><i class="ph ph-key"></i></button>
+                    ${user.is_active ?
+            `<button onclick="deactivateUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #fee2e2; color: var(--danger);" title="Lock Account"><i class="ph ph-lock"></i></button>` :
+            `<button onclick="activateUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #d1fae5; color: var(--success);" title="Unlock Account"><i class="ph ph-lock-open"></i></button>`
         }
-    });
+                    <button onclick="hardDeleteUser(${user.user_id})" class="btn-modern" style="padding: 6px; aspect-ratio: 1; border-radius: 6px; background: #fee2e2; color: var(--danger);" title="Permanent Delete"><i class="ph ph-trash"></i></button>
+                </div>
+            </td>
+        </tr>
+    `;
+}
+
+function filterUsersByRole(role) {
+    adminUsers.role = role;
+    loadMoreUsers(true);
 }
 
 function showAddUserForm() {
@@ -375,23 +445,24 @@ async function hardDeleteUser(userId) {
 
 async function editUser(userId) {
     try {
-        const [usersRes, deptsRes] = await Promise.all([
-            fetch(`${app.API_BASE}/admin/users`),
-            fetch(`${app.API_BASE}/admin/departments`)
+        const [userRes, deptsRes, advisorsRes] = await Promise.all([
+            fetch(`${app.API_BASE}/admin/users/${userId}`),
+            fetch(`${app.API_BASE}/admin/departments`),
+            fetch(`${app.API_BASE}/admin/advisors`)
         ]);
 
-        const usersData = await usersRes.json();
+        const userData = await userRes.json();
         const deptsData = await deptsRes.json();
+        const advisorsData = await advisorsRes.json();
 
-        const user = usersData.users.find(u => u.user_id == userId);
-        if (!user) return alert('User not found');
+        if (!userData.success) return alert(userData.message || 'User not found');
+        const user = userData.user;
 
         const deptOptions = deptsData.departments.map(d =>
             `<option value="${d.dept_id}" ${d.dept_id == user.dept_id ? 'selected' : ''}>${d.dept_name}</option>`
         ).join('');
 
-        const staffUsers = usersData.users.filter(u => u.role === 'staff' || u.role === 'hod');
-        const advisorOptions = staffUsers.map(s =>
+        const advisorOptions = advisorsData.advisors.map(s =>
             `<option value="${s.user_id}" ${s.user_id == user.advisor_id ? 'selected' : ''}>${s.full_name} (${s.role.toUpperCase()})</option>`
         ).join('');
 
@@ -722,55 +793,12 @@ async function loadSystemReports() {
     }
 }
 
-async function exportReport() {
-    try {
-        const response = await fetch(`${app.API_BASE}/admin/export-report`);
-        const data = await response.json();
-
-        if (data.success) {
-            if (!data.data || data.data.length === 0) {
-                alert('No data found for the selected period');
-                return;
-            }
-            // Convert to CSV
-            const csv = convertToCSV(data.data);
-            downloadCSV(csv, 'outpass_report.csv');
-        } else {
-            alert('Error: ' + (data.message || 'Failed to export report'));
-        }
-    } catch (error) {
-        console.error('Export error:', error);
-        alert('Error exporting report');
-    }
-}
-
-function convertToCSV(arr) {
-    if (!arr || arr.length === 0) return '';
-
-    // Get headers from first object
-    const headers = Object.keys(arr[0]).join(',');
-
-    // Map rows - handle potential commas in values by quoting them
-    const rows = arr.map(obj => {
-        return Object.values(obj).map(val => {
-            const strValue = val === null ? '' : String(val);
-            // Escape quotes and wrap in quotes if contains comma, newline or quote
-            if (strValue.includes(',') || strValue.includes('\n') || strValue.includes('"')) {
-                return `"${strValue.replace(/"/g, '""')}"`;
-            }
-            return strValue;
-        }).join(',');
-    });
-
-    return [headers, ...rows].join('\n');
-}
-
-function downloadCSV(csv, filename) {
-    const blob = new Blob([csv], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
+function exportReport() {
+    // The server streams the file, so let the browser download it directly
+    // instead of holding the whole report in memory here
     const a = document.createElement('a');
-    a.href = url;
-    a.download = filename;
+    a.href = `${app.API_BASE}/admin/export-report?format=csv`;
+    a.download = '';
     a.click();
 }
 
@@ -803,10 +831,10 @@ async function deleteDepartment(deptId) {
 }
 
 function searchUsers(query) {
-    const rows = document.querySelectorAll('#usersTable tbody tr');
-    const q = query.toLowerCase();
-    rows.forEach(row => {
-        const text = row.textContent.toLowerCase();
-        row.style.display = text.includes(q) ? '' : 'none';
-    });
+    // Wait for a pause in typing before asking the server
+    clearTimeout(adminUsers.searchTimer);
+    adminUsers.searchTimer = setTimeout(() => {
+        adminUsers.q = query.trim();
+        loadMoreUsers(true);
+    }, 300);
 }
\ No newline at end of file
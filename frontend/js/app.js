@@ -9,7 +9,9 @@ var app = window.app = {
     formatTime: formatTime,
     formatYear: formatYear,
     getStatusBadge: getStatusBadge,
-    showQRModal: showQRModal
+    showQRModal: showQRModal,
+    setLiveView: setLiveView,
+    downloadReport: downloadReport
 };
 
 // Current user data
@@ -410,6 +412,7 @@ async function handleLogout(e) {
     try {
         await fetch(`${app.API_BASE}/auth/logout`, { method: 'POST' });
         currentUser = null;
+        stopLiveEvents();
         localStorage.removeItem('currentModule');
         showLoginPage();
     } catch (error) {
@@ -530,7 +533,7 @@ async function handleRegister(e) {
 // Load departments for registration
 async function loadDepartments() {
     try {
-        const response = await fetch(`${app.API_BASE}/admin/departments`);
+        const response = await fetch(`${app.API_BASE}/auth/departments`);
         const data = await response.json();
 
         if (data.success) {
@@ -607,6 +610,7 @@ function showDashboard() {
             }
         }
 
+        startLiveEvents();
         loadModule(moduleToLoad);
     } catch (error) {
         console.error('Critical Dashboard Error:', error);
@@ -636,6 +640,9 @@ function loadModule(module) {
         }
     });
 
+    // The previous view stops receiving live events
+    setLiveView(null);
+
     // Show loading
     content.innerHTML = '<div class="loading">Establishing secure connection...</div>';
 
@@ -713,6 +720,85 @@ function loadModule(module) {
     }
 }
 
+// ================= LIVE EVENTS =================
+// One EventSource per session. The open view fetches its snapshot once, then
+// registers a handler with app.setLiveView to apply deltas as events arrive.
+// A 'resync' event means events were missed and the view should refetch.
+
+const LIVE_EVENT_TYPES = ['created', 'advisor_approved', 'hod_approved', 'rejected', 'exit_scanned', 'entry_scanned', 'resync'];
+
+const liveEvents = {
+    source: null,
+    view: null
+};
+
+function startLiveEvents() {
+    if (liveEvents.source || !window.EventSource) return;
+
+    const source = new EventSource(`${app.API_BASE}/events/stream`);
+    LIVE_EVENT_TYPES.forEach(type => {
+        source.addEventListener(type, (e) => {
+            if (!liveEvents.view) return;
+            try {
+                liveEvents.view(type, JSON.parse(e.data));
+            } catch (error) {
+                console.error('Live event error:', error);
+            }
+        });
+    });
+    liveEvents.source = source;
+}
+
+function stopLiveEvents() {
+    if (liveEvents.source) {
+        liveEvents.source.close();
+        liveEvents.source = null;
+    }
+    liveEvents.view = null;
+}
+
+function setLiveView(handler) {
+    liveEvents.view = handler;
+}
+
+// Monthly history reports are rendered in the background; a 202 means poll the job until it is done
+async function downloadReport(role) {
+    const saveFile = (href) => {
+        const a = document.createElement('a');
+        a.href = href;
+        a.download = '';
+        a.click();
+    };
+
+    try {
+        const response = await fetch(`${app.API_BASE}/${role}/download-history`);
+        if (response.status === 200) {
+            saveFile(`${app.API_BASE}/${role}/download-history`);
+            return;
+        }
+
+        let job = await response.json();
+        if (response.status !== 202) {
+            alert(job.message || 'Failed to generate report');
+            return;
+        }
+
+        while (job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1500));
+            job = await (await fetch(job.status_url)).json();
+        }
+
+        if (job.status === 'done') {
+            saveFile(job.download_url);
+        } else {
+            alert(job.error || job.message || 'Failed to generate report');
+        }
+    } catch (error) {
+        console.error('Report error:', error);
+        alert('Error generating report');
+    }
+}
+
 // Utility functions
 function showPage(pageId) {
     document.getElementById(pageId).classList.add('active');
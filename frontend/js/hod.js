@@ -48,7 +48,7 @@ async function loadHODDashboard() {
                             <button onclick="loadModule('dept-statistics')" class="btn-modern" style="background: #f1f5f9; color: var(--text-main); width: auto;">
                                 <i class="ph ph-presentation"></i> Detailed Reports
                             </button>
-                            <button onclick="window.open('${app.API_BASE}/hod/download-history', '_blank')" class="btn-modern" style="background: #eff6ff; color: #1d4ed8; width: auto; border: 1px solid #dbeafe;">
+                            <button onclick="app.downloadReport('hod')" class="btn-modern" style="background: #eff6ff; color: #1d4ed8; width: auto; border: 1px solid #dbeafe;">
                                 <i class="ph ph-file-pdf"></i> Download Monthly Dept Report
                             </button>
                         </div>
@@ -68,91 +68,20 @@ async function loadHODDashboard() {
     }
 }
 
+// Snapshot for the live approval queue; events from /events/stream are applied to it
+const hodLive = {
+    requests: []
+};
+
 async function loadHODApprovals() {
     try {
         const response = await fetch(`${app.API_BASE}/hod/pending-approvals`);
         const data = await response.json();
 
         if (data.success) {
-            let html = `
-                <div class="mb-8" style="display: flex; justify-content: space-between; align-items: flex-end; animation: fadeIn 0.4s ease-out; flex-wrap: wrap; gap: 1rem;">
-                    <div>
-                        <h2 class="login-title" style="font-size: 2rem;">Final Decision Queue</h2>
-                        <p style="color: var(--text-muted); font-size: 1rem;">Review and finalize outpass requests for your department.</p>
-                    </div>
-                    <button onclick="loadModule('hod-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-caret-left"></i> Back to Deck</button>
-                </div>
-                
-                <div class="table-wrapper" style="box-shadow: var(--shadow-lg);">
-                    <div class="table-responsive">
-                    <table class="modern-table">
-                        <thead>
-                            <tr>
-                                <th>Student Profiles</th>
-                                <th>Department</th>
-                                <th>Departure Date</th>
-                                <th>Reasoning</th>
-                                <th>Verified Advisor</th>
-                                <th style="text-align: right;">Authorization</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
-
-            if (data.requests.length === 0) {
-                html += `
-                    <tr>
-                        <td colspan="5" style="text-align: center; padding: 80px; color: var(--text-muted);">
-                            <i class="ph ph-checks" style="font-size: 64px; opacity: 0.1; display: block; margin: 0 auto 16px;"></i>
-                            All caught up! No pending final approvals.
-                        </td>
-                    </tr>
-                `;
-            } else {
-                data.requests.forEach(req => {
-                    html += `
-                        <tr style="transition: background 0.2s linear;">
-                            <td>
-                                <div style="display: flex; align-items: center; gap: 12px;">
-                                    <div style="width: 40px; height: 40px; border-radius: 12px; background: rgba(5, 150, 105, 0.05); color: var(--primary); display: flex; align-items: center; justify-content: center; font-weight: 700;">
-                                        ${req.student_name.charAt(0)}
-                                    </div>
-                                    <div>
-                                        <div style="font-weight: 700; color: var(--text-main);">${req.student_name}</div>
-                                        <div style="font-size: 11px; color: var(--text-muted); font-family: monospace;">${req.registration_no}</div>
-                                    </div>
-                                </div>
-                            </td>
-                            <td>
-                                <div style="font-weight: 600; color: var(--secondary); font-size: 14px;">
-                                    ${app.formatYear(req.academic_year)} - ${req.dept_name}
-                                </div>
-                            </td>
-                            <td>
-                                <div style="font-weight: 600; color: var(--text-main);">${app.formatDate(req.out_date)}</div>
-                                <div style="font-size: 12px; color: var(--text-muted);">${app.formatTime(req.out_time)}</div>
-                            </td>
-                            <td title="${req.reason}">
-                                <div style="max-width: 220px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; color: var(--text-muted); font-size: 14px;">
-                                    ${req.reason}
-                                </div>
-                            </td>
-                            <td>
-                                <div style="font-size: 14px; display: flex; align-items: center; gap: 6px; color: var(--secondary); font-weight: 600;">
-                                    <i class="ph ph-fingerprint" style="color: var(--primary);"></i>
-                                    ${req.advisor_name}
-                                </div>
-                            </td>
-                            <td style="text-align: right;">
-                                <button onclick="reviewHODRequest(${req.outpass_id})" class="btn-modern btn-modern-primary" style="padding: 8px 18px; font-size: 13px;">Review & Approve</button>
-                            </td>
-                        </tr>
-                    `;
-                });
-            }
-
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
+            hodLive.requests = data.requests;
+            renderHODApprovals();
+            app.setLiveView(applyHODApprovalEvent);
         } else {
             document.getElementById('moduleContent').innerHTML = `<div class="glass-panel"><p style="color: var(--error);">${data.message || 'Error loading pending approvals'}</p></div>`;
         }
@@ -161,6 +90,153 @@ async function loadHODApprovals() {
     }
 }
 
+function renderHODApprovals() {
+    const requests = hodLive.requests;
+    let html = `
+        <div class="mb-8" style="display: flex; justify-content: space-between; align-items: flex-end; animation: fadeIn 0.4s ease-out; flex-wrap: wrap; gap: 1rem;">
+            <div>
+                <h2 class="login-title" style="font-size: 2rem;">Final Decision Queue</h2>
+                <p style="color: var(--text-muted); font-size: 1rem;">Review and finalize outpass requests for your department.</p>
+            </div>
+            <div style="display: flex; gap: 0.75rem; flex-wrap: wrap;">
+                <button onclick="approveHODSelected()" class="btn-modern btn-modern-primary" style="width: auto;"><i class="ph ph-checks"></i> Approve Selected</button>
+                <button onclick="loadModule('hod-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-caret-left"></i> Back to Deck</button>
+            </div>
+        </div>
+        
+        <div class="table-wrapper" style="box-shadow: var(--shadow-lg);">
+            <div class="table-responsive">
+            <table class="modern-table">
+                <thead>
+                    <tr>
+                        <th style="width: 40px;"><input type="checkbox" onchange="toggleHODSelectAll(this.checked)" title="Select all"></th>
+                        <th>Student Profiles</th>
+                        <th>Department</th>
+                        <th>Departure Date</th>
+                        <th>Reasoning</th>
+                        <th>Verified Advisor</th>
+                        <th style="text-align: right;">Authorization</th>
+                    </tr>
+                </thead>
+                <tbody>
+    `;
+
+    if (requests.length === 0) {
+        html += `
+            <tr>
+                <td colspan="7" style="text-align: center; padding: 80px; color: var(--text-muted);">
+                    <i class="ph ph-checks" style="font-size: 64px; opacity: 0.1; display: block; margin: 0 auto 16px;"></i>
+                    All caught up! No pending final approvals.
+                </td>
+            </tr>
+        `;
+    } else {
+        requests.forEach(req => {
+            html += `
+                <tr style="transition: background 0.2s linear;">
+                    <td><input type="checkbox" class="hod-batch-select" value="${req.outpass_id}"></td>
+                    <td>
+                        <div style="display: flex; align-items: center; gap: 12px;">
+                            <div style="width: 40px; height: 40px; border-radius: 12px; background: rgba(5, 150, 105, 0.05); color: var(--primary); display: flex; align-items: center; justify-content: center; font-weight: 700;">
+                                ${req.student_name.charAt(0)}
+                            </div>
+                            <div>
+                                <div style="font-weight: 700; color: var(--text-main);">${req.student_name}</div>
+                                <div style="font-size: 11px; color: var(--text-muted); font-family: monospace;">${req.registration_no}</div>
+                            </div>
+                        </div>
+                    </td>
+                    <td>
+                        <div style="font-weight: 600; color: var(--secondary); font-size: 14px;">
+                            ${app.formatYear(req.academic_year)} - ${req.dept_name}
+                        </div>
+                    </td>
+                    <td>
+                        <div style="font-weight: 600; color: var(--text-main);">${app.formatDate(req.out_date)}</div>
+                        <div style="font-size: 12px; color: var(--text-muted);">${app.formatTime(req.out_time)}</div>
+                    </td>
+                    <td title="${req.reason}">
+                        <div style="max-width: 220px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; color: var(--text-muted); font-size: 14px;">
+                            ${req.reason}
+                        </div>
+                    </td>
+                    <td>
+                        <div style="font-size: 14px; display: flex; align-items: center; gap: 6px; color: var(--secondary); font-weight: 600;">
+                            <i class="ph ph-fingerprint" style="color: var(--primary);"></i>
+                            ${req.advisor_name}
+                        </div>
+                    </td>
+                    <td style="text-align: right;">
+                        <button onclick="reviewHODRequest(${req.outpass_id})" class="btn-modern btn-modern-primary" style="padding: 8px 18px; font-size: 13px;">Review & Approve</button>
+                    </td>
+                </tr>
+            `;
+        });
+    }
+
+    html += `</tbody></table></div></div>`;
+    document.getElementById('moduleContent').innerHTML = html;
+}
+
+function applyHODApprovalEvent(type, event) {
+    if (type === 'resync') {
+        loadHODApprovals();
+        return;
+    }
+    const outpass = event.outpass;
+    const others = hodLive.requests.filter(r => r.outpass_id !== outpass.outpass_id);
+    if (type === 'advisor_approved' && outpass.hod_id === app.currentUser().user_id && outpass.hod_status === 'pending') {
+        hodLive.requests = [...others, outpass];
+    } else if (type === 'hod_approved' || type === 'rejected') {
+        hodLive.requests = others;
+    } else {
+        return;
+    }
+    renderHODApprovals();
+}
+
+function toggleHODSelectAll(checked) {
+    document.querySelectorAll('.hod-batch-select').forEach(box => { box.checked = checked; });
+}
+
+async function approveHODSelected() {
+    const ids = Array.from(document.querySelectorAll('.hod-batch-select:checked')).map(box => parseInt(box.value));
+    if (ids.length === 0) {
+        alert('Select at least one request to approve.');
+        return;
+    }
+
+    if (!confirm(`Approve ${ids.length} outpass(es)? Secure QR codes will be generated for the students.`)) return;
+
+    try {
+        const response = await fetch(`${app.API_BASE}/hod/approve-final-batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ outpass_ids: ids, remarks: 'Approved by HOD' })
+        });
+        const data = await response.json();
+
+        if (!data.success) {
+            alert(data.message);
+            return;
+        }
+
+        const skipped = data.results.filter(r => r.status !== 'approved');
+        let summary = `${data.approved} outpass(es) approved.`;
+        if (skipped.length > 0) {
+            summary += `\n${skipped.length} skipped (already processed or not ready).`;
+        }
+        alert(summary);
+
+        // Everything in the result set has left the pending queue one way or another
+        const handled = new Set(data.results.filter(r => r.status !== 'advisor_pending').map(r => r.outpass_id));
+        hodLive.requests = hodLive.requests.filter(r => !handled.has(r.outpass_id));
+        renderHODApprovals();
+    } catch (error) {
+        alert('Error communicating with authority server.');
+    }
+}
+
 async function reviewHODRequest(outpassId) {
     try {
         const response = await fetch(`${app.API_BASE}/hod/pending-approvals`);
@@ -354,100 +430,150 @@ async function loadDeptStatistics() {
     }
 }
 
+// Department audit registry: pages are fetched with the keyset cursor from /hod/all-outpasses
+const hodRegistry = {
+    nextCursor: null,
+    loaded: 0,
+    estimatedTotal: null,
+    status: ''
+};
+
 async function loadAllOutpasses() {
-    try {
-        const response = await fetch(`${app.API_BASE}/hod/all-outpasses`);
-        const data = await response.json();
+    hodRegistry.nextCursor = null;
+    hodRegistry.loaded = 0;
+    hodRegistry.estimatedTotal = null;
 
-        if (data.success) {
-            let html = `
-                <div style="margin-bottom: 40px; display: flex; justify-content: space-between; align-items: flex-end; animation: fadeIn 0.4s ease-out;">
-                    <div>
-                        <h2 style="font-size: 32px; font-weight: 700; letter-spacing: -0.02em;">Departmental Audit Registry</h2>
-                        <p style="color: var(--text-muted);">Historical tracking of all departmental outpass transactions.</p>
-                    </div>
-                    <div style="display: flex; gap: 1rem;">
-                        <button onclick="window.open('${app.API_BASE}/hod/download-history', '_blank')" class="btn-modern" style="width: auto; background: #eff6ff; color: #1d4ed8;">
-                            <i class="ph ph-file-pdf"></i> Export PDF History
-                        </button>
-                        <div style="background: var(--primary-gradient); padding: 10px 20px; border-radius: 40px; color: white; font-size: 14px; font-weight: 700; box-shadow: var(--shadow-md);">
-                            ${data.outpasses.length} Synchronized Records
-                        </div>
-                    </div>
+    document.getElementById('moduleContent').innerHTML = `
+        <div style="margin-bottom: 40px; display: flex; justify-content: space-between; align-items: flex-end; animation: fadeIn 0.4s ease-out; flex-wrap: wrap; gap: 1rem;">
+            <div>
+                <h2 style="font-size: 32px; font-weight: 700; letter-spacing: -0.02em;">Departmental Audit Registry</h2>
+                <p style="color: var(--text-muted);">Historical tracking of all departmental outpass transactions.</p>
+            </div>
+            <div style="display: flex; gap: 1rem; align-items: center; flex-wrap: wrap;">
+                <select id="registryStatus" class="form-control" style="width: auto;" onchange="hodRegistry.status = this.value; loadAllOutpasses();">
+                    <option value="">All statuses</option>
+                    <option value="pending">Pending</option>
+                    <option value="approved">Approved</option>
+                    <option value="rejected">Rejected</option>
+                    <option value="used">Used</option>
+                    <option value="expired">Expired</option>
+                </select>
+                <button onclick="app.downloadReport('hod')" class="btn-modern" style="width: auto; background: #eff6ff; color: #1d4ed8;">
+                    <i class="ph ph-file-pdf"></i> Export PDF History
+                </button>
+                <div id="registryCount" style="background: var(--primary-gradient); padding: 10px 20px; border-radius: 40px; color: white; font-size: 14px; font-weight: 700; box-shadow: var(--shadow-md);">
+                    Loading...
                 </div>
-                
-                <div class="table-wrapper">
-                    <div class="table-responsive">
-                    <table class="modern-table">
-                        <thead>
-                            <tr>
-                                <th>Student Identity</th>
-                                <th>Department</th>
-                                <th>Schedule Info</th>
-                                <th>Departure Intent</th>
-                                <th>Verification Status</th>
-                                <th>Handled By</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
-
-            if (data.outpasses.length === 0) {
-                html += `
+            </div>
+        </div>
+        
+        <div class="table-wrapper">
+            <div class="table-responsive">
+            <table class="modern-table">
+                <thead>
                     <tr>
-                        <td colspan="5" style="text-align: center; padding: 80px; color: var(--text-muted);">
-                            <i class="ph ph-folder-not-found" style="font-size: 64px; opacity: 0.1; display: block; margin: 0 auto 16px;"></i>
-                            No departmental audit records found.
-                        </td>
+                        <th>Student Identity</th>
+                        <th>Department</th>
+                        <th>Schedule Info</th>
+                        <th>Departure Intent</th>
+                        <th>Verification Status</th>
+                        <th>Handled By</th>
                     </tr>
-                `;
-            } else {
-                data.outpasses.forEach(op => {
-                    html += `
-                        <tr style="cursor: pointer; transition: background 0.2s;" onclick="reviewHODRequest(${op.outpass_id})">
-                            <td>
-                                <div style="display: flex; align-items: center; gap: 14px;">
-                                    <div style="width: 44px; height: 44px; border-radius: 12px; background: #eef2ff; color: var(--primary); display: flex; align-items: center; justify-content: center;">
-                                        <i class="ph ph-student-bold" style="font-size: 20px;"></i>
-                                    </div>
-                                    <div>
-                                        <div style="font-weight: 700; color: var(--text-main); font-size: 15px;">${op.student_name}</div>
-                                        <div style="font-size: 12px; color: var(--text-muted); font-family: 'JetBrains Mono', monospace; font-weight: 600;">#${op.registration_no}</div>
-                                    </div>
-                                </div>
-                            </td>
-                            <td>
-                                <div style="font-weight: 600; color: var(--secondary); font-size: 14px;">
-                                    ${app.formatYear(op.academic_year)} - ${op.dept_name}
-                                </div>
-                            </td>
-                            <td>
-                                <div style="font-weight: 800; color: var(--text-main); font-size: 14px;">${app.formatDate(op.out_date)}</div>
-                                <div style="font-size: 12px; color: var(--text-muted); font-weight: 600;">${app.formatTime(op.out_time)}</div>
-                            </td>
-                            <td>
-                                <div style="max-width: 200px; font-size: 14px; color: var(--text-main); font-weight: 500; line-height: 1.4;">
-                                    ${op.reason}
-                                </div>
-                            </td>
-                            <td>${app.getStatusBadge(op.final_status)}</td>
-                            <td>
-                                <div style="font-size: 13px; font-weight: 700; display: flex; align-items: center; gap: 8px; color: var(--secondary);">
-                                    <i class="ph ph-identification-badge" style="font-size: 18px; color: var(--primary);"></i>
-                                    ${op.advisor_name || 'System Managed'}
-                                </div>
-                            </td>
-                        </tr>
-                    `;
-                });
-            }
+                </thead>
+                <tbody id="registryBody"></tbody>
+            </table>
+            </div>
+        </div>
+        <div style="text-align: center; margin-top: 1.5rem;">
+            <button id="registryMore" onclick="loadMoreOutpasses()" class="btn-modern" style="width: auto; display: none; background: #f1f5f9; color: var(--text-main);">
+                <i class="ph ph-caret-down"></i> Load More
+            </button>
+        </div>
+    `;
+    document.getElementById('registryStatus').value = hodRegistry.status;
 
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
-        } else {
+    await loadMoreOutpasses(true);
+}
+
+async function loadMoreOutpasses(first = false) {
+    const params = new URLSearchParams({ limit: 50 });
+    if (hodRegistry.status) params.set('status', hodRegistry.status);
+    if (hodRegistry.nextCursor) params.set('cursor', hodRegistry.nextCursor);
+    if (first) params.set('include_total', '1');
+
+    try {
+        const response = await fetch(`${app.API_BASE}/hod/all-outpasses?${params}`);
+        const data = await response.json();
+
+        if (!data.success) {
             document.getElementById('moduleContent').innerHTML = `<div class="glass-panel"><p style="color: var(--error);">${data.message || 'Error loading records'}</p></div>`;
+            return;
+        }
+
+        const body = document.getElementById('registryBody');
+        if (!body) return;
+
+        if (first && data.outpasses.length === 0) {
+            body.innerHTML = `
+                <tr>
+                    <td colspan="6" style="text-align: center; padding: 80px; color: var(--text-muted);">
+                        <i class="ph ph-folder-not-found" style="font-size: 64px; opacity: 0.1; display: block; margin: 0 auto 16px;"></i>
+                        No departmental audit records found.
+                    </td>
+                </tr>
+            `;
+        } else {
+            body.insertAdjacentHTML('beforeend', data.outpasses.map(renderRegistryRow).join(''));
         }
+
+        hodRegistry.nextCursor = data.next_cursor;
+        hodRegistry.loaded += data.outpasses.length;
+        if (first) hodRegistry.estimatedTotal = data.estimated_total;
+
+        document.getElementById('registryCount').textContent = hodRegistry.estimatedTotal && data.has_more
+            ? `${hodRegistry.loaded} of ~${hodRegistry.estimatedTotal} Records`
+            : `${hodRegistry.loaded} Synchronized Records`;
+        document.getElementById('registryMore').style.display = data.has_more ? 'inline-flex' : 'none';
     } catch (error) {
         console.error('Error:', error);
     }
+}
+
+function renderRegistryRow(op) {
+    return `
+        <tr style="cursor: pointer; transition: background 0.2s;" onclick="reviewHODRequest(${op.outpass_id})">
+            <td>
+                <div style="display: flex; align-items: center; gap: 14px;">
+                    <div style="width: 44px; height: 44px; border-radius: 12px; background: #eef2ff; color: var(--primary); display: flex; align-items: center; justify-content: center;">
+                        <i class="ph ph-student-bold" style="font-size: 20px;"></i>
+                    </div>
+                    <div>
+                        <div style="font-weight: 700; color: var(--text-main); font-size: 15px;">${op.student_name}</div>
+                        <div style="font-size: 12px; color: var(--text-muted); font-family: 'JetBrains Mono', monospace; font-weight: 600;">#${op.registration_no}</div>
+                    </div>
+                </div>
+            </td>
+            <td>
+                <div style="font-weight: 600; color: var(--secondary); font-size: 14px;">
+                    ${app.formatYear(op.academic_year)} - ${op.dept_name}
+                </div>
+            </td>
+            <td>
+                <div style="font-weight: 800; color: var(--text-main); font-size: 14px;">${app.formatDate(op.out_date)}</div>
+                <div style="font-size: 12px; color: var(--text-muted); font-weight: 600;">${app.formatTime(op.out_time)}</div>
+            </td>
+            <td>
+                <div style="max-width: 200px; font-size: 14px; color: var(--text-main); font-weight: 500; line-height: 1.4;">
+                    ${op.reason}
+                </div>
+            </td>
+            <td>${app.getStatusBadge(op.final_status)}</td>
+            <td>
+                <div style="font-size: 13px; font-weight: 700; display: flex; align-items: center; gap: 8px; color: var(--secondary);">
+                    <i class="ph ph-identification-badge" style="font-size: 18px; color: var(--primary);"></i>
+                    ${op.advisor_name || 'System Managed'}
+                </div>
+            </td>
+        </tr>
+    `;
 }
\ No newline at end of file
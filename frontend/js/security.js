@@ -1,6 +1,7 @@
 // Security Module JavaScript
 
 async function loadSecurityDashboard() {
+    startKioskMode();
     try {
         const response = await fetch(`${app.API_BASE}/security/dashboard-stats`);
         const data = await response.json();
@@ -67,6 +68,7 @@ async function loadSecurityDashboard() {
 }
 
 async function loadScanQR() {
+    startKioskMode();
     document.getElementById('moduleContent').innerHTML = `
         <div class="glass-panel" style="background: white; border: none; max-width: 600px; margin: 0 auto; text-align: center;">
             <div class="mb-8">
@@ -221,6 +223,12 @@ async function verifyQRCodeFromScan(qrCode) {
             body: JSON.stringify({ qr_code: qrCode })
         });
 
+        // Server or database down: fall back to the local manifest
+        if (response.status >= 500) {
+            verifyQRCodeOffline(qrCode);
+            return;
+        }
+
         const data = await response.json();
 
         if (data.valid) {
@@ -266,7 +274,8 @@ async function verifyQRCodeFromScan(qrCode) {
             `;
         }
     } catch (error) {
-        resultDiv.innerHTML = `<div class="error-message show">Error verifying QR code.</div>`;
+        // Network unreachable: fall back to the local manifest
+        verifyQRCodeOffline(qrCode);
     }
 }
 
@@ -290,6 +299,11 @@ async function recordExit(qrCode) {
             body: JSON.stringify({ qr_code: qrCode })
         });
 
+        if (response.status >= 500 && findKioskPass(qrCode)) {
+            recordExitOffline(qrCode);
+            return;
+        }
+
         const data = await response.json();
 
         if (data.success) {
@@ -316,80 +330,29 @@ async function recordExit(qrCode) {
             document.getElementById('qrResult').innerHTML = `<div class="error-message show">${data.message}</div>`;
         }
     } catch (error) {
-        alert('Error recording exit');
+        if (findKioskPass(qrCode)) {
+            recordExitOffline(qrCode);
+        } else {
+            alert('Error recording exit');
+        }
     }
 }
 
+// Snapshots for the live lists; events from /events/stream are applied to these
+const securityLive = {
+    studentsOut: [],
+    activities: []
+};
+
 async function loadStudentsOut() {
     try {
         const response = await fetch(`${app.API_BASE}/security/students-out`);
         const data = await response.json();
 
         if (data.success) {
-            let html = `
-                <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
-                    <div>
-                        <h2 class="login-title" style="font-size: 1.75rem;">Students Currently Out</h2>
-                        <p style="color: var(--text-muted); font-size: 0.875rem;">${data.count} students outside campus.</p>
-                    </div>
-                    <button onclick="loadModule('security-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-arrow-left"></i> Back</button>
-                </div>
-                
-                <div class="table-wrapper">
-                    <div class="table-responsive">
-                    <table class="modern-table">
-                        <thead>
-                            <tr>
-                                <th>Student</th>
-                                <th>Department</th>
-                                <th>Exit Time</th>
-                                <th>Exp. Return</th>
-                                <th>Reason</th>
-                                <th style="text-align: right;">Actions</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
-
-            if (data.students_out.length === 0) {
-                html += `<tr><td colspan="6" style="text-align: center; padding: 48px; color: var(--text-muted);">No students are currently outside campus.</td></tr>`;
-            } else {
-                data.students_out.forEach(student => {
-                    html += `
-                        <tr>
-                            <td>
-                                <div style="font-weight: 600;">${student.student_name}</div>
-                                <div style="font-size: 12px; color: var(--text-muted);">${student.registration_no}</div>
-                            </td>
-                            <td>
-                <div style="font-weight: 600; color: var(--secondary); font-size: 13px;">${app.formatYear(student.academic_year)}</div>
-                <div style="font-size: 12px; color: var(--text-muted);">${student.dept_name}</div>
-            </td>
-                            <td>${app.formatDateTime(student.actual_exit_time)}</td>
-                            <td>
-                                <div style="color: ${student.is_late ? 'var(--danger)' : 'var(--warning)'}; font-weight: 600;">
-                                    ${student.expected_return_time === '23:59:00' ? 'Not Returning Today' : app.formatTime(student.expected_return_time)}
-                                    ${student.is_late ? ' <span class="badge-rejected" style="font-size: 10px; padding: 2px 6px;">LATE</span>' : ''}
-                                </div>
-                            </td>
-                            <td style="max-width: 150px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${student.reason || '-'}</td>
-                             <td>
-                                <div style="display: flex; justify-content: flex-end;">
-                                    ${student.expected_return_time === '23:59:00' ? '' : `
-                                    <button onclick="recordEntryManual(${student.outpass_id})" 
-                                            class="btn-modern" style="background: ${student.is_late ? 'var(--danger)' : 'var(--success)'}; color: white; width: auto; padding: 6px 16px; border-radius: 8px;">
-                                        Mark Entry
-                                    </button>
-                                    `}
-                                </div>
-                            </td>
-                        </tr>
-                    `;
-                });
-            }
-
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
+            securityLive.studentsOut = data.students_out;
+            renderStudentsOut();
+            app.setLiveView(applyStudentsOutEvent);
         } else {
             document.getElementById('moduleContent').innerHTML = `
                 <div class="card">
@@ -408,6 +371,91 @@ async function loadStudentsOut() {
     }
 }
 
+function renderStudentsOut() {
+    const students = securityLive.studentsOut;
+    let html = `
+        <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
+            <div>
+                <h2 class="login-title" style="font-size: 1.75rem;">Students Currently Out</h2>
+                <p style="color: var(--text-muted); font-size: 0.875rem;">${students.length} students outside campus.</p>
+            </div>
+            <button onclick="loadModule('security-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-arrow-left"></i> Back</button>
+        </div>
+        
+        <div class="table-wrapper">
+            <div class="table-responsive">
+            <table class="modern-table">
+                <thead>
+                    <tr>
+                        <th>Student</th>
+                        <th>Department</th>
+                        <th>Exit Time</th>
+                        <th>Exp. Return</th>
+                        <th>Reason</th>
+                        <th style="text-align: right;">Actions</th>
+                    </tr>
+                </thead>
+                <tbody>
+    `;
+
+    if (students.length === 0) {
+        html += `<tr><td colspan="6" style="text-align: center; padding: 48px; color: var(--text-muted);">No students are currently outside campus.</td></tr>`;
+    } else {
+        students.forEach(student => {
+            html += `
+                <tr>
+                    <td>
+                        <div style="font-weight: 600;">${student.student_name}</div>
+                        <div style="font-size: 12px; color: var(--text-muted);">${student.registration_no}</div>
+                    </td>
+                    <td>
+        <div style="font-weight: 600; color: var(--secondary); font-size: 13px;">${app.formatYear(student.academic_year)}</div>
+        <div style="font-size: 12px; color: var(--text-muted);">${student.dept_name}</div>
+    </td>
+                    <td>${app.formatDateTime(student.actual_exit_time)}</td>
+                    <td>
+                        <div style="color: ${student.is_late ? 'var(--danger)' : 'var(--warning)'}; font-weight: 600;">
+                            ${student.expected_return_time === '23:59:00' ? 'Not Returning Today' : app.formatTime(student.expected_return_time)}
+                            ${student.is_late ? ' <span class="badge-rejected" style="font-size: 10px; padding: 2px 6px;">LATE</span>' : ''}
+                        </div>
+                    </td>
+                    <td style="max-width: 150px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${student.reason || '-'}</td>
+                     <td>
+                        <div style="display: flex; justify-content: flex-end;">
+                            ${student.expected_return_time === '23:59:00' ? '' : `
+                            <button onclick="recordEntryManual(${student.outpass_id})" 
+                                    class="btn-modern" style="background: ${student.is_late ? 'var(--danger)' : 'var(--success)'}; color: white; width: auto; padding: 6px 16px; border-radius: 8px;">
+                                Mark Entry
+                            </button>
+                            `}
+                        </div>
+                    </td>
+                </tr>
+            `;
+        });
+    }
+
+    html += `</tbody></table></div></div>`;
+    document.getElementById('moduleContent').innerHTML = html;
+}
+
+function applyStudentsOutEvent(type, event) {
+    if (type === 'resync') {
+        loadStudentsOut();
+        return;
+    }
+    const outpass = event.outpass;
+    const others = securityLive.studentsOut.filter(s => s.outpass_id !== outpass.outpass_id);
+    if (type === 'exit_scanned' && !outpass.actual_entry_time) {
+        securityLive.studentsOut = [outpass, ...others];
+    } else if (type === 'entry_scanned') {
+        securityLive.studentsOut = others;
+    } else {
+        return;
+    }
+    renderStudentsOut();
+}
+
 async function recordEntryManual(outpassId) {
     if (!confirm('Record entry for this student?')) return;
 
@@ -418,6 +466,11 @@ async function recordEntryManual(outpassId) {
             body: JSON.stringify({ outpass_id: outpassId })
         });
 
+        if (response.status >= 500) {
+            recordEntryOffline(outpassId);
+            return;
+        }
+
         const data = await response.json();
         
         if (data.success) {
@@ -431,7 +484,7 @@ async function recordEntryManual(outpassId) {
             alert(data.message);
         }
     } catch (error) {
-        alert('Error recording entry');
+        recordEntryOffline(outpassId);
     }
 }
 
@@ -441,65 +494,320 @@ async function loadRecentActivity() {
         const data = await response.json();
 
         if (data.success) {
-            let html = `
-                <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
-                    <h2 class="login-title" style="font-size: 1.75rem;">Recent Activity</h2>
-                    <button onclick="loadModule('security-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-arrow-left"></i> Dashboard</button>
-                </div>
-                
-                <div class="table-wrapper">
-                    <div class="table-responsive">
-                    <table class="modern-table">
-                        <thead>
-                            <tr>
-                                <th>Student Identity</th>
-                                <th>Department</th>
-                                <th>Exit Recorded</th>
-                                <th>Return Recorded</th>
-                                <th>Purpose</th>
-                                <th style="text-align: right;">Status</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
-
-            if (data.activities.length === 0) {
-                html += `<tr><td colspan="6" style="text-align: center; padding: 48px; color: var(--text-muted);">No recorded activity today.</td></tr>`;
-            } else {
-                data.activities.forEach(activity => {
-                    const status = activity.actual_entry_time ? 'Returned' : 'Out';
-                    html += `
-                        <tr>
-                            <td>
-                                <div style="font-weight: 600;">${activity.student_name}</div>
-                                <div style="font-size: 12px; color: var(--text-muted);">${activity.registration_no}</div>
-                            </td>
-                            <td>
-                <div style="font-weight: 600; color: var(--secondary); font-size: 13px;">${app.formatYear(activity.academic_year)}</div>
-                <div style="font-size: 12px; color: var(--text-muted);">${activity.dept_name}</div>
-            </td>
-                            <td>${app.formatDateTime(activity.actual_exit_time)}</td>
-                            <td>${activity.actual_entry_time ? app.formatDateTime(activity.actual_entry_time) : '<span style="color: var(--danger);">Still Out</span>'}</td>
-                            <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${activity.reason}</td>
-                            <td>
-                                <div style="display: flex; justify-content: flex-end;">
-                                    <span class="status-badge ${status === 'Returned' ? 'badge-approved' : 'badge-pending'}">
-                                        ${status}
-                                    </span>
-                                    ${activity.is_late ? ' <span class="badge-rejected" style="font-size: 10px; padding: 2px 6px; margin-left: 4px;">LATE ⏰</span>' : ''}
-                                </div>
-                            </td>
-                        </tr>
-                    `;
-                });
-            }
-
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
+            securityLive.activities = data.activities;
+            renderRecentActivity();
+            app.setLiveView(applyRecentActivityEvent);
         } else {
             document.getElementById('moduleContent').innerHTML = `<div class="card"><p>${data.message || 'Error loading activity'}</p></div>`;
         }
     } catch (error) {
         console.error('Error:', error);
     }
-}
\ No newline at end of file
+}
+
+function renderRecentActivity() {
+    const activities = securityLive.activities;
+    let html = `
+        <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
+            <h2 class="login-title" style="font-size: 1.75rem;">Recent Activity</h2>
+            <button onclick="loadModule('security-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);"><i class="ph ph-arrow-left"></i> Dashboard</button>
+        </div>
+        
+        <div class="table-wrapper">
+            <div class="table-responsive">
+            <table class="modern-table">
+                <thead>
+                    <tr>
+                        <th>Student Identity</th>
+                        <th>Department</th>
+                        <th>Exit Recorded</th>
+                        <th>Return Recorded</th>
+                        <th>Purpose</th>
+                        <th style="text-align: right;">Status</th>
+                    </tr>
+                </thead>
+                <tbody>
+    `;
+
+    if (activities.length === 0) {
+        html += `<tr><td colspan="6" style="text-align: center; padding: 48px; color: var(--text-muted);">No recorded activity today.</td></tr>`;
+    } else {
+        activities.forEach(activity => {
+            const status = activity.actual_entry_time ? 'Returned' : 'Out';
+            html += `
+                <tr>
+                    <td>
+                        <div style="font-weight: 600;">${activity.student_name}</div>
+                        <div style="font-size: 12px; color: var(--text-muted);">${activity.registration_no}</div>
+                    </td>
+                    <td>
+        <div style="font-weight: 600; color: var(--secondary); font-size: 13px;">${app.formatYear(activity.academic_year)}</div>
+        <div style="font-size: 12px; color: var(--text-muted);">${activity.dept_name}</div>
+    </td>
+                    <td>${app.formatDateTime(activity.actual_exit_time)}</td>
+                    <td>${activity.actual_entry_time ? app.formatDateTime(activity.actual_entry_time) : '<span style="color: var(--danger);">Still Out</span>'}</td>
+                    <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${activity.reason}</td>
+                    <td>
+                        <div style="display: flex; justify-content: flex-end;">
+                            <span class="status-badge ${status === 'Returned' ? 'badge-approved' : 'badge-pending'}">
+                                ${status}
+                            </span>
+                            ${activity.is_late ? ' <span class="badge-rejected" style="font-size: 10px; padding: 2px 6px; margin-left: 4px;">LATE ⏰</span>' : ''}
+                        </div>
+                    </td>
+                </tr>
+            `;
+        });
+    }
+
+    html += `</tbody></table></div></div>`;
+    document.getElementById('moduleContent').innerHTML = html;
+}
+
+function applyRecentActivityEvent(type, event) {
+    if (type === 'resync') {
+        loadRecentActivity();
+        return;
+    }
+    if (type !== 'exit_scanned' && type !== 'entry_scanned') return;
+
+    // Newest movement first, same order and size as /security/recent-activity?limit=50
+    const outpass = event.outpass;
+    const others = securityLive.activities.filter(a => a.outpass_id !== outpass.outpass_id);
+    securityLive.activities = [outpass, ...others].slice(0, 50);
+    renderRecentActivity();
+}
+
+// ================= OFFLINE KIOSK MODE =================
+// The gate keeps a local manifest of today's and tomorrow's passes so scanning keeps
+// working when the uplink or database is down. Offline exits/entries are queued in
+// localStorage and uploaded in batches to /security/kiosk-sync once the server is back.
+
+const kiosk = {
+    MANIFEST_KEY: 'kioskManifest',
+    QUEUE_KEY: 'kioskQueue',
+    ID_KEY: 'kioskId',
+    SYNC_INTERVAL_MS: 30000,
+    BATCH_SIZE: 100,
+    started: false,
+    syncing: false
+};
+
+function startKioskMode() {
+    if (kiosk.started) return;
+    kiosk.started = true;
+
+    refreshKioskManifest();
+    syncKioskQueue();
+    setInterval(() => {
+        syncKioskQueue();
+        refreshKioskManifest();
+    }, kiosk.SYNC_INTERVAL_MS);
+    window.addEventListener('online', syncKioskQueue);
+}
+
+function getKioskId() {
+    let id = localStorage.getItem(kiosk.ID_KEY);
+    if (!id) {
+        id = `gate-${Math.random().toString(36).slice(2, 10)}`;
+        localStorage.setItem(kiosk.ID_KEY, id);
+    }
+    return id;
+}
+
+function getKioskManifest() {
+    try {
+        return JSON.parse(localStorage.getItem(kiosk.MANIFEST_KEY)) || { passes: [] };
+    } catch (e) {
+        return { passes: [] };
+    }
+}
+
+function getKioskQueue() {
+    try {
+        return JSON.parse(localStorage.getItem(kiosk.QUEUE_KEY)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function saveKioskQueue(queue) {
+    localStorage.setItem(kiosk.QUEUE_KEY, JSON.stringify(queue));
+}
+
+async function refreshKioskManifest() {
+    try {
+        const response = await fetch(`${app.API_BASE}/security/kiosk-manifest`);
+        if (!response.ok) return;
+        const data = await response.json();
+        if (data.success) {
+            localStorage.setItem(kiosk.MANIFEST_KEY, JSON.stringify({
+                generated_at: data.generated_at,
+                passes: data.passes
+            }));
+        }
+    } catch (error) {
+        // Offline: keep the cached manifest
+    }
+}
+
+// Local wall-clock time in the server's 'YYYY-MM-DD HH:MM:SS' format
+function kioskNow() {
+    const d = new Date();
+    const pad = n => String(n).padStart(2, '0');
+    return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())} ${pad(d.getHours())}:${pad(d.getMinutes())}:${pad(d.getSeconds())}`;
+}
+
+function findKioskPass(token) {
+    return getKioskManifest().passes.find(p => p.token === token) || null;
+}
+
+// Manifest state adjusted for events still waiting in the queue
+function getKioskPassState(pass) {
+    const events = getKioskQueue().filter(e => e.outpass_id === pass.outpass_id);
+    if (events.some(e => e.type === 'entry')) return 'returned';
+    if (events.some(e => e.type === 'exit')) return 'out';
+    return pass.state;
+}
+
+function queueKioskEvent(type, pass) {
+    const queue = getKioskQueue();
+    queue.push({
+        event_id: `${getKioskId()}-${Date.now()}-${queue.length}`,
+        type: type,
+        qr_code: pass.token,
+        outpass_id: pass.outpass_id,
+        scanned_at: kioskNow()
+    });
+    saveKioskQueue(queue);
+}
+
+async function syncKioskQueue() {
+    if (kiosk.syncing) return;
+    kiosk.syncing = true;
+
+    try {
+        let queue = getKioskQueue();
+        while (queue.length > 0) {
+            const batch = queue.slice(0, kiosk.BATCH_SIZE);
+            const response = await fetch(`${app.API_BASE}/security/kiosk-sync`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ kiosk_id: getKioskId(), events: batch })
+            });
+            if (!response.ok) break;
+
+            const data = await response.json();
+            if (!data.success) break;
+
+            data.results.filter(r => r.status === 'rejected').forEach(r => {
+                console.warn(`Offline scan ${r.event_id} rejected by server: ${r.message}`);
+            });
+
+            // Drop the uploaded batch; events queued meanwhile stay
+            const sent = new Set(batch.map(e => e.event_id));
+            queue = getKioskQueue().filter(e => !sent.has(e.event_id));
+            saveKioskQueue(queue);
+        }
+    } catch (error) {
+        // Still offline: retry on the next interval or 'online' event
+    } finally {
+        kiosk.syncing = false;
+    }
+}
+
+function verifyQRCodeOffline(qrCode) {
+    const resultDiv = document.getElementById('qrResult');
+    const pass = findKioskPass(qrCode);
+
+    if (!pass) {
+        resultDiv.innerHTML = `
+            <div class="error-message show">
+                <h3>✗ Not in offline manifest</h3>
+                <p>Server unreachable and this pass is not cached on this gate.</p>
+            </div>
+        `;
+        return;
+    }
+
+    const state = getKioskPassState(pass);
+    const now = kioskNow();
+    let error = null;
+    if (state === 'returned') {
+        error = 'Entry already recorded';
+    } else if (state === 'approved') {
+        if (pass.out_date > now.slice(0, 10)) error = 'Outpass is for a future date';
+        else if (pass.valid_until && pass.valid_until < now) error = 'QR code expired';
+    }
+
+    if (error) {
+        resultDiv.innerHTML = `
+            <div class="error-message show">
+                <h3>✗ Invalid QR Code</h3>
+                <p>${error} (offline check)</p>
+            </div>
+        `;
+        return;
+    }
+
+    const isReturning = state === 'out';
+    resultDiv.innerHTML = `
+        <div class="success-message show" style="padding: 24px; border-radius: 12px; border: none; background: ${isReturning ? '#fff7ed' : '#ecfdf5'}; color: ${isReturning ? '#9a3412' : '#065f46'};">
+            <div style="font-size: 48px; margin-bottom: 16px;">${isReturning ? '🏠' : '✓'}</div>
+            <h3 style="margin-bottom: 8px;">${isReturning ? 'Returning Student' : 'Valid Outpass'}</h3>
+            <p style="margin-bottom: 20px; font-size: 12px;">Offline mode - will sync when the server is reachable</p>
+
+            <div style="text-align: left; background: white; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
+                <p style="margin-bottom: 8px;"><strong>Student:</strong> ${pass.student_name}</p>
+                <p style="margin-bottom: 8px;"><strong>Reg No:</strong> ${pass.registration_no}</p>
+                <p style="margin-bottom: 8px;"><strong>Year:</strong> ${app.formatYear(pass.academic_year)}</p>
+                <p style="margin-bottom: 8px;"><strong>Dept:</strong> ${pass.department}</p>
+                <p style="margin-bottom: 8px;"><strong>Reason:</strong> ${pass.reason || '-'}</p>
+                ${isReturning && pass.expected_return_time ? `<p style="margin-bottom: 0; color: var(--danger);"><strong>Exp. Return:</strong> ${pass.expected_return_time}</p>` : ''}
+            </div>
+
+            ${isReturning ? `
+                <button onclick="recordEntryOffline(${pass.outpass_id})" class="btn-modern" style="width: 100%; background: var(--primary); color: white;">
+                    Confirm Entry
+                </button>
+            ` : `
+                <button onclick="recordExitOffline('${qrCode}')" class="btn-modern btn-modern-primary" style="width: 100%;">
+                    Confirm Exit
+                </button>
+            `}
+        </div>
+    `;
+}
+
+function recordExitOffline(qrCode) {
+    const pass = findKioskPass(qrCode);
+    if (!pass || getKioskPassState(pass) !== 'approved') {
+        alert('Cannot record exit offline for this pass');
+        return;
+    }
+
+    queueKioskEvent('exit', pass);
+    document.getElementById('qrResult').innerHTML = `
+        <div class="success-message show" style="padding: 32px; border-radius: 12px; background: #ecfdf5;">
+            <div style="font-size: 48px; color: var(--success); margin-bottom: 16px;">✓</div>
+            <h3 style="margin-bottom: 8px; color: #065f46;">Exit Queued (Offline)</h3>
+            <p style="color: #065f46; margin-bottom: 24px;">Exit for ${pass.student_name} will sync when the server is reachable</p>
+            <button onclick="loadModule('scan-qr')" class="btn-modern btn-modern-primary">
+                Scan Next Pass
+            </button>
+        </div>
+    `;
+    const qrInput = document.getElementById('qrInput');
+    if (qrInput) qrInput.value = '';
+}
+
+function recordEntryOffline(outpassId) {
+    const pass = getKioskManifest().passes.find(p => p.outpass_id === outpassId);
+    if (!pass || getKioskPassState(pass) !== 'out') {
+        alert('Error recording entry');
+        return;
+    }
+
+    queueKioskEvent('entry', pass);
+    alert(`Entry for ${pass.student_name} queued offline. It will sync when the server is reachable.`);
+}
@@ -50,7 +50,7 @@ async function loadStaffDashboard() {
                         <button onclick="loadModule('my-students')" class="btn-modern" style="background: #f1f5f9; color: var(--text-main); width: auto;">
                             <i class="ph ph-users-four"></i> My Students
                         </button>
-                        <button onclick="window.open('${app.API_BASE}/staff/download-history', '_blank')" class="btn-modern" style="background: #eff6ff; color: #1d4ed8; width: auto; border: 1px solid #dbeafe;">
+                        <button onclick="app.downloadReport('staff')" class="btn-modern" style="background: #eff6ff; color: #1d4ed8; width: auto; border: 1px solid #dbeafe;">
                             <i class="ph ph-file-pdf"></i> Download Monthly History
                         </button>
                     </div>
@@ -65,6 +65,11 @@ async function loadStaffDashboard() {
     }
 }
 
+// Snapshot for the live pending list; events from /events/stream are applied to it
+const staffLive = {
+    requests: []
+};
+
 // Load pending requests
 async function loadPendingRequests() {
     try {
@@ -72,66 +77,9 @@ async function loadPendingRequests() {
         const data = await response.json();
 
         if (data.success) {
-            let html = `
-                <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
-                    <h2 class="login-title" style="font-size: 1.75rem;">Pending Requests</h2>
-                    <button onclick="loadModule('staff-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);">
-                        <i class="ph ph-arrow-left"></i> Back
-                    </button>
-                </div>
-                
-                <div class="table-wrapper">
-                    <div class="table-responsive">
-                    <table class="modern-table">
-                        <thead>
-                            <tr>
-                                <th>Student</th>
-                                <th>Dept</th>
-                                <th>Reg No</th>
-                                <th>Date</th>
-                                <th>Time</th>
-                                <th>Reason</th>
-                                <th>Parent Contact</th>
-                                <th style="text-align: right;">Actions</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            `;
-
-            if (data.requests.length === 0) {
-                html += `<tr><td colspan="7" style="text-align: center; padding: 20px;">No pending requests.</td></tr>`;
-            } else {
-                data.requests.forEach(req => {
-                    const parentInfo = req.parent_name
-                        ? `<span style="font-weight:600;font-size:0.85rem;">${req.parent_name}</span><br>
-                           ${req.parent_mobile
-                            ? `<a href="tel:${req.parent_mobile}" style="color:var(--primary);font-size:0.8rem;font-weight:500;"><i class="ph ph-phone"></i> ${req.parent_mobile}</a>`
-                            : '<span style="color:#94a3b8;font-size:0.8rem;">No mobile</span>'}`
-                        : '<span style="color:#94a3b8;font-size:0.8rem;">N/A</span>';
-
-                    html += `
-                        <tr>
-                            <td style="font-weight: 600;">${req.student_name}</td>
-                            <td style="color: var(--secondary); font-size: 13px; font-weight: 600;">
-                                ${app.formatYear(req.academic_year)} - ${req.dept_name}
-                            </td>
-                            <td>${req.registration_no}</td>
-                            <td>${app.formatDate(req.out_date)}</td>
-                            <td>${app.formatTime(req.out_time)}</td>
-                            <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${req.reason}</td>
-                            <td>${parentInfo}</td>
-                            <td>
-                                <div style="display: flex; justify-content: flex-end;">
-                                    <button onclick="reviewRequest(${req.outpass_id})" class="btn-modern btn-modern-primary" style="padding: 6px 16px; font-size: 13px;">Review</button>
-                                </div>
-                            </td>
-                        </tr>
-                    `;
-                });
-            }
-
-            html += `</tbody></table></div></div>`;
-            document.getElementById('moduleContent').innerHTML = html;
+            staffLive.requests = data.requests;
+            renderPendingRequests();
+            app.setLiveView(applyPendingRequestEvent);
         } else {
             document.getElementById('moduleContent').innerHTML = `<div class="card"><p>${data.message || 'Error loading pending requests'}</p></div>`;
         }
@@ -140,6 +88,147 @@ async function loadPendingRequests() {
     }
 }
 
+function renderPendingRequests() {
+    const requests = staffLive.requests;
+    let html = `
+        <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 1rem;">
+            <h2 class="login-title" style="font-size: 1.75rem;">Pending Requests</h2>
+            <div style="display: flex; gap: 0.75rem; flex-wrap: wrap;">
+                <button onclick="decideSelectedRequests('approve')" class="btn-modern btn-modern-primary" style="width: auto;">
+                    <i class="ph ph-checks"></i> Approve Selected
+                </button>
+                <button onclick="decideSelectedRequests('reject')" class="btn-modern" style="width: auto; background: var(--danger); color: white;">
+                    <i class="ph ph-x"></i> Reject Selected
+                </button>
+                <button onclick="loadModule('staff-dashboard')" class="btn-modern" style="width: auto; background: #f1f5f9; color: var(--text-main);">
+                    <i class="ph ph-arrow-left"></i> Back
+                </button>
+            </div>
+        </div>
+        
+        <div class="table-wrapper">
+            <div class="table-responsive">
+            <table class="modern-table">
+                <thead>
+                    <tr>
+                        <th style="width: 40px;"><input type="checkbox" onchange="toggleStaffSelectAll(this.checked)" title="Select all"></th>
+                        <th>Student</th>
+                        <th>Dept</th>
+                        <th>Reg No</th>
+                        <th>Date</th>
+                        <th>Time</th>
+                        <th>Reason</th>
+                        <th>Parent Contact</th>
+                        <th style="text-align: right;">Actions</th>
+                    </tr>
+                </thead>
+                <tbody>
+    `;
+
+    if (requests.length === 0) {
+        html += `<tr><td colspan="9" style="text-align: center; padding: 20px;">No pending requests.</td></tr>`;
+    } else {
+        requests.forEach(req => {
+            const parentInfo = req.parent_name
+                ? `<span style="font-weight:600;font-size:0.85rem;">${req.parent_name}</span><br>
+                   ${req.parent_mobile
+                    ? `<a href="tel:${req.parent_mobile}" style="color:var(--primary);font-size:0.8rem;font-weight:500;"><i class="ph ph-phone"></i> ${req.parent_mobile}</a>`
+                    : '<span style="color:#94a3b8;font-size:0.8rem;">No mobile</span>'}`
+                : '<span style="color:#94a3b8;font-size:0.8rem;">N/A</span>';
+
+            html += `
+                <tr>
+                    <td><input type="checkbox" class="staff-batch-select" value="${req.outpass_id}"></td>
+                    <td style="font-weight: 600;">${req.student_name}</td>
+                    <td style="color: var(--secondary); font-size: 13px; font-weight: 600;">
+                        ${app.formatYear(req.academic_year)} - ${req.dept_name}
+                    </td>
+                    <td>${req.registration_no}</td>
+                    <td>${app.formatDate(req.out_date)}</td>
+                    <td>${app.formatTime(req.out_time)}</td>
+                    <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${req.reason}</td>
+                    <td>${parentInfo}</td>
+                    <td>
+                        <div style="display: flex; justify-content: flex-end;">
+                            <button onclick="reviewRequest(${req.outpass_id})" class="btn-modern btn-modern-primary" style="padding: 6px 16px; font-size: 13px;">Review</button>
+                        </div>
+                    </td>
+                </tr>
+            `;
+        });
+    }
+
+    html += `</tbody></table></div></div>`;
+    document.getElementById('moduleContent').innerHTML = html;
+}
+
+function applyPendingRequestEvent(type, event) {
+    if (type === 'resync') {
+        loadPendingRequests();
+        return;
+    }
+    const outpass = event.outpass;
+    const others = staffLive.requests.filter(r => r.outpass_id !== outpass.outpass_id);
+    if (type === 'created' && outpass.advisor_status === 'pending') {
+        staffLive.requests = [...others, outpass];
+    } else if (type === 'advisor_approved' || type === 'rejected') {
+        staffLive.requests = others;
+    } else {
+        return;
+    }
+    renderPendingRequests();
+}
+
+function toggleStaffSelectAll(checked) {
+    document.querySelectorAll('.staff-batch-select').forEach(box => { box.checked = checked; });
+}
+
+async function decideSelectedRequests(action) {
+    const ids = Array.from(document.querySelectorAll('.staff-batch-select:checked')).map(box => parseInt(box.value));
+    if (ids.length === 0) {
+        alert('Select at least one request.');
+        return;
+    }
+
+    const body = { parent_called: false };
+    if (action === 'approve') {
+        if (!confirm(`Approve ${ids.length} request(s)? Confirm that you have called the parent for each of them.`)) return;
+        body.approve_ids = ids;
+        body.parent_called = true;
+    } else {
+        const remarks = prompt(`Reason for rejecting ${ids.length} request(s):`);
+        if (!remarks || !remarks.trim()) return;
+        body.reject_ids = ids;
+        body.reject_remarks = remarks;
+    }
+
+    try {
+        const response = await fetch(`${app.API_BASE}/staff/decide-batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        const data = await response.json();
+
+        if (!data.success) {
+            alert(data.message);
+            return;
+        }
+
+        // Update the table in place: decided and no-longer-pending rows leave the list
+        const done = new Set([...data.approved, ...data.rejected, ...Object.keys(data.skipped).map(Number)]);
+        staffLive.requests = staffLive.requests.filter(r => !done.has(r.outpass_id));
+        renderPendingRequests();
+
+        const skipped = Object.keys(data.skipped).length;
+        if (skipped > 0) {
+            alert(`${skipped} request(s) were skipped because they were already processed.`);
+        }
+    } catch (error) {
+        alert('Error processing requests');
+    }
+}
+
 // Review request
 async function reviewRequest(outpassId) {
     try {
@@ -300,7 +389,7 @@ async function loadMyStudents() {
             let html = `
                 <div class="mb-8" style="display: flex; justify-content: space-between; align-items: center;">
                     <h2 class="login-title" style="font-size: 1.75rem;">My Students</h2>
-                    <button onclick="window.open('${app.API_BASE}/staff/download-history', '_blank')" class="btn-modern" style="width: auto; background: #eff6ff; color: #1d4ed8;">
+                    <button onclick="app.downloadReport('staff')" class="btn-modern" style="width: auto; background: #eff6ff; color: #1d4ed8;">
                         <i class="ph ph-file-pdf"></i> Export PDF History
                     </button>
                 </div>
@@ -0,0 +1,26 @@
+"""
+File existing outpasses under reason categories (outpasses.reason_category_id).
+Usage: python scripts/backfill_reason_categories.py [--all]
+    --all   refile every outpass, e.g. after the keyword lists in backend/utils/reasons.py change
+Without --all only outpasses that have no category yet are processed.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.config import get_db_connection
+from backend.utils.reasons import backfill_reason_categories
+
+conn = get_db_connection()
+if not conn:
+    print("No DB connection")
+    sys.exit(1)
+
+start = time.monotonic()
+try:
+    updated = backfill_reason_categories(conn, recategorize='--all' in sys.argv[1:])
+finally:
+    conn.close()
+print(f"Categorised {updated} outpass(es) in {time.monotonic() - start:.2f}s")
@@ -0,0 +1,53 @@
+"""
+Measure notification outbox throughput with the loopback provider (no network).
+Usage: python scripts/bench_notifications.py [count]
+Messages go to their own table, notification_outbox_bench, drained by workers
+this script starts with a loopback provider. The live outbox and the app's
+workers (whatever SMS_PROVIDER they use) never see them. The table is dropped
+afterwards.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('NOTIFY_POLL_INTERVAL', '0.2')
+
+from backend.config import get_db_connection
+from backend.utils.notifications import (
+    OUTBOX_TABLE, LoopbackProvider, NotificationDispatcher, enqueue_sms_batch
+)
+
+BENCH_TABLE = 'notification_outbox_bench'
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+conn = get_db_connection()
+cursor = conn.cursor()
+cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+cursor.execute(f"CREATE TABLE {BENCH_TABLE} LIKE {OUTBOX_TABLE}")
+
+dispatcher = NotificationDispatcher(table=BENCH_TABLE, provider_factory=LoopbackProvider)
+try:
+    conn.start_transaction()
+    enqueue_sms_batch(cursor, [(f"9{i:09d}", f"Benchmark message {i}", f"bench:{i}", None)
+                               for i in range(count)], table=BENCH_TABLE)
+    conn.commit()
+    print(f"Queued {count} messages")
+
+    start = time.monotonic()
+    dispatcher.wake()
+    while True:
+        cursor.execute(f"SELECT COUNT(*) FROM {BENCH_TABLE} WHERE status IN ('pending', 'sending')")
+        remaining = cursor.fetchone()[0]
+        if remaining == 0:
+            break
+        time.sleep(0.1)
+    elapsed = time.monotonic() - start
+
+    print(f"Sent {dispatcher.provider.count} messages in {elapsed:.2f}s "
+          f"({count / elapsed:.0f}/s with {len(dispatcher._threads)} workers)")
+finally:
+    cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cursor.close()
+    conn.close()
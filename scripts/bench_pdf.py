@@ -0,0 +1,88 @@
+"""
+Compare the table renderer in pdf_generator with the previous cell-by-cell loop.
+Usage: python scripts/bench_pdf.py [rows ...]     (default: 10000 100000)
+Needs fpdf2 but no database; records are synthetic. Each run is a separate
+process so its peak RSS can be reported.
+"""
+import os
+import sys
+import time
+import resource
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.pdf_generator import OutpassPDF, safe_str, fmt_t, generate_staff_monthly_report
+from backend.utils.helpers import check_is_late
+
+
+def make_records(count):
+    base = datetime(2026, 10, 1, 9, 0)
+    records = []
+    for i in range(count):
+        exit_time = base + timedelta(minutes=i % 600)
+        records.append({
+            'student_name': f'Student {i}',
+            'registration_no': f'2024CSE{i:05d}',
+            'out_date': exit_time.strftime('%Y-%m-%d'),
+            'actual_exit_time': exit_time,
+            'actual_entry_time': exit_time + timedelta(hours=3 + i % 4),
+            'expected_return_time': timedelta(hours=17),
+            'reason': 'Medical appointment at the city hospital followed by a pharmacy visit' if i % 3 else 'Home',
+            'final_status': 'used'
+        })
+    return records
+
+
+def legacy_staff_report(records):
+    """The per-cell loop the reports used before the table layer"""
+    pdf = OutpassPDF(orientation='L')
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.set_font('helvetica', '', 9)
+    for row in records:
+        pdf.cell(50, 10, safe_str(row.get('student_name', row.get('full_name', 'Unknown'))), border=1)
+        pdf.cell(30, 10, safe_str(row.get('registration_no', '-')), border=1, align='C')
+        pdf.cell(25, 10, safe_str(row.get('out_date', '-')), border=1, align='C')
+        pdf.cell(35, 10, fmt_t(row.get('actual_exit_time')), border=1, align='C')
+        entry_time_str = fmt_t(row.get('actual_entry_time'))
+        if row.get('actual_entry_time') and check_is_late(row.get('out_date'), row.get('expected_return_time'), row.get('actual_entry_time')):
+            entry_time_str += ' (LATE)'
+        pdf.cell(35, 10, entry_time_str, border=1, align='C')
+        reason = safe_str(row.get('reason', '-'))
+        if len(reason) > 40:
+            reason = reason[:37] + '...'
+        pdf.cell(65, 10, reason, border=1)
+        pdf.cell(30, 10, safe_str(row.get('final_status', 'Pending')).capitalize(), border=1, align='C')
+        pdf.ln()
+    return bytes(pdf.output())
+
+
+def run(variant, count):
+    records = make_records(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.pdf')
+        start = time.perf_counter()
+        if variant == 'legacy':
+            with open(path, 'wb') as f:
+                f.write(legacy_staff_report(records))
+        else:
+            generate_staff_monthly_report('Bench Advisor', 'October', '2026', records, out=path)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  {variant:<8} {elapsed:8.2f}s   peak RSS {peak:8.1f} MiB   {size / 1024:8.0f} KiB")
+
+
+if len(sys.argv) > 1 and sys.argv[1] == '--run':
+    run(sys.argv[2], int(sys.argv[3]))
+    sys.exit(0)
+
+counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+for count in counts:
+    print(f"{count} rows")
+    for variant in ('legacy', 'table'):
+        subprocess.run([sys.executable, __file__, '--run', variant, str(count)], check=True)
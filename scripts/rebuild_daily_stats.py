@@ -0,0 +1,25 @@
+"""
+Recompute the daily outpass rollup (outpass_daily_stats) from outpasses.
+Usage: python scripts/rebuild_daily_stats.py
+Run it after bulk edits made directly in MySQL; normal changes are picked up automatically.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.config import get_db_connection
+from backend.utils.daily_stats import rebuild_daily_stats
+
+conn = get_db_connection()
+if not conn:
+    print("No DB connection")
+    sys.exit(1)
+
+start = time.monotonic()
+try:
+    rows = rebuild_daily_stats(conn)
+finally:
+    conn.close()
+print(f"Rebuilt {rows} rollup row(s) in {time.monotonic() - start:.2f}s")